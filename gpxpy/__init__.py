@@ -12,13 +12,17 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import IO, Union, Optional, AnyStr
+from typing import IO, Union, Optional, AnyStr, Iterator, Iterable, Any, TYPE_CHECKING
 
 from . import gpx as mod_gpx
 
+if TYPE_CHECKING:
+    from . import cache as mod_cache
+
 __version__ = '1.6.2'
 
-def parse(xml_or_file: Union[AnyStr, IO[str]], version: Optional[str] = None) -> mod_gpx.GPX:
+def parse(xml_or_file: Union[AnyStr, IO[str]], version: Optional[str] = None, streaming: bool = False, recover: bool = False,
+          cache: Optional["mod_cache.ParseCache"] = None, lazy: bool = False) -> mod_gpx.GPX:
     """
     Parse xml (string) or file object. This is just an wrapper for
     GPXParser.parse() function.
@@ -30,10 +34,81 @@ def parse(xml_or_file: Union[AnyStr, IO[str]], version: Optional[str] = None) ->
 
     version may be '1.0', '1.1' or None (then it will be read from the gpx
     xml node if possible, if not then version 1.0 will be used).
+
+    streaming parses the XML incrementally (see GPXParser). With recover an
+    unterminated document (for example written by a crashed GPXWriter) is
+    closed before parsing, see parser.close_unterminated_xml().
+
+    With lazy the track points are decoded only when the tracks, segments
+    and points are accessed for the first time, so for example reading only
+    the metadata, or one of many tracks, is faster. The XML tree is kept in
+    memory until all of them are decoded.
+
+    With a cache (see cache.ParseCache) documents which were already parsed
+    are loaded from the cache (streaming and lazy are then ignored).
     """
 
+    if cache is not None:
+        return cache.parse(xml_or_file, version, recover=recover)
+
     from . import parser as mod_parser
 
-    parser = mod_parser.GPXParser(xml_or_file)
+    parser = mod_parser.GPXParser(xml_or_file, streaming=streaming, recover=recover, lazy=lazy)
 
     return parser.parse(version)
+
+
+def parse_many(paths: Iterable[Any], workers: Optional[int] = None, version: Optional[str] = None,
+               ordered: bool = True, statistics: bool = False) -> Iterator[mod_gpx.ParseResult]:
+    """
+    Parse many GPX files in a pool of workers processes, yielding a
+    ParseResult (path, gpx, statistics, exception named tuple) for every
+    file.
+
+    workers is the number of processes (default is the number of CPUs, with
+    1 the files are parsed in this process). With ordered the results are
+    yielded in the order of paths, otherwise as soon as they are parsed.
+
+    An exception (invalid GPX, error reading the file or computing the
+    statistics) doesn't stop the batch, it is in the exception of the file
+    result (and gpx is None).
+
+    With statistics only the statistics (see GPX.get_statistics()) are
+    computed in the worker and returned (gpx is None), so that the GPX
+    objects don't need to be sent back from the workers.
+    """
+
+    from . import parallel as mod_parallel
+
+    return mod_parallel.parse_many(paths, workers, version, ordered, statistics)
+
+
+def iter_points(xml_or_file: Union[AnyStr, IO[str]]) -> Iterator[mod_gpx.TrackPointRecord]:
+    """
+    Generator yielding track points (latitude, longitude, elevation, time,
+    track_no, segment_no and point_no named tuples) while parsing xml
+    (string) or file object. This is just a wrapper for
+    GPXParser.iter_points().
+
+    No GPX object is built and the XML is parsed incrementally, so this
+    can be used to process files of any size in constant memory.
+    """
+
+    from . import parser as mod_parser
+
+    parser = mod_parser.GPXParser(xml_or_file, streaming=True)
+
+    return parser.iter_points()
+
+
+def load_binary(path_or_data: Union[str, bytes]) -> mod_gpx.GPX:
+    """
+    Load a GPX written with GPX.to_binary(). path_or_data is the file name
+    (the file is memory mapped) or the binary data.
+    """
+
+    from . import binary as mod_binary
+
+    if isinstance(path_or_data, (bytes, bytearray, memoryview)):
+        return mod_binary.from_binary(path_or_data)
+    return mod_binary.load(path_or_data)
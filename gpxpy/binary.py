@@ -0,0 +1,256 @@
+# Copyright 2011 Tomo Krajina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compact binary format for GPX objects, used to cache parsed files.
+
+The file contains:
+
+* a fixed size header (see HEADER),
+* the XML (see GPX.to_xml()) of the GPX without the track points, except
+  the track points with fields other than latitude, longitude, elevation
+  and time,
+* the number of points of every track segment,
+* columns with the latitudes, longitudes, elevations, times (microseconds
+  since epoch, UTC), timezone offsets (minutes) and flags of all the
+  track points.
+
+Loading needs only the (small) XML to be parsed, the columns are read
+directly from the (memory mapped) file. Track point coordinates,
+elevations and times are stored exactly, everything else is the same as
+after a to_xml()/parse() round trip (GPX objects without a version are
+stored as GPX 1.0, the version the parser assumes for them). Timezones are
+loaded as SimpleTZ with the same UTC offset.
+"""
+
+import array as mod_array
+import mmap as mod_mmap
+import os as mod_os
+import struct as mod_struct
+import sys as mod_sys
+
+from . import gpx as mod_gpx
+from . import gpxfield as mod_gpxfield
+
+from typing import *
+
+MAGIC = b'GPXPYBIN'
+FORMAT_VERSION = 1
+
+# Magic, format version, flags, number of segments, number of points, XML size:
+HEADER = mod_struct.Struct('<8sIIIQQ')
+
+# Header flags:
+NO_SCHEMA_LOCATIONS = 1 # GPX.schema_locations is empty (the XML contains the defaults)
+NO_VERSION = 2 # GPX.version is None (the XML is GPX 1.0, like the parser assumes)
+
+# Track point flags:
+HAS_ELEVATION = 1
+HAS_TIME = 2
+HAS_TIMEZONE = 4
+HAS_FIELDS = 8 # The point (with all the other fields) is in the XML
+
+# Typecodes of the latitude, longitude, elevation, time, timezone offset
+# and flags columns:
+COLUMNS = 'dddqiB'
+
+
+_COLUMN_FIELDS = ('latitude', 'longitude', 'elevation', 'time')
+_OTHER_POINT_FIELDS = [field for field in mod_gpx.GPXTrackPoint.__slots__ if field not in _COLUMN_FIELDS and field != 'extensions']
+
+
+def _has_fields(point: mod_gpx.GPXTrackPoint) -> bool:
+    """ True if the point has fields which are not stored in the columns """
+    if point.extensions:
+        return True
+    for field in _OTHER_POINT_FIELDS:
+        if getattr(point, field) is not None:
+            return True
+    return False
+
+
+def _copy(instance: Any, **values: Any) -> Any:
+    """ Shallow copy of a GPX object (without caches), with values changed """
+    result = instance.__class__()
+    for attribute in instance.__slots__:
+        if not attribute.startswith('_'):
+            setattr(result, attribute, values[attribute] if attribute in values else getattr(instance, attribute))
+    return result
+
+
+def _to_bytes(typecode: str, values: List[Any]) -> bytes:
+    column = mod_array.array(typecode, values)
+    if mod_sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_column(view: memoryview, offset: int, typecode: str, count: int) -> List[Any]:
+    size = mod_array.array(typecode).itemsize * count
+    if offset + size > len(view):
+        raise mod_gpx.GPXException('Invalid binary GPX (truncated)')
+    with view[offset:offset + size] as part:
+        if mod_sys.byteorder == 'big':
+            column = mod_array.array(typecode, bytes(part))
+            column.byteswap()
+            return column.tolist()
+        with part.cast(typecode) as cast_part:
+            return cast_part.tolist()
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) // 8 * 8
+
+
+def to_binary(gpx: mod_gpx.GPX) -> bytes:
+    """ See GPX.to_binary() """
+    counts: List[int] = []
+    latitudes: List[float] = []
+    longitudes: List[float] = []
+    elevations: List[float] = []
+    times: List[int] = []
+    utc_offsets: List[int] = []
+    flags: List[int] = []
+
+    time_to_microseconds = mod_gpxfield.time_to_microseconds
+
+    tracks = []
+    for track in gpx.tracks:
+        segments = []
+        for segment in track.segments:
+            points_with_fields = []
+            for point in segment.points:
+                point_flags = 0
+                latitudes.append(point.latitude)
+                longitudes.append(point.longitude)
+                if point.elevation is None:
+                    elevations.append(0.)
+                else:
+                    elevations.append(point.elevation)
+                    point_flags |= HAS_ELEVATION
+                time = point.time
+                utc_offset = None if time is None else time.utcoffset()
+                if time is None:
+                    times.append(0)
+                    utc_offsets.append(0)
+                elif utc_offset is None:
+                    times.append(time_to_microseconds(time))
+                    utc_offsets.append(0)
+                    point_flags |= HAS_TIME
+                else:
+                    times.append(time_to_microseconds(time))
+                    utc_offsets.append(utc_offset.days * 1440 + utc_offset.seconds // 60)
+                    point_flags |= HAS_TIME | HAS_TIMEZONE
+                if _has_fields(point):
+                    points_with_fields.append(point)
+                    point_flags |= HAS_FIELDS
+                flags.append(point_flags)
+            segments.append(_copy(segment, points=points_with_fields))
+            counts.append(len(segment.points))
+        tracks.append(_copy(track, segments=segments))
+
+    skeleton = _copy(gpx, tracks=tracks, nsmap=dict(gpx.nsmap), schema_locations=list(gpx.schema_locations))
+    xml = skeleton.to_xml('1.1' if gpx.version == '1.1' else '1.0', prettyprint=False).encode('utf-8')
+
+    header_flags = 0
+    if not gpx.schema_locations:
+        header_flags |= NO_SCHEMA_LOCATIONS
+    if not gpx.version:
+        header_flags |= NO_VERSION
+    result = [HEADER.pack(MAGIC, FORMAT_VERSION, header_flags, len(counts), len(flags), len(xml)), xml]
+    size = HEADER.size + len(xml)
+    result.append(b'\0' * (_align(size) - size))
+    result.append(_to_bytes('q', counts))
+    for typecode, column in zip(COLUMNS, [latitudes, longitudes, elevations, times, utc_offsets, flags]):
+        result.append(_to_bytes(typecode, column))
+    return b''.join(result)
+
+
+def from_binary(data: Any) -> mod_gpx.GPX:
+    """
+    Loads the GPX from data (bytes, mmap or anything else supporting the
+    buffer protocol) written by GPX.to_binary().
+    """
+    from . import parser as mod_parser
+
+    with memoryview(data) as view:
+        if len(view) < HEADER.size:
+            raise mod_gpx.GPXException('Invalid binary GPX (truncated)')
+        magic, format_version, header_flags, segments_no, points_no, xml_size = HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            raise mod_gpx.GPXException('Not a binary GPX')
+        if format_version != FORMAT_VERSION:
+            raise mod_gpx.GPXException(f'Unsupported binary GPX format version {format_version}')
+
+        offset = HEADER.size
+        if offset + xml_size > len(view):
+            raise mod_gpx.GPXException('Invalid binary GPX (truncated)')
+        with view[offset:offset + xml_size] as part:
+            xml = bytes(part).decode('utf-8')
+        offset = _align(offset + xml_size)
+        counts = _read_column(view, offset, 'q', segments_no)
+        offset += 8 * segments_no
+        columns = []
+        for typecode in COLUMNS:
+            columns.append(_read_column(view, offset, typecode, points_no))
+            offset += mod_array.array(typecode).itemsize * points_no
+
+    gpx = mod_parser.GPXParser(xml).parse()
+    if header_flags & NO_SCHEMA_LOCATIONS:
+        gpx.schema_locations = []
+    if header_flags & NO_VERSION:
+        gpx.version = None
+    segments = [segment for track in gpx.tracks for segment in track.segments]
+    if len(segments) != segments_no or sum(counts) != points_no:
+        raise mod_gpx.GPXException('Invalid binary GPX (wrong number of segments or points)')
+
+    latitudes, longitudes, elevations, times, utc_offsets, flags = columns
+    microseconds_to_time = mod_gpxfield.microseconds_to_time
+    GPXTrackPoint = mod_gpx.GPXTrackPoint
+
+    start = 0
+    for segment, count in zip(segments, counts):
+        points_with_fields = iter(segment.points)
+        points = []
+        for point_no in range(start, start + count):
+            point_flags = flags[point_no]
+            elevation = elevations[point_no] if point_flags & HAS_ELEVATION else None
+            if point_flags & HAS_TIMEZONE:
+                time = microseconds_to_time(times[point_no], utc_offsets[point_no])
+            elif point_flags & HAS_TIME:
+                time = microseconds_to_time(times[point_no])
+            else:
+                time = None
+            if point_flags & HAS_FIELDS:
+                point = next(points_with_fields)
+                point.latitude = latitudes[point_no]
+                point.longitude = longitudes[point_no]
+                point.elevation = elevation
+                point.time = time
+            else:
+                point = GPXTrackPoint(latitudes[point_no], longitudes[point_no], elevation, time)
+            points.append(point)
+        start += count
+        segment.points = points
+
+    return gpx
+
+
+def load(path: str) -> mod_gpx.GPX:
+    """ Loads the GPX from a file written with GPX.to_binary(), memory mapped """
+    with open(path, 'rb') as f:
+        if not mod_os.fstat(f.fileno()).st_size:
+            raise mod_gpx.GPXException('Invalid binary GPX (empty file)')
+        with mod_mmap.mmap(f.fileno(), 0, access=mod_mmap.ACCESS_READ) as mapped:
+            return from_binary(mapped)
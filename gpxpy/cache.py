@@ -0,0 +1,182 @@
+# Copyright 2011 Tomo Krajina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cache of parsed GPX documents, see ParseCache.
+"""
+
+import collections as mod_collections
+import hashlib as mod_hashlib
+import logging as mod_logging
+import os as mod_os
+import tempfile as mod_tempfile
+import threading as mod_threading
+
+from . import gpx as mod_gpx
+from . import binary as mod_binary
+
+from typing import AnyStr, Dict, IO, Optional, Union, cast
+
+log = mod_logging.getLogger(__name__)
+
+
+class ParseCache:
+    """
+    Cache of parsed GPX documents, keyed by the SHA-256 hash of the XML and
+    the parse arguments (version, recover).
+
+    The parsed GPX objects are stored in the binary format (see
+    GPX.to_binary()), so every cache hit returns a new, independent GPX
+    object, loaded without parsing the XML. The least recently used
+    entries are evicted when their total size exceeds max_size bytes.
+
+    If a directory is given, the entries are also stored there (and used
+    by other processes or after a restart). If max_disk_size (bytes) is
+    given, the least recently used files are removed when the files in the
+    directory exceed it.
+
+    Usage:
+
+        cache = ParseCache()
+        gpx = gpxpy.parse(gpx_file, cache=cache)
+        print(cache.cache_info())
+    """
+
+    def __init__(self, max_size: int=64 * 1024 * 1024, directory: Optional[str]=None, max_disk_size: Optional[int]=None) -> None:
+        self.max_size = max_size
+        self.directory = directory
+        self.max_disk_size = max_disk_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, bytes] = mod_collections.OrderedDict()
+        self._size = 0
+        self._lock = mod_threading.Lock()
+        if directory:
+            mod_os.makedirs(directory, exist_ok=True)
+
+    def parse(self, xml_or_file: Union[AnyStr, IO[str]], version: Optional[str]=None, recover: bool=False) -> mod_gpx.GPX:
+        """ See gpxpy.parse() """
+        from . import parser as mod_parser
+
+        content = xml_or_file.read() if hasattr(xml_or_file, 'read') else xml_or_file # type: ignore
+        data = content.encode('utf-8') if isinstance(content, str) else content
+        key = f'{mod_hashlib.sha256(data).hexdigest()}-{version or "auto"}{"-recover" if recover else ""}'
+
+        binary = self._get(key)
+        if binary is not None:
+            try:
+                return mod_binary.from_binary(binary)
+            except mod_gpx.GPXException:
+                log.debug('Invalid cache entry %s', key, exc_info=True)
+
+        gpx = mod_parser.GPXParser(content, recover=recover).parse(version)
+        self._put(key, gpx.to_binary())
+        return gpx
+
+    def _file_name(self, key: str) -> str:
+        return mod_os.path.join(cast(str, self.directory), f'{key}.gpxbin')
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            binary = self._entries.get(key)
+            if binary is not None:
+                self._entries.move_to_end(key) # type: ignore
+                self.hits += 1
+                return binary
+
+        if self.directory:
+            file_name = self._file_name(key)
+            try:
+                with open(file_name, 'rb') as f:
+                    binary = f.read()
+                # The modification time is used for the disk LRU:
+                mod_os.utime(file_name)
+            except OSError:
+                binary = None
+            if binary is not None:
+                with self._lock:
+                    self.hits += 1
+                    self._add(key, binary)
+                return binary
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put(self, key: str, binary: bytes) -> None:
+        with self._lock:
+            self._add(key, binary)
+
+        if self.directory:
+            # Written to a temporary file first, so that other processes
+            # never read an incomplete file:
+            try:
+                fd, temp_file_name = mod_tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+                try:
+                    with open(fd, 'wb') as f:
+                        f.write(binary)
+                    mod_os.replace(temp_file_name, self._file_name(key))
+                except OSError:
+                    mod_os.remove(temp_file_name)
+                    raise
+            except OSError:
+                log.debug('Error writing %s to the cache directory', key, exc_info=True)
+                return
+            if self.max_disk_size is not None:
+                self._evict_files()
+
+    def _add(self, key: str, binary: bytes) -> None:
+        """ Adds the entry to the memory cache, self._lock must be held """
+        if len(binary) > self.max_size:
+            return
+        if key in self._entries:
+            self._size -= len(self._entries.pop(key))
+        self._entries[key] = binary
+        self._size += len(binary)
+        while self._size > self.max_size:
+            _, evicted = self._entries.popitem(last=False) # type: ignore
+            self._size -= len(evicted)
+
+    def _evict_files(self) -> None:
+        files = []
+        for entry in mod_os.scandir(cast(str, self.directory)):
+            if entry.name.endswith('.gpxbin'):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in files:
+            if size <= cast(int, self.max_disk_size):
+                break
+            try:
+                mod_os.remove(path)
+            except OSError:
+                pass
+            size -= file_size
+
+    def cache_info(self) -> mod_gpx.ParseCacheInfo:
+        """ Hits, misses, number of entries and size (bytes) of the memory cache """
+        with self._lock:
+            return mod_gpx.ParseCacheInfo(self.hits, self.misses, len(self._entries), self._size)
+
+    def clear(self) -> None:
+        """ Removes all the entries from memory (files in the directory are kept) and resets the counters """
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,181 @@
+# Copyright 2011 Tomo Krajina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Columnar (numpy array backed) representation of track segments.
+
+Instead of a list of GPXTrackPoint objects a ColumnarTrackSegment stores
+parallel arrays (latitudes, longitudes, elevations, times), which needs
+only a fraction of the memory and can be processed with vectorized code.
+
+Only latitude, longitude, elevation and time are stored, other track point
+fields are lost when converting a GPXTrackSegment to columns.
+
+Numpy is an optional dependency of gpxpy, it is needed only here.
+"""
+
+import datetime as mod_datetime
+
+from . import geo as mod_geo
+from . import gpx as mod_gpx
+from . import gpxfield as mod_gpxfield
+
+from typing import *
+
+try:
+    import numpy as mod_numpy # type: ignore
+except ImportError:
+    mod_numpy = None
+
+
+class ColumnarTrackSegment:
+    """
+    Track segment stored as columns:
+
+    latitudes, longitudes: float64 arrays
+    elevations: masked float64 array (masked where the point has no elevation)
+    times: masked int64 array of microseconds since epoch (UTC)
+    utc_offsets: masked int32 array with the timezone offset (minutes) of
+        every time (masked where the time has no timezone)
+    """
+
+    __slots__ = ('latitudes', 'longitudes', 'elevations', 'times', 'utc_offsets', 'extensions')
+
+    def __init__(self, latitudes: Any, longitudes: Any, elevations: Any=None, times: Any=None, utc_offsets: Any=None) -> None:
+        if mod_numpy is None:
+            raise ImportError('numpy is required for ColumnarTrackSegment')
+
+        self.latitudes = mod_numpy.asarray(latitudes, dtype=mod_numpy.float64)
+        self.longitudes = mod_numpy.asarray(longitudes, dtype=mod_numpy.float64)
+        size = len(self.latitudes)
+        if len(self.longitudes) != size:
+            raise mod_gpx.GPXException(f'Expected {size} longitudes, got {len(self.longitudes)}')
+
+        self.elevations = self._masked_column(elevations, size, mod_numpy.float64)
+        self.times = self._masked_column(times, size, mod_numpy.int64)
+        self.utc_offsets = self._masked_column(utc_offsets, size, mod_numpy.int32)
+        self.extensions: List[Any] = []
+
+    def _masked_column(self, values: Any, size: int, dtype: Any) -> Any:
+        if values is None:
+            return mod_numpy.ma.masked_all(size, dtype=dtype)
+        result = mod_numpy.ma.asarray(values).astype(dtype)
+        if len(result) != size:
+            raise mod_gpx.GPXException(f'Expected {size} values, got {len(result)}')
+        return result
+
+    @classmethod
+    def from_segment(cls, segment: mod_gpx.GPXTrackSegment) -> "ColumnarTrackSegment":
+        """ Convert the points of a GPXTrackSegment into columns. """
+        if mod_numpy is None:
+            raise ImportError('numpy is required for ColumnarTrackSegment')
+
+        points = segment.points
+        size = len(points)
+
+        elevations = mod_numpy.zeros(size, dtype=mod_numpy.float64)
+        elevations_mask = mod_numpy.ones(size, dtype=bool)
+        times = mod_numpy.zeros(size, dtype=mod_numpy.int64)
+        times_mask = mod_numpy.ones(size, dtype=bool)
+        utc_offsets = mod_numpy.zeros(size, dtype=mod_numpy.int32)
+        utc_offsets_mask = mod_numpy.ones(size, dtype=bool)
+
+        for point_no, point in enumerate(points):
+            if point.elevation is not None:
+                elevations[point_no] = point.elevation
+                elevations_mask[point_no] = False
+            if point.time is not None:
+                times[point_no] = mod_gpxfield.time_to_microseconds(point.time)
+                times_mask[point_no] = False
+                utc_offset = point.time.utcoffset()
+                if utc_offset is not None:
+                    utc_offsets[point_no] = utc_offset.days * 1440 + utc_offset.seconds // 60
+                    utc_offsets_mask[point_no] = False
+
+        result = cls(mod_numpy.fromiter((point.latitude for point in points), dtype=mod_numpy.float64, count=size),
+                     mod_numpy.fromiter((point.longitude for point in points), dtype=mod_numpy.float64, count=size),
+                     mod_numpy.ma.masked_array(elevations, mask=elevations_mask),
+                     mod_numpy.ma.masked_array(times, mask=times_mask),
+                     mod_numpy.ma.masked_array(utc_offsets, mask=utc_offsets_mask))
+        result.extensions = list(segment.extensions)
+        return result
+
+    def to_segment(self) -> mod_gpx.GPXTrackSegment:
+        """ Convert the columns back to a GPXTrackSegment """
+        # tolist() returns None for masked values:
+        elevations = self.elevations.tolist()
+        times_mask = mod_numpy.ma.getmaskarray(self.times).tolist()
+        utc_offsets = self.utc_offsets.tolist()
+
+        result = mod_gpx.GPXTrackSegment()
+        for latitude, longitude, elevation, microseconds, time_masked, utc_offset in \
+                zip(self.latitudes.tolist(), self.longitudes.tolist(), elevations,
+                    self.times.data.tolist(), times_mask, utc_offsets):
+            time = None if time_masked else mod_gpxfield.microseconds_to_time(microseconds, utc_offset)
+            result.points.append(mod_gpx.GPXTrackPoint(latitude, longitude, elevation=elevation, time=time))
+        result.extensions = list(self.extensions)
+        return result
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    def get_points_no(self) -> int:
+        """ Number of points in segment. """
+        return len(self)
+
+    def get_elevation(self, point_no: int) -> Optional[float]:
+        """ Elevation of the point_no-th point (None if unknown) """
+        if mod_numpy.ma.getmaskarray(self.elevations)[point_no]:
+            return None
+        return float(self.elevations.data[point_no])
+
+    def get_time(self, point_no: int) -> Optional[mod_datetime.datetime]:
+        """ Time of the point_no-th point (None if unknown) """
+        if mod_numpy.ma.getmaskarray(self.times)[point_no]:
+            return None
+        utc_offset = None
+        if not mod_numpy.ma.getmaskarray(self.utc_offsets)[point_no]:
+            utc_offset = self.utc_offsets.data[point_no]
+        return mod_gpxfield.microseconds_to_time(self.times.data[point_no], utc_offset)
+
+    def length_2d(self) -> float:
+        """ See GPXTrackSegment.length_2d() """
+        return float(mod_geo.distances(self.latitudes, self.longitudes).sum())
+
+    def length_3d(self) -> float:
+        """ See GPXTrackSegment.length_3d() """
+        return float(mod_geo.distances(self.latitudes, self.longitudes, self.elevations).sum())
+
+    def get_bounds(self) -> Optional[mod_gpx.GPXBounds]:
+        """ See GPXTrackSegment.get_bounds() """
+        if not len(self):
+            return None
+        return mod_gpx.GPXBounds(float(self.latitudes.min()), float(self.latitudes.max()),
+                                 float(self.longitudes.min()), float(self.longitudes.max()))
+
+    def get_time_bounds(self) -> mod_gpx.TimeBounds:
+        """ See GPXTrackSegment.get_time_bounds() """
+        with_time = mod_numpy.flatnonzero(~mod_numpy.ma.getmaskarray(self.times))
+        if not len(with_time):
+            return mod_gpx.TimeBounds(None, None)
+        return mod_gpx.TimeBounds(self.get_time(with_time[0]), self.get_time(with_time[-1]))
+
+    def get_elevation_extremes(self) -> mod_gpx.MinimumMaximum:
+        """ See GPXTrackSegment.get_elevation_extremes() """
+        if mod_numpy.ma.count(self.elevations) == 0:
+            return mod_gpx.MinimumMaximum(None, None)
+        return mod_gpx.MinimumMaximum(float(self.elevations.min()), float(self.elevations.max()))
+
+    def __repr__(self) -> str:
+        return f'ColumnarTrackSegment(points_no={len(self)})'
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import heapq as mod_heapq
+import itertools as mod_itertools
 import logging as mod_logging
 import math as mod_math
 
@@ -19,6 +21,12 @@ from . import utils as mod_utils
 
 from typing import *
 
+try:
+    # Numpy is optional, it is used for the vectorized versions of some functions:
+    import numpy as mod_numpy # type: ignore
+except ImportError:
+    mod_numpy = None
+
 log = mod_logging.getLogger(__name__)
 
 # Generic geo related function and class(es)
@@ -164,20 +172,146 @@ def calculate_max_speed(speeds_and_distances: List[Tuple[float, float]], extreem
     standard_distance_deviation = mod_math.sqrt(sum((distance - average_distance) ** 2 for distance in distances) / size)
 
     # Ignore items where the distance is too big:
-    filtered_speeds_and_distances = [x for x in speeds_and_distances if abs(x[1] - average_distance) <= standard_distance_deviation * 1.5]
-
-    # sort by speed:
-    speeds = [x[0] for x in filtered_speeds_and_distances]
+    max_deviation = standard_distance_deviation * 1.5
+    speeds = [x[0] for x in speeds_and_distances if abs(x[1] - average_distance) <= max_deviation]
     if not speeds:
         return None
-    speeds.sort()
 
     # Even here there may be some extremes => ignore the last 5%:
-    index = int(len(speeds) * (1-extreemes_percentile))
-    if index >= len(speeds):
-        index = -1
+    return _select(speeds, _max_speed_index(len(speeds), extreemes_percentile))
+
+
+def _max_speed_index(size: int, extreemes_percentile: float) -> int:
+    """ Index of the max speed in the sorted speeds (without the top extreemes_percentile) """
+    index = int(size * (1-extreemes_percentile))
+    if index >= size:
+        index = size - 1
+    elif index < 0:
+        index = max(index + size, 0)
+    return index
+
+
+def _select(values: List[float], index: int) -> float:
+    """
+    sorted(values)[index], without sorting all the values: the index is
+    usually near the end, so only the biggest values are kept in a heap.
+    """
+    if index == len(values) - 1:
+        return max(values)
+    if index < len(values) // 2:
+        return mod_heapq.nsmallest(index + 1, values)[-1]
+    return mod_heapq.nlargest(len(values) - index, values)[-1]
+
+
+def _sequential_sum(values: Any) -> float:
+    """ Sum of a numpy array added in order (like sum() of a list, unlike numpy.sum()) """
+    return float(values.cumsum()[-1]) if len(values) else 0.
+
+
+def calculate_moving_data_arrays(distances: Any, seconds: Any, stopped_speed_threshold: float) -> Tuple[float, float, float, float, Any, Any]:
+    """
+    Vectorized moving_time, stopped_time, moving_distance and
+    stopped_distance (see GPXTrackSegment.get_moving_data()) from numpy
+    arrays of the distances and seconds (NaN if unknown) between
+    consecutive points. The speeds and distances used for the max speed
+    (see calculate_max_speed_arrays()) are returned too.
+
+    The results are the same as with the loop over the points, the sums
+    are computed in the same order.
+    """
+    valid = (seconds > 0) & (distances != 0)
+    distances = distances[valid]
+    seconds = seconds[valid]
+
+    speeds_kmh = (distances / 1000) / (seconds / 60 ** 2)
+    stopped = speeds_kmh <= stopped_speed_threshold
+    moving = ~stopped
+
+    # Speeds are used only after the first moving step:
+    first_moving = int(moving.argmax()) if moving.any() else len(moving)
+    speeds = distances[first_moving:] / seconds[first_moving:]
+
+    return (_sequential_sum(seconds[moving]), _sequential_sum(seconds[stopped]),
+            _sequential_sum(distances[moving]), _sequential_sum(distances[stopped]),
+            speeds, distances[first_moving:])
+
+
+def calculate_max_speed_arrays(speeds: Any, distances: Any, extreemes_percentile: float, ignore_nonstandard_distances: bool) -> Optional[float]:
+    """
+    calculate_max_speed() for numpy arrays of speeds and distances, with the
+    same result.
+    """
+    if not len(speeds):
+        return None
+
+    if not ignore_nonstandard_distances:
+        return float(speeds.max())
+
+    size = len(speeds)
 
-    return speeds[index]
+    if size < 2:
+        return None
+
+    average_distance = _sequential_sum(distances) / size
+    standard_distance_deviation = mod_math.sqrt(_sequential_sum((distances - average_distance) ** 2) / size)
+
+    # Ignore items where the distance is too big:
+    speeds = speeds[abs(distances - average_distance) <= standard_distance_deviation * 1.5]
+    if not len(speeds):
+        return None
+
+    index = _max_speed_index(len(speeds), extreemes_percentile)
+    return float(mod_numpy.partition(speeds, index)[index])
+
+
+def calculate_max_speeds(speeds_and_distances: Sequence[Sequence[Tuple[float, float]]], extreemes_percentile: float,
+                         ignore_nonstandard_distances: bool) -> List[Optional[float]]:
+    """
+    calculate_max_speed() for many track segments in one call: the result
+    is the max speed (None if it can't be computed) for every list of
+    (speed, distance) pairs.
+
+    With numpy, all the segments are computed together with arrays (with
+    the same results as calculate_max_speed()).
+    """
+    if mod_numpy is None:
+        return [calculate_max_speed(part, extreemes_percentile, ignore_nonstandard_distances) if part else None
+                for part in speeds_and_distances]
+
+    sizes = mod_numpy.array([len(part) for part in speeds_and_distances], dtype=mod_numpy.int64)
+    parts_no = len(sizes)
+    pairs = mod_numpy.fromiter(mod_itertools.chain.from_iterable(mod_itertools.chain.from_iterable(speeds_and_distances)),
+                               dtype=mod_numpy.float64, count=2 * int(sizes.sum())).reshape(-1, 2)
+    speeds, distances = pairs[:, 0], pairs[:, 1]
+    part_nos = mod_numpy.repeat(mod_numpy.arange(parts_no), sizes)
+
+    if ignore_nonstandard_distances:
+        # Sums with bincount() are computed in order, like sum():
+        with mod_numpy.errstate(divide='ignore', invalid='ignore'):
+            average_distances = mod_numpy.bincount(part_nos, distances, parts_no) / sizes
+            deviations = distances - average_distances[part_nos]
+            standard_distance_deviations = mod_numpy.sqrt(mod_numpy.bincount(part_nos, deviations ** 2, parts_no) / sizes)
+        kept = abs(deviations) <= standard_distance_deviations[part_nos] * 1.5
+        speeds, part_nos = speeds[kept], part_nos[kept]
+        valid = sizes >= 2
+    else:
+        valid = sizes >= 1
+
+    # The speeds of every part are still together (in order):
+    counts = mod_numpy.bincount(part_nos, minlength=parts_no).tolist()
+    result: List[Optional[float]] = []
+    start = 0
+    for is_valid, count in zip(valid.tolist(), counts):
+        part_speeds = speeds[start:start + count]
+        start += count
+        if not is_valid or not count:
+            result.append(None)
+        elif ignore_nonstandard_distances:
+            index = _max_speed_index(count, extreemes_percentile)
+            result.append(float(mod_numpy.partition(part_speeds, index)[index]))
+        else:
+            result.append(float(part_speeds.max()))
+    return result
 
 
 def calculate_uphill_downhill(elevations: List[Optional[float]]) -> Tuple[float, float]:
@@ -256,6 +390,120 @@ def distance(latitude_1: float, longitude_1: float, elevation_1: Optional[float]
     return mod_math.sqrt(distance_2d ** 2 + (elevation_1 - elevation_2) ** 2)
 
 
+def distance_2d_3d(latitude_1: float, longitude_1: float, elevation_1: Optional[float],
+                   latitude_2: float, longitude_2: float, elevation_2: Optional[float]) -> Tuple[float, float]:
+    """
+    Both the 2d and the 3d distance() between two points. The 3d distance
+    is computed from the 2d one, so this is faster than calling distance()
+    twice (and the results are the same).
+    """
+    distance_2d = distance(latitude_1, longitude_1, None, latitude_2, longitude_2, None)
+
+    if elevation_1 is None or elevation_2 is None or elevation_1 == elevation_2:
+        return distance_2d, distance_2d
+
+    # Haversine is used for distant points (and there elevation is ignored):
+    if abs(latitude_1 - latitude_2) > .2 or abs(longitude_1 - longitude_2) > .2:
+        return distance_2d, distance_2d
+
+    return distance_2d, mod_math.sqrt(distance_2d ** 2 + (elevation_1 - elevation_2) ** 2)
+
+
+def haversine_distances(latitudes: Sequence[float], longitudes: Sequence[float]) -> Any:
+    """
+    Haversine distances (meters) between consecutive points given as arrays
+    (or lists) of latitudes and longitudes. The i-th result is the
+    haversine_distance() between points i+1 and i, so the result has one
+    element less than the input.
+
+    With numpy the computation is vectorized and the result is a numpy
+    array (equal to the haversine_distance() results up to the last digit
+    of floating point rounding). Without numpy the result is a list.
+    """
+    if mod_numpy is None:
+        return [haversine_distance(latitudes[i], longitudes[i], latitudes[i - 1], longitudes[i - 1])
+                for i in range(1, len(latitudes))]
+
+    lats = mod_numpy.asarray(latitudes, dtype=mod_numpy.float64)
+    lons = mod_numpy.asarray(longitudes, dtype=mod_numpy.float64)
+    if len(lats) < 2:
+        return mod_numpy.zeros(0, dtype=mod_numpy.float64)
+    return _numpy_haversine_distance(lats[1:], lons[1:], lats[:-1], lons[:-1])
+
+
+def _numpy_haversine_distance(latitude_1: Any, longitude_1: Any, latitude_2: Any, longitude_2: Any) -> Any:
+    """ haversine_distance() for numpy arrays, same formula and operations order """
+    d_lon = mod_numpy.radians(longitude_1 - longitude_2)
+    lat1 = mod_numpy.radians(latitude_1)
+    lat2 = mod_numpy.radians(latitude_2)
+    d_lat = lat1 - lat2
+
+    a = mod_numpy.power(mod_numpy.sin(d_lat/2), 2) + \
+        mod_numpy.power(mod_numpy.sin(d_lon/2), 2) * mod_numpy.cos(lat1) * mod_numpy.cos(lat2)
+    c = 2 * mod_numpy.arcsin(mod_numpy.sqrt(a))
+    return EARTH_RADIUS * c
+
+
+def distances(latitudes: Sequence[float], longitudes: Sequence[float], elevations: Optional[Sequence[Optional[float]]]=None,
+              haversine: bool=False) -> Any:
+    """
+    Distances (meters) between consecutive points given as arrays (or
+    lists) of latitudes, longitudes and (optionally) elevations. The i-th
+    result is the distance() between points i+1 and i, so the result has one
+    element less than the input. That is the same as location.distance_3d(previous)
+    (or distance_2d() if elevations are not given) for every pair of
+    consecutive points.
+
+    Missing elevations may be None (or NaN, or masked in a numpy masked
+    array), for those steps the 2d distance is used (as in distance()).
+
+    With numpy the computation is vectorized and the result is a numpy
+    array, without numpy the result is a list. The flat-earth
+    approximation (and its haversine fallback for points more than 0.2
+    degrees apart) is the one used in distance(), the results are equal up
+    to floating point rounding.
+    """
+    if mod_numpy is None:
+        return [distance(latitudes[i], longitudes[i], elevations[i] if elevations is not None else None,
+                         latitudes[i - 1], longitudes[i - 1], elevations[i - 1] if elevations is not None else None,
+                         haversine)
+                for i in range(1, len(latitudes))]
+
+    lats = mod_numpy.asarray(latitudes, dtype=mod_numpy.float64)
+    lons = mod_numpy.asarray(longitudes, dtype=mod_numpy.float64)
+    if len(lats) < 2:
+        return mod_numpy.zeros(0, dtype=mod_numpy.float64)
+
+    if haversine:
+        return _numpy_haversine_distance(lats[1:], lons[1:], lats[:-1], lons[:-1])
+
+    latitude_1, latitude_2 = lats[1:], lats[:-1]
+    longitude_1, longitude_2 = lons[1:], lons[:-1]
+
+    coef = mod_numpy.cos(mod_numpy.radians(latitude_1))
+    x = latitude_1 - latitude_2
+    y = (longitude_1 - longitude_2) * coef
+
+    result = mod_numpy.sqrt(x * x + y * y) * ONE_DEGREE
+
+    if elevations is not None:
+        if isinstance(elevations, mod_numpy.ma.MaskedArray):
+            eles = elevations.astype(mod_numpy.float64).filled(mod_numpy.nan)
+        else:
+            eles = mod_numpy.array(elevations, dtype=mod_numpy.float64)
+        d_ele = eles[1:] - eles[:-1]
+        with_elevation = ~mod_numpy.isnan(d_ele) & (d_ele != 0)
+        result[with_elevation] = mod_numpy.sqrt(mod_numpy.power(result[with_elevation], 2) + mod_numpy.power(d_ele[with_elevation], 2))
+
+    # If points too distant -- compute haversine distance:
+    too_distant = mod_numpy.flatnonzero((mod_numpy.abs(x) > .2) | (mod_numpy.abs(longitude_1 - longitude_2) > .2))
+    if len(too_distant):
+        result[too_distant] = _numpy_haversine_distance(latitude_1[too_distant], longitude_1[too_distant],
+                                                        latitude_2[too_distant], longitude_2[too_distant])
+
+    return result
+
+
 def elevation_angle(location1: "Location", location2: "Location", radians: float=False) -> Optional[float]:
     """ Uphill/downhill angle between two locations. """
     if location1.elevation is None or location2.elevation is None:
@@ -312,46 +560,76 @@ def get_line_equation_coefficients(location1: "Location", location2: "Location")
 
 
 def simplify_polyline(points: List["Location"], max_distance: Optional[float]) -> List["Location"]:
-    """Does Ramer-Douglas-Peucker algorithm for simplification of polyline """
+    """
+    Does Ramer-Douglas-Peucker algorithm for simplification of polyline.
+
+    Ranges of points still to be simplified are kept on a stack (no
+    recursion and no copying of point lists), so this works for very long
+    polylines.
+    """
 
     _max_distance = max_distance if max_distance is not None else 10
 
     if len(points) < 3:
         return points
 
-    begin, end = points[0], points[-1]
-
-    # Use a "normal" line just to detect the most distant point (not its real distance)
-    # this is because this is faster to compute than calling distance_from_line() for
-    # every point.
-    #
-    # This is an approximation and may have some errors near the poles and if
-    # the points are too distant, but it should be good enough for most use
-    # cases...
-    a, b, c = get_line_equation_coefficients(begin, end)
-
-    # Initialize to safe values
-    tmp_max_distance: float = 0
-    tmp_max_distance_position = 1
-    
-    # Check distance of all points between begin and end, exclusive
-    for point_no, point in enumerate(points[1:-1], 1):
-        d = abs(a * point.latitude + b * point.longitude + c)
-        if d > tmp_max_distance:
-            tmp_max_distance = d
-            tmp_max_distance_position = point_no
-
-    # Now that we have the most distance point, compute its real distance:
-    real_max_distance = distance_from_line(points[tmp_max_distance_position], begin, end)
-
-    # If furthest point is less than max_distance, remove all points between begin and end
-    if real_max_distance is not None and real_max_distance < _max_distance:
-        return [begin, end]
-    
-    # If furthest point is more than max_distance, use it as anchor and run
-    # function again using (begin to anchor) and (anchor to end), remove extra anchor
-    return (simplify_polyline(points[:tmp_max_distance_position + 1], _max_distance) +
-            simplify_polyline(points[tmp_max_distance_position:], _max_distance)[1:])
+    latitudes = [point.latitude for point in points]
+    longitudes = [point.longitude for point in points]
+    numpy_latitudes, numpy_longitudes = None, None
+    if mod_numpy is not None:
+        numpy_latitudes = mod_numpy.array(latitudes, dtype=mod_numpy.float64)
+        numpy_longitudes = mod_numpy.array(longitudes, dtype=mod_numpy.float64)
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+
+    # (first, last) point numbers of the ranges to be simplified:
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+
+        begin, end = points[first], points[last]
+
+        # Use a "normal" line just to detect the most distant point (not its real distance)
+        # this is because this is faster to compute than calling distance_from_line() for
+        # every point.
+        #
+        # This is an approximation and may have some errors near the poles and if
+        # the points are too distant, but it should be good enough for most use
+        # cases...
+        a, b, c = get_line_equation_coefficients(begin, end)
+
+        # Check distance of all points between begin and end, exclusive
+        if numpy_latitudes is not None and last - first > 64:
+            distances = abs(a * numpy_latitudes[first + 1:last] + b * numpy_longitudes[first + 1:last] + c)
+            distances[mod_numpy.isnan(distances)] = 0
+            tmp_max_distance_position = first + 1 + int(mod_numpy.argmax(distances))
+        else:
+            # Initialize to safe values
+            tmp_max_distance: float = 0
+            tmp_max_distance_position = first + 1
+            for point_no in range(first + 1, last):
+                d = abs(a * latitudes[point_no] + b * longitudes[point_no] + c)
+                if d > tmp_max_distance:
+                    tmp_max_distance = d
+                    tmp_max_distance_position = point_no
+
+        # Now that we have the most distance point, compute its real distance:
+        real_max_distance = distance_from_line(points[tmp_max_distance_position], begin, end)
+
+        # If furthest point is less than max_distance, remove all points between begin and end
+        if real_max_distance is not None and real_max_distance < _max_distance:
+            continue
+
+        # If furthest point is more than max_distance, use it as anchor and
+        # simplify (begin to anchor) and (anchor to end)
+        keep[tmp_max_distance_position] = True
+        stack.append((tmp_max_distance_position, last))
+        stack.append((first, tmp_max_distance_position))
+
+    return [point for point, kept in zip(points, keep) if kept]
 
 
 class Location:
@@ -527,3 +805,217 @@ class LocationDelta:
         if hasattr(self, 'distance'):
             return self.distance == other.distance and self.angle_from_north == other.angle_from_north
         return self.latitude_diff == other.latitude_diff and self.longitude_diff == other.longitude_diff
+
+
+class SpatialIndex:
+    """
+    Grid based spatial index of locations. Used to find the nearest location
+    (or all the locations within a distance) without computing the distance
+    to every location.
+
+    The results are exactly the same as with a linear search, because the
+    distance is computed for every candidate location. Grid cells are skipped
+    only when no location in them can be nearer (the lower bound used for
+    that is valid for both the flat-earth approximation and haversine).
+    """
+
+    def __init__(self, locations: Sequence[Location]) -> None:
+        self.locations = list(locations)
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+        if not self.locations:
+            return
+
+        latitudes = [location.latitude for location in self.locations]
+        longitudes = [location.longitude for location in self.locations]
+        self.min_latitude, self.max_latitude = min(latitudes), max(latitudes)
+        self.min_longitude, self.max_longitude = min(longitudes), max(longitudes)
+        self.min_cos = max(0., min(mod_math.cos(mod_math.radians(self.min_latitude)),
+                                   mod_math.cos(mod_math.radians(self.max_latitude))))
+
+        # Tracks are lines, so the cell size is a few average steps between
+        # points, but not more than needed for a few points per cell if the
+        # locations are scattered:
+        locations_no = len(self.locations)
+        average_step = 0.
+        if locations_no > 1:
+            average_step = sum(max(abs(latitudes[i] - latitudes[i - 1]), abs(longitudes[i] - longitudes[i - 1]))
+                               for i in range(1, locations_no)) / (locations_no - 1)
+        area = max(self.max_latitude - self.min_latitude, average_step) * \
+               max(self.max_longitude - self.min_longitude, average_step)
+        self.cell_size = 2 * mod_math.sqrt(area / locations_no)
+        if average_step:
+            self.cell_size = min(self.cell_size, 4 * average_step)
+        if not self.cell_size:
+            self.cell_size = 1.
+
+        for location_no, (latitude, longitude) in enumerate(zip(latitudes, longitudes)):
+            self.cells.setdefault(self._cell(latitude, longitude), []).append(location_no)
+
+        self.rows = self._cell(self.max_latitude, self.max_longitude)[0] + 1
+        self.columns = self._cell(self.max_latitude, self.max_longitude)[1] + 1
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (int(mod_math.floor((latitude - self.min_latitude) / self.cell_size)),
+                int(mod_math.floor((longitude - self.min_longitude) / self.cell_size)))
+
+    def _lower_bound(self, location: Location, latitude_margin: float, longitude_margin: float) -> float:
+        """
+        Minimum distance (meters) between location and any indexed location
+        which is at least latitude_margin *or* longitude_margin (degrees) away.
+        """
+        # Rounding errors when assigning cells:
+        latitude_margin = max(0., latitude_margin - 1e-9)
+        longitude_margin = max(0., longitude_margin - 1e-9)
+
+        result = latitude_margin * ONE_DEGREE
+
+        max_longitude_diff = max(abs(location.longitude - self.min_longitude),
+                                 abs(self.max_longitude - location.longitude))
+        if longitude_margin <= max_longitude_diff:
+            # Both distance formulas are >= 2R * cos(latitude) * sin(longitude_diff / 2)
+            cos = max(0., min(self.min_cos, mod_math.cos(mod_math.radians(location.latitude))))
+            sin = min(mod_math.sin(mod_math.radians(min(longitude_margin, 360.)) / 2),
+                      mod_math.sin(mod_math.radians(min(max_longitude_diff, 360.)) / 2))
+            result = min(result, 2 * EARTH_RADIUS * cos * max(0., sin))
+
+        return result * (1 - 1e-9) - 1e-6
+
+    def nearest(self, location: Location,
+                distance_function: Callable[[Location, Location], Optional[float]]) -> Optional[int]:
+        """
+        Index of the location nearest to the given location. When more
+        locations are at the same distance the first one is returned.
+
+        Parameters
+        ----------
+        location : Location
+            The location to search for
+        distance_function : callable
+            Called with (indexed_location, location), must return a distance
+            computed with distance() (like Location.distance_2d() or
+            Location.distance_3d() do)
+        """
+        if not self.locations:
+            return None
+
+        row, column = self._cell(location.latitude, location.longitude)
+
+        best_distance: Optional[float] = None
+        best_location_no: Optional[int] = None
+
+        # Far from the locations most of the visited cells are empty, when
+        # there were more of them than non empty cells a linear search is
+        # faster:
+        visited_cells = 0
+
+        # Start with the first ring of cells which intersects the grid:
+        ring = max(0, -row, row - self.rows + 1, -column, column - self.columns + 1)
+        while True:
+            for cell in self._ring_cells(row, column, ring):
+                visited_cells += 1
+                for location_no in self.cells.get(cell, ()):
+                    distance = distance_function(self.locations[location_no], location)
+                    if distance is None:
+                        continue
+                    if best_distance is None or distance < best_distance or \
+                            (distance == best_distance and location_no < best_location_no): # type: ignore
+                        best_distance, best_location_no = distance, location_no
+
+            below, above = row - ring <= 0, row + ring >= self.rows - 1
+            left, right = column - ring <= 0, column + ring >= self.columns - 1
+            if below and above and left and right:
+                return best_location_no
+
+            if best_distance is not None:
+                # Locations outside the searched block of cells:
+                latitude_margin = min(mod_math.inf if below else location.latitude - (self.min_latitude + (row - ring) * self.cell_size),
+                                      mod_math.inf if above else self.min_latitude + (row + ring + 1) * self.cell_size - location.latitude)
+                longitude_margin = min(mod_math.inf if left else location.longitude - (self.min_longitude + (column - ring) * self.cell_size),
+                                       mod_math.inf if right else self.min_longitude + (column + ring + 1) * self.cell_size - location.longitude)
+                if self._lower_bound(location, latitude_margin, longitude_margin) > best_distance:
+                    return best_location_no
+
+            if visited_cells > len(self.cells):
+                return self._nearest_linear(location, distance_function)
+
+            ring += 1
+
+    def _nearest_linear(self, location: Location,
+                        distance_function: Callable[[Location, Location], Optional[float]]) -> Optional[int]:
+        """ nearest() computing the distance to every location """
+        best_distance: Optional[float] = None
+        best_location_no: Optional[int] = None
+        for location_no, indexed_location in enumerate(self.locations):
+            distance = distance_function(indexed_location, location)
+            if distance is not None and (best_distance is None or distance < best_distance):
+                best_distance, best_location_no = distance, location_no
+        return best_location_no
+
+    def _ring_cells(self, row: int, column: int, ring: int) -> Iterator[Tuple[int, int]]:
+        """ Cells (inside the grid) at exactly ring cells from (row, column) """
+        min_row, max_row = max(row - ring, 0), min(row + ring, self.rows - 1)
+        min_column, max_column = max(column - ring, 0), min(column + ring, self.columns - 1)
+        if min_row > max_row or min_column > max_column:
+            return
+        if ring == 0:
+            yield row, column
+            return
+        for r in range(min_row, max_row + 1):
+            if r == row - ring or r == row + ring:
+                for c in range(min_column, max_column + 1):
+                    yield r, c
+            else:
+                if column - ring >= 0:
+                    yield r, column - ring
+                if column + ring < self.columns:
+                    yield r, column + ring
+
+    def within(self, location: Location, max_distance: float,
+               distance_function: Callable[[Location, Location], Optional[float]]) -> List[Tuple[int, float]]:
+        """
+        Returns (index, distance) of all the locations nearer than
+        max_distance to location, ordered by index. See nearest() for
+        distance_function.
+        """
+        if not self.locations or max_distance <= 0:
+            return []
+
+        latitude_diff = max_distance / ONE_DEGREE + 1e-9
+        min_row, _ = self._cell(location.latitude - latitude_diff, location.longitude)
+        max_row, _ = self._cell(location.latitude + latitude_diff, location.longitude)
+        min_row, max_row = max(min_row, 0), min(max_row, self.rows - 1)
+
+        min_column, max_column = 0, self.columns - 1
+        cos = max(0., min(self.min_cos, mod_math.cos(mod_math.radians(location.latitude))))
+        max_longitude_diff = max(abs(location.longitude - self.min_longitude),
+                                 abs(self.max_longitude - location.longitude))
+        if cos > 0 and max_distance < 2 * EARTH_RADIUS * cos:
+            longitude_diff = mod_math.degrees(2 * mod_math.asin(max_distance / (2 * EARTH_RADIUS * cos))) * (1 + 1e-9) + 1e-9
+            # Longitude differences near 360 degrees are small distances:
+            if max_longitude_diff < 360 - longitude_diff:
+                _, min_column = self._cell(location.latitude, location.longitude - longitude_diff)
+                _, max_column = self._cell(location.latitude, location.longitude + longitude_diff)
+                min_column, max_column = max(min_column, 0), min(max_column, self.columns - 1)
+
+        if min_row > max_row or min_column > max_column:
+            return []
+
+        cells: Iterable[Tuple[int, int]]
+        if (max_row - min_row + 1) * (max_column - min_column + 1) > len(self.cells):
+            cells = [cell for cell in self.cells
+                     if min_row <= cell[0] <= max_row and min_column <= cell[1] <= max_column]
+        else:
+            cells = [(r, c) for r in range(min_row, max_row + 1) for c in range(min_column, max_column + 1)]
+
+        result = []
+        for cell in cells:
+            for location_no in self.cells.get(cell, ()):
+                distance = distance_function(self.locations[location_no], location)
+                if distance is not None and distance < max_distance:
+                    result.append((location_no, distance))
+        result.sort()
+        return result
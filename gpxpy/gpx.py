@@ -18,9 +18,12 @@ GPX related stuff
 
 import logging as mod_logging
 import math as mod_math
+import bisect as mod_bisect
 import collections as mod_collections
 import copy as mod_copy
 import datetime as mod_datetime
+import itertools as mod_itertools
+import operator as mod_operator
 
 from . import utils as mod_utils
 from . import geo as mod_geo
@@ -138,6 +141,48 @@ class PointData(NamedTuple):
     track_no: int
     segment_no: int
     point_no: int
+class SegmentSteps(NamedTuple):  # this is what GPXTrackSegment.get_steps() returns
+    distances_2d: List[float]
+    distances_3d: List[float]
+    distances: List[float]
+    cumulative_2d: List[float]
+    cumulative_3d: List[float]
+    seconds: List[Optional[float]]
+    speeds: List[Optional[float]]
+class FlatPoints(NamedTuple):  # this is what GPX.get_flat_points() returns
+    points: Tuple["GPXTrackPoint", ...]
+    track_nos: Tuple[int, ...]
+    segment_nos: Tuple[int, ...]
+    point_nos: Tuple[int, ...]
+class Statistics(NamedTuple):
+    length_2d: float
+    length_3d: float
+    moving_data: MovingData
+    raw_moving_data: MovingData
+    uphill_downhill: UphillDownhill
+    elevation_extremes: MinimumMaximum
+    time_bounds: TimeBounds
+    bounds: Optional["GPXBounds"]
+    points_no: int
+    average_point_distance: float
+class TrackPointRecord(NamedTuple):  # this is what gpxpy.iter_points() iterates over
+    latitude: float
+    longitude: float
+    elevation: Optional[float]
+    time: Optional[mod_datetime.datetime]
+    track_no: int
+    segment_no: int
+    point_no: int
+class ParseCacheInfo(NamedTuple):  # this is what ParseCache.cache_info() returns
+    hits: int
+    misses: int
+    entries: int
+    size: int
+class ParseResult(NamedTuple):  # this is what gpxpy.parse_many() iterates over
+    path: Any
+    gpx: Optional["GPX"]
+    statistics: Optional[Statistics]
+    exception: Optional[Exception]
 
 
 class GPXException(Exception):
@@ -148,6 +193,24 @@ class GPXException(Exception):
     pass
 
 
+class _Cache(dict):
+    """
+    Data computed from the points (like indexes), stored in the private
+    _cache slot of GPX objects. The cache is never copied, deepcopy() and
+    pickle give an empty cache.
+    """
+
+    def __copy__(self) -> "_Cache":
+        return _Cache()
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "_Cache":
+        return _Cache()
+
+    def __reduce__(self) -> Any:
+        return _Cache, ()
+
+
+
 class GPXBounds:
     gpx_10_fields = gpx_11_fields = [
             mod_gpxfield.GPXField('min_latitude', attribute='minlat', type=mod_gpxfield.FLOAT_TYPE),
@@ -184,6 +247,75 @@ class GPXBounds:
             self._min(self.min_longitude, bounds.min_longitude),
             self._max(self.max_longitude, bounds.max_longitude))
 
+def merge_statistics(statistics: List[Statistics]) -> Statistics:
+    """
+    Merge statistics of (consecutive) parts in the statistics of the whole
+    the same way GPXTrack/GPX methods merge the results of their segments
+    and tracks.
+    """
+    length_2d: float = 0
+    length_3d: float = 0
+    moving_time, stopped_time, moving_distance, stopped_distance = 0., 0., 0., 0.
+    raw_moving_time, raw_stopped_time, raw_moving_distance, raw_stopped_distance = 0., 0., 0., 0.
+    max_speed, raw_max_speed = 0., 0.
+    uphill: float = 0
+    downhill: float = 0
+    elevations: List[float] = []
+    start_time, end_time = None, None
+    bounds: Optional[GPXBounds] = None
+    points_no = 0
+
+    for part in statistics:
+        if part.length_2d:
+            length_2d += part.length_2d
+        if part.length_3d:
+            length_3d += part.length_3d
+
+        moving_time += part.moving_data.moving_time
+        stopped_time += part.moving_data.stopped_time
+        moving_distance += part.moving_data.moving_distance
+        stopped_distance += part.moving_data.stopped_distance
+        if part.moving_data.max_speed is not None and part.moving_data.max_speed > max_speed:
+            max_speed = part.moving_data.max_speed
+
+        raw_moving_time += part.raw_moving_data.moving_time
+        raw_stopped_time += part.raw_moving_data.stopped_time
+        raw_moving_distance += part.raw_moving_data.moving_distance
+        raw_stopped_distance += part.raw_moving_data.stopped_distance
+        if part.raw_moving_data.max_speed is not None and part.raw_moving_data.max_speed > raw_max_speed:
+            raw_max_speed = part.raw_moving_data.max_speed
+
+        uphill += part.uphill_downhill.uphill or .0
+        downhill += part.uphill_downhill.downhill or .0
+
+        for elevation in part.elevation_extremes:
+            if elevation is not None:
+                elevations.append(elevation)
+
+        if not start_time and part.time_bounds.start_time:
+            start_time = part.time_bounds.start_time
+        if part.time_bounds.end_time:
+            end_time = part.time_bounds.end_time
+
+        if bounds is None:
+            bounds = part.bounds
+        elif part.bounds:
+            bounds = bounds.max_bounds(part.bounds)
+
+        points_no += part.points_no
+
+    return Statistics(length_2d,
+                      length_3d,
+                      MovingData(moving_time, stopped_time, moving_distance, stopped_distance, max_speed),
+                      MovingData(raw_moving_time, raw_stopped_time, raw_moving_distance, raw_stopped_distance, raw_max_speed),
+                      UphillDownhill(uphill, downhill),
+                      MinimumMaximum(min(elevations), max(elevations)) if elevations else MinimumMaximum(None, None),
+                      TimeBounds(start_time, end_time),
+                      bounds,
+                      points_no,
+                      length_2d / points_no if points_no else 0.)
+
+
 class GPXXMLSyntaxException(GPXException):
     """
     Exception used when the XML syntax is invalid.
@@ -194,6 +326,10 @@ class GPXXMLSyntaxException(GPXException):
         GPXException.__init__(self, message)
         self.__cause__ = original_exception
 
+    def __reduce__(self) -> Any:
+        # Needed to send the exception between processes (see gpxpy.parse_many())
+        return self.__class__, (str(self), self.__cause__)
+
 
 class GPXWaypoint(mod_geo.Location):
     gpx_10_fields = GPX_10_POINT_FIELDS
@@ -695,17 +831,60 @@ class GPXTrackSegment:
             mod_gpxfield.GPXExtensionsField('extensions', is_list=True),
     ]
 
-    __slots__ = ('points', 'extensions', )
+    gpx_lazy_field = 'points'
+
+    __slots__ = ('points', 'extensions', '_cache', '_lazy')
 
     def __init__(self, points: Optional[List[GPXTrackPoint]]=None) -> None:
         self.points: List[GPXTrackPoint] = points if points else []
         self.extensions: List[Any] = []
+        self._cache = _Cache()
+        self._lazy: Any = None
+
+    def __getattr__(self, name: str) -> Any:
+        # Called only for unset attributes, i.e. the points of a lazily
+        # parsed segment (see GPXParser):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return mod_gpxfield.decode_lazy_field(self, name)
+
+    def invalidate_cache(self) -> None:
+        """
+        Drops the data cached for this segment (and the indexes of the GPX
+        containing it). Methods changing the points call it automatically and
+        added or removed points are detected (see _get_cache()), but call it
+        after changing the points directly, for example after
+        segment.points[i] = point or point.latitude = x.
+        """
+        self._cache = _Cache()
+
+    def _get_cache(self) -> _Cache:
+        """
+        Returns the cache for data computed from the points. The cache is
+        replaced with an empty one if the points list was replaced or points
+        were added or removed since the data was computed. This costs O(1),
+        other changes of the points are not detected (see invalidate_cache()).
+        """
+        points = self.points
+        points_no = len(points or [])
+        cached_points = self._cache.get('points')
+        if cached_points is None:
+            # Nothing computed yet:
+            self._cache['points'] = (points, points_no)
+        elif cached_points[0] is not points or cached_points[1] != points_no:
+            cache = _Cache(points=(points, points_no))
+            # The bounds are updated with the appended points (see get_bounds()):
+            if cached_points[0] is points and 'bounds' in self._cache:
+                cache['bounds'] = self._cache['bounds']
+            self._cache = cache
+        return self._cache
 
     def simplify(self, max_distance: Optional[float]=None) -> None:
         """
         Simplify using the Ramer-Douglas-Peucker algorithm: http://en.wikipedia.org/wiki/Ramer-Douglas-Peucker_algorithm
         """
         self.points = mod_geo.simplify_polyline(self.points, max_distance) # type: ignore
+        self.invalidate_cache()
 
     def reduce_points(self, min_distance: float) -> None:
         """
@@ -728,6 +907,7 @@ class GPXTrackSegment:
                 reduced_points.append(point)
 
         self.points = reduced_points
+        self.invalidate_cache()
 
     def adjust_time(self, delta: mod_datetime.timedelta) -> None:
         """
@@ -741,16 +921,19 @@ class GPXTrackSegment:
         """
         for track_point in self.points:
             track_point.adjust_time(delta)
+        self.invalidate_cache()
 
     def remove_time(self) -> None:
         """ Removes time data for all points in the segment. """
         for track_point in self.points:
             track_point.remove_time()
+        self.invalidate_cache()
 
     def remove_elevation(self) -> None:
         """ Removes elevation data for all points in the segment. """
         for track_point in self.points:
             track_point.remove_elevation()
+        self.invalidate_cache()
 
     def length_2d(self) -> Optional[float]:
         """
@@ -762,7 +945,8 @@ class GPXTrackSegment:
         length : float
             Length returned in meters
         """
-        return mod_geo.length_2d(self.points) # type: ignore
+        cumulative = self.get_steps().cumulative_2d
+        return cumulative[-1] if cumulative else 0
 
     def length_3d(self) -> float:
         """
@@ -774,7 +958,75 @@ class GPXTrackSegment:
         length : float
             Length returned in meters
         """
-        return mod_geo.length_3d(self.points) # type: ignore
+        cumulative = self.get_steps().cumulative_3d
+        return cumulative[-1] if cumulative else 0
+
+    def get_steps(self) -> SegmentSteps:
+        """
+        Computes the distances, times and speeds between consecutive points.
+        The result is cached (see _get_cache() and invalidate_cache()), so
+        length_2d(), length_3d(), get_moving_data(), get_statistics()... don't
+        compute the same distances again.
+
+        Returns
+        ----------
+        steps : SegmentSteps named tuple
+            distances_2d, distances_3d : list of float
+                The i-th element is the 2D/3D distance (meters) between
+                points i and i+1
+            distances : list of float
+                3D distance if both points have elevations, 2D otherwise
+                (the distance used in get_moving_data())
+            cumulative_2d, cumulative_3d : list of float
+                2D/3D distance (meters) from the first point to every point,
+                the last element is the length of the segment
+            seconds : list of float
+                Time (seconds) between points i and i+1, None if one of them
+                has no time
+            speeds : list of float
+                distances[i] / seconds[i] (m/s), None if seconds[i] isn't
+                positive
+        """
+        return self._get_steps(self._get_cache())
+
+    def _get_steps(self, cache: _Cache) -> SegmentSteps:
+        """ get_steps() with the cache already returned by _get_cache() """
+        steps = cache.get('steps')
+        if steps is not None:
+            return steps # type: ignore
+
+        distances_2d: List[float] = []
+        distances_3d: List[float] = []
+        distances: List[float] = []
+        cumulative_2d: List[float] = [0.] if self.points else []
+        cumulative_3d: List[float] = [0.] if self.points else []
+        seconds: List[Optional[float]] = []
+        speeds: List[Optional[float]] = []
+
+        length_2d = 0.
+        length_3d = 0.
+        for previous, point in zip(self.points, self.points[1:]):
+            distance_2d, distance_3d = mod_geo.distance_2d_3d(point.latitude, point.longitude, point.elevation,
+                                                              previous.latitude, previous.longitude, previous.elevation)
+            distance = distance_3d if point.elevation and previous.elevation else distance_2d
+            distances_2d.append(distance_2d)
+            distances_3d.append(distance_3d)
+            distances.append(distance)
+            length_2d += distance_2d
+            length_3d += distance_3d
+            cumulative_2d.append(length_2d)
+            cumulative_3d.append(length_3d)
+            if point.time and previous.time:
+                step_seconds = mod_utils.total_seconds(point.time - previous.time)
+                seconds.append(step_seconds)
+                speeds.append(distance / step_seconds if step_seconds > 0 else None)
+            else:
+                seconds.append(None)
+                speeds.append(None)
+
+        steps = SegmentSteps(distances_2d, distances_3d, distances, cumulative_2d, cumulative_3d, seconds, speeds)
+        cache['steps'] = steps
+        return steps
 
     def move(self, location_delta: mod_geo.LocationDelta) -> None:
         """
@@ -788,6 +1040,7 @@ class GPXTrackSegment:
         """
         for track_point in self.points:
             track_point.move(location_delta)
+        self.invalidate_cache()
 
     def walk(self, only_points: bool=False) -> Iterator[Any]: # Union[GPXTrackPoint, Tuple[GPXTrackPoint, int]]]:
         """
@@ -805,11 +1058,11 @@ class GPXTrackSegment:
         point_no: int
             Not included in yield if only_points is true
         """
-        for point_no, point in enumerate(self.points if self.points else []):
-            if only_points:
-                yield point
-            else:
-                yield point, point_no
+        points = self.points if self.points else []
+        if only_points:
+            yield from points
+        else:
+            yield from zip(points, mod_itertools.count())
 
     def get_points_no(self) -> int:
         """
@@ -840,6 +1093,7 @@ class GPXTrackSegment:
     def join(self, track_segment: "GPXTrackSegment") -> None:
         """ Joins with another segment """
         self.points += track_segment.points
+        self.invalidate_cache()
 
     def remove_point(self, point_no: int) -> None:
         """ Removes a point specified by index from the segment """
@@ -850,6 +1104,7 @@ class GPXTrackSegment:
         part_2 = self.points[point_no + 1:]
 
         self.points = part_1 + part_2
+        self.invalidate_cache()
 
     def get_moving_data(self, stopped_speed_threshold: Optional[float]=None, raw: bool=False, speed_extreemes_percentiles: float=IGNORE_TOP_SPEED_PERCENTILES, ignore_nonstandard_distances: bool = True) -> Optional[MovingData]:
         """
@@ -888,6 +1143,28 @@ class GPXTrackSegment:
             speed_extreemes_percentiles=0
             ignore_nonstandard_distances=False
 
+        moving_time, stopped_time, moving_distance, stopped_distance, get_max_speed = \
+            self._get_moving_steps(stopped_speed_threshold, self._get_cache())
+        max_speed = get_max_speed(speed_extreemes_percentiles, ignore_nonstandard_distances)
+
+        return MovingData(moving_time, stopped_time, moving_distance, stopped_distance, max_speed or 0.0)
+
+    def _get_moving_steps(self, stopped_speed_threshold: float, cache: _Cache) -> Tuple[float, float, float, float, Callable[[float, bool], Optional[float]]]:
+        """
+        Moving time, stopped time, moving distance, stopped distance (see
+        get_moving_data()) and a function computing the max speed with the
+        given speed_extreemes_percentiles and ignore_nonstandard_distances.
+
+        If numpy is available this is computed with arrays, with the same
+        results. cache is the cache returned by _get_cache().
+        """
+        if mod_geo.mod_numpy is not None:
+            distances, seconds = self._get_step_arrays(cache)
+            moving_time, stopped_time, moving_distance, stopped_distance, speeds, speed_distances = \
+                mod_geo.calculate_moving_data_arrays(distances, seconds, stopped_speed_threshold)
+            return moving_time, stopped_time, moving_distance, stopped_distance, \
+                lambda percentiles, ignore_nonstandard_distances: mod_geo.calculate_max_speed_arrays(speeds, speed_distances, percentiles, ignore_nonstandard_distances)
+
         moving_time = 0.
         stopped_time = 0.
 
@@ -896,39 +1173,108 @@ class GPXTrackSegment:
 
         speeds_and_distances = []
 
-        for previous, point in zip(self.points, self.points[1:]):
+        steps = self._get_steps(cache)
+        for distance, step_seconds, speed in zip(steps.distances, steps.seconds, steps.speeds):
 
             # Won't compute max_speed for first and last because of common GPS
             # recording errors, and because smoothing don't work well for those
             # points:
-            if point.time and previous.time:
-                timedelta = point.time - previous.time
-
-                if point.elevation and previous.elevation:
-                    distance = point.distance_3d(previous)
+            if speed is not None and distance:
+                # TODO: compute threshold in m/s instead this to kmh every time:
+                speed_kmh = (distance / 1000) / (step_seconds / 60 ** 2) # type: ignore
+                if speed_kmh <= stopped_speed_threshold:
+                    stopped_time += step_seconds # type: ignore
+                    stopped_distance += distance
                 else:
-                    distance = point.distance_2d(previous)
-
-                seconds = mod_utils.total_seconds(timedelta)
-                speed_kmh: float = 0
-                if seconds > 0 and distance is not None:
-                    # TODO: compute threshold in m/s instead this to kmh every time:
-                    speed_kmh = (distance / 1000) / (seconds / 60 ** 2)
-                    if distance:
-                        if speed_kmh <= stopped_speed_threshold:
-                            stopped_time += seconds
-                            stopped_distance += distance
-                        else:
-                            moving_time += seconds
-                            moving_distance += distance
-                        if moving_time:
-                            speeds_and_distances.append((distance / seconds, distance, ))
-
-        max_speed = None
-        if speeds_and_distances:
-            max_speed = mod_geo.calculate_max_speed(speeds_and_distances, speed_extreemes_percentiles, ignore_nonstandard_distances)
+                    moving_time += step_seconds # type: ignore
+                    moving_distance += distance
+                if moving_time:
+                    speeds_and_distances.append((speed, distance, ))
 
-        return MovingData(moving_time, stopped_time, moving_distance, stopped_distance, max_speed or 0.0)
+        def get_max_speed(percentiles: float, ignore_nonstandard_distances: bool) -> Optional[float]:
+            if not speeds_and_distances:
+                return None
+            return mod_geo.calculate_max_speed(speeds_and_distances, percentiles, ignore_nonstandard_distances)
+
+        return moving_time, stopped_time, moving_distance, stopped_distance, get_max_speed
+
+    def _get_step_arrays(self, cache: _Cache) -> Tuple[Any, Any]:
+        """ get_steps() distances and seconds (NaN if unknown) as (cached) numpy arrays """
+        arrays = cache.get('step_arrays')
+        if arrays is not None:
+            return arrays # type: ignore
+
+        steps = self._get_steps(cache)
+        arrays = (mod_geo.mod_numpy.array(steps.distances, dtype=mod_geo.mod_numpy.float64),
+                  mod_geo.mod_numpy.array(steps.seconds, dtype=mod_geo.mod_numpy.float64))
+        cache['step_arrays'] = arrays
+        return arrays
+
+    def get_statistics(self, stopped_speed_threshold: Optional[float]=None, speed_extreemes_percentiles: float=IGNORE_TOP_SPEED_PERCENTILES,
+                       ignore_nonstandard_distances: bool=True) -> Statistics:
+        """
+        Computes (in a single pass through the points) the results of
+        length_2d(), length_3d(), get_moving_data() (both filtered and raw),
+        get_uphill_downhill(), get_elevation_extremes(), get_time_bounds(),
+        get_bounds(), get_points_no() and the average distance between
+        points.
+
+        The distances between points are computed only once (see
+        get_steps()).
+
+        Parameters
+        ----------
+        stopped_speed_threshold, speed_extreemes_percentiles, ignore_nonstandard_distances:
+            See get_moving_data()
+
+        Returns
+        ----------
+        statistics : Statistics named tuple
+        """
+        if not stopped_speed_threshold:
+            stopped_speed_threshold = DEFAULT_STOPPED_SPEED_THRESHOLD
+
+        length_2d: float = 0
+        length_3d: float = 0
+
+        elevations: List[Optional[float]] = []
+        start_time = None
+        end_time = None
+
+        for point in self.points:
+            elevations.append(point.elevation)
+            if point.time:
+                if not start_time:
+                    start_time = point.time
+                end_time = point.time
+
+        cache = self._get_cache()
+        steps = self._get_steps(cache)
+        if self.points:
+            length_2d = steps.cumulative_2d[-1]
+            length_3d = steps.cumulative_3d[-1]
+
+        moving_time, stopped_time, moving_distance, stopped_distance, get_max_speed = self._get_moving_steps(stopped_speed_threshold, cache)
+        max_speed = get_max_speed(speed_extreemes_percentiles, ignore_nonstandard_distances)
+        raw_max_speed = get_max_speed(0, False)
+
+        uphill, downhill = mod_geo.calculate_uphill_downhill(elevations) if self.points else (0, 0)
+        existing_elevations = [elevation for elevation in elevations if elevation is not None]
+
+        bounds = self._get_bounds(cache)
+
+        points_no = len(self.points)
+
+        return Statistics(length_2d,
+                          length_3d,
+                          MovingData(moving_time, stopped_time, moving_distance, stopped_distance, max_speed or 0.0),
+                          MovingData(moving_time, stopped_time, moving_distance, stopped_distance, raw_max_speed or 0.0),
+                          UphillDownhill(uphill, downhill),
+                          MinimumMaximum(min(existing_elevations), max(existing_elevations)) if existing_elevations else MinimumMaximum(None, None),
+                          TimeBounds(start_time, end_time),
+                          bounds,
+                          points_no,
+                          length_2d / points_no if points_no else 0.)
 
     def get_time_bounds(self) -> TimeBounds:
         """
@@ -969,13 +1315,28 @@ class GPXTrackSegment:
                 Minimum longitude of segment in decimal degrees [-180, 180]
             max_longitude : float
                 Maximum longitude of segment in decimal degrees [-180, 180]
+
+        The bounds are cached (see _get_cache() and invalidate_cache()), when
+        points are appended only the new points are checked.
         """
+        return self._get_bounds(self._get_cache())
+
+    def _get_bounds(self, cache: _Cache) -> Optional[GPXBounds]:
+        """ get_bounds() with the cache already returned by _get_cache() """
         min_lat = None
         max_lat = None
         min_lon = None
         max_lon = None
 
-        for point in self.points:
+        points = self.points or []
+        start = 0
+        cached = cache.get('bounds')
+        # If the last point of the cached bounds is still there, the only
+        # change can be new points after it:
+        if cached is not None and cached[0] <= len(points) and points[cached[0] - 1] is cached[1]:
+            start, _, min_lat, max_lat, min_lon, max_lon = cached
+
+        for point in points[start:]:
             if min_lat is None or point.latitude < min_lat:
                 min_lat = point.latitude
             if max_lat is None or point.latitude > max_lat:
@@ -985,6 +1346,9 @@ class GPXTrackSegment:
             if max_lon is None or point.longitude > max_lon:
                 max_lon = point.longitude
 
+        if points:
+            cache['bounds'] = (len(points), points[-1], min_lat, max_lat, min_lon, max_lon)
+
         if min_lat and max_lat and min_lon and max_lon:
             return GPXBounds(min_lat, max_lat, min_lon, max_lon)
         return None
@@ -1049,6 +1413,7 @@ class GPXTrackSegment:
         for track_point in self.points:
             if track_point.elevation is not None:
                 track_point.elevation += delta
+        self.invalidate_cache()
 
     def add_missing_data(self,
                          get_data_function: Callable[[GPXTrackPoint], Any],
@@ -1075,44 +1440,46 @@ class GPXTrackSegment:
         # Point (*with* data) before and after the interval:
         start_point = None
 
+        start_point_no = 0
+
         previous_point = None
-        for track_point in self.points:
+        for point_no, track_point in enumerate(self.points):
             data = get_data_function(track_point)
             if data is None and previous_point:
                 if not start_point:
                     start_point = previous_point
+                    start_point_no = point_no - 1
                 interval.append(track_point)
             else:
                 if interval and start_point:
-                    distances_ratios = self._get_interval_distances_ratios(interval, start_point, track_point)
+                    distances_ratios = self._get_interval_distances_ratios(start_point_no, point_no)
                     add_missing_function(interval, start_point, track_point, distances_ratios)
                     start_point = None
                     interval = []
             previous_point = track_point
 
-    def _get_interval_distances_ratios(self, interval: List[GPXTrackPoint], start: GPXTrackPoint, end: GPXTrackPoint) -> List[float]:
-        assert start, start
-        assert end, end
-        assert interval, interval
-        assert len(interval) > 0, interval
+        self.invalidate_cache()
 
+    def _get_interval_distances_ratios(self, start_point_no: int, end_point_no: int) -> List[float]:
+        """
+        Ratios of the 3D distances from the start point to the points between
+        start and end point (by their numbers) and the distance from start to
+        end.
+        """
+        assert start_point_no + 1 < end_point_no, (start_point_no, end_point_no)
+
+        steps = self.get_steps()
         distances = []
         distance_from_start: float = 0
-        previous_point = start
-        for point in interval:
-            dist = point.distance_3d(previous_point)
-            if dist is not None:
-                distance_from_start += dist
-                distances.append(distance_from_start)
-                previous_point = point
-
-        dist = interval[-1].distance_3d(end)
+        for step_no in range(start_point_no, end_point_no - 1):
+            distance_from_start += steps.distances_3d[step_no]
+            distances.append(distance_from_start)
+
+        dist = steps.distances_3d[end_point_no - 1]
         from_start_to_end = None
         if dist:
             from_start_to_end = distances[-1] + dist
 
-        assert len(interval) == len(distances)
-
         return [(distance / from_start_to_end) if from_start_to_end else 0
                 for distance in distances]
 
@@ -1189,37 +1556,124 @@ class GPXTrackSegment:
             return MinimumMaximum(None, None)
         return MinimumMaximum(min(elevations), max(elevations))
 
-    def get_location_at(self, time: mod_datetime.datetime) -> Optional[GPXTrackPoint]:
+    def _get_time_index(self) -> Tuple[List[mod_datetime.datetime], List[int], List[int]]:
         """
-        Gets approx. location at given time. Note that, at the moment this
-        method returns an instance of GPXTrackPoint in the future -- this may
-        be a mod_geo.Location instance with approximated latitude, longitude
-        and elevation!
+        Returns the (lazily built) time index: times and numbers of the points
+        with time later than the times of all previous points, and the numbers
+        of the previous points with time (-1 if none).
+
+        The first point with time >= t is always one of those points, so it
+        can be found with a binary search even if the times are not sorted.
         """
+        cache = self._get_cache()
+        index = cache.get('time_index')
+        if index is not None:
+            return index # type: ignore
+
+        times: List[mod_datetime.datetime] = []
+        point_nos: List[int] = []
+        previous_point_nos: List[int] = []
+        previous_point_no = -1
+        for point_no, point in enumerate(self.points):
+            if point.time:
+                if not times or point.time > times[-1]:
+                    times.append(point.time)
+                    point_nos.append(point_no)
+                    previous_point_nos.append(previous_point_no)
+                previous_point_no = point_no
+
+        index = (times, point_nos, previous_point_nos)
+        cache['time_index'] = index
+        return index
+
+    def _is_in_time_range(self, time: Optional[mod_datetime.datetime]) -> bool:
         if not self.points:
-            return None
+            return False
 
         if not time:
-            return None
+            return False
 
         first_time = self.points[0].time
         last_time = self.points[-1].time
 
         if not first_time and not last_time:
             log.debug('No times for track segment')
-            return None
+            return False
 
         if first_time and time and last_time and not first_time <= time <= last_time:
             log.debug(f'Not in track (search for:{time}, start:{first_time}, end:{last_time})')
+            return False
+
+        return True
+
+    def _get_location_at(self, index: Tuple[List[mod_datetime.datetime], List[int], List[int]],
+                         time: mod_datetime.datetime, position: int, interpolate: bool) -> Optional[GPXTrackPoint]:
+        """
+        index is the time index (see _get_time_index()) and position is the
+        position in it of the first time >= time
+        """
+        times, point_nos, previous_point_nos = index
+        if position >= len(times):
             return None
 
-        for point in self.points:
-            if point.time and time <= point.time:
-                # TODO: If between two points -- approx position!
-                # return mod_geo.Location(point.latitude, point.longitude)
-                return point
-        
-        return None
+        point = self.points[point_nos[position]]
+        if not interpolate or times[position] == time or previous_point_nos[position] < 0:
+            return point
+
+        # All the previous points are before time:
+        previous_point = self.points[previous_point_nos[position]]
+        ratio = (time - previous_point.time).total_seconds() / (times[position] - previous_point.time).total_seconds() # type: ignore
+        elevation = None
+        if point.elevation is not None and previous_point.elevation is not None:
+            elevation = previous_point.elevation + ratio * (point.elevation - previous_point.elevation)
+        return GPXTrackPoint(previous_point.latitude + ratio * (point.latitude - previous_point.latitude),
+                             previous_point.longitude + ratio * (point.longitude - previous_point.longitude),
+                             elevation=elevation, time=time)
+
+    def get_location_at(self, time: mod_datetime.datetime, interpolate: bool=False) -> Optional[GPXTrackPoint]:
+        """
+        Gets approx. location at given time: the first point with time >= the
+        given time, or None if time is not between the times of the first and
+        the last point. The point is found with a binary search in a (lazily
+        built) time index.
+
+        Parameters
+        ----------
+        time : datetime.datetime
+            Time to search for
+        interpolate : bool
+            If True and time is between the times of two points, a new
+            GPXTrackPoint with latitude, longitude and elevation linearly
+            interpolated between them is returned
+        """
+        if not self._is_in_time_range(time):
+            return None
+
+        index = self._get_time_index()
+        return self._get_location_at(index, time, mod_bisect.bisect_left(index[0], time), interpolate)
+
+    def get_locations_at(self, times: Iterable[mod_datetime.datetime], interpolate: bool=False) -> List[Optional[GPXTrackPoint]]:
+        """
+        Same as get_location_at() for many times at once (the result has one
+        location or None for every time). The times are looked up in sorted
+        order, every search starts at the position of the previous time.
+        """
+        times = list(times)
+        result: List[Optional[GPXTrackPoint]] = [None] * len(times)
+        if not self.points:
+            return result
+
+        index = self._get_time_index()
+        index_times = index[0]
+        position = 0
+        for time_no in sorted((time_no for time_no, time in enumerate(times) if time), key=times.__getitem__):
+            time = times[time_no]
+            if not self._is_in_time_range(time):
+                continue
+            position = mod_bisect.bisect_left(index_times, time, position)
+            result[time_no] = self._get_location_at(index, time, position, interpolate)
+
+        return result
 
     def get_nearest_location(self, location: mod_geo.Location) -> Optional[NearestLocationData]:
         """ Return the (location, track_point_no) on this track segment """
@@ -1245,12 +1699,9 @@ class GPXTrackSegment:
         avg_elevation_delta: float = 1
         if remove_extremes:
             # compute the average distance between two points:
-            distances: List[float] = []
+            distances = [dist for dist in self.get_steps().distances_2d if dist]
             elevations_delta = []
             for prev, cur in zip(self.points, self.points[1:]):
-                dist = prev.distance_2d(cur)
-                if dist:
-                    distances.append(dist)
                 if cur.elevation is not None and prev.elevation is not None:
                     elevations_delta.append(abs(cur.elevation - prev.elevation))
             if distances:
@@ -1338,6 +1789,7 @@ class GPXTrackSegment:
         #print 'len=', len(new_track_points)
 
         self.points = new_track_points
+        self.invalidate_cache()
 
     def has_times(self) -> bool:
         """
@@ -1413,9 +1865,11 @@ class GPXTrack:
             mod_gpxfield.GPXComplexField('segments', tag='trkseg', classs=GPXTrackSegment, is_list=True),
     ]
 
+    gpx_lazy_field = 'segments'
+
     __slots__ = ('name', 'comment', 'description', 'source', 'link',
                  'link_text', 'number', 'segments', 'link_type', 'type',
-                 'extensions')
+                 'extensions', '_lazy')
 
     def __init__(self, name: Optional[str]=None, description: Optional[str]=None, number: Optional[int]=None) -> None:
         self.name = name
@@ -1429,6 +1883,14 @@ class GPXTrack:
         self.link_type = None
         self.type = None
         self.extensions: List[Any] = [] # TODO
+        self._lazy: Any = None
+
+    def __getattr__(self, name: str) -> Any:
+        # Called only for unset attributes, i.e. the segments of a lazily
+        # parsed track (see GPXParser):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return mod_gpxfield.decode_lazy_field(self, name)
 
     def simplify(self, max_distance: Optional[float]=None) -> None:
         """
@@ -1571,11 +2033,11 @@ class GPXTrack:
             Index of point. This is suppressed if only_points is True.
         """
         for segment_no, segment in enumerate(self.segments if self.segments else []):
-            for point_no, point in enumerate(segment.points if segment.points else []):
-                if only_points:
-                    yield point
-                else:
-                    yield point, segment_no, point_no
+            points = segment.points if segment.points else []
+            if only_points:
+                yield from points
+            else:
+                yield from zip(points, mod_itertools.repeat(segment_no), mod_itertools.count())
 
     def get_points_no(self) -> int:
         """
@@ -1720,6 +2182,15 @@ class GPXTrack:
 
         return MovingData(moving_time, stopped_time, moving_distance, stopped_distance, max_speed)
 
+    def get_statistics(self, stopped_speed_threshold: Optional[float]=None, speed_extreemes_percentiles: float=IGNORE_TOP_SPEED_PERCENTILES,
+                       ignore_nonstandard_distances: bool=True) -> Statistics:
+        """
+        Computes all the statistics of the track in a single pass through
+        the points. See GPXTrackSegment.get_statistics().
+        """
+        return merge_statistics([segment.get_statistics(stopped_speed_threshold, speed_extreemes_percentiles, ignore_nonstandard_distances)
+                                 for segment in self.segments])
+
     def add_elevation(self, delta: float) -> None:
         """
         Adjusts elevation data for track.
@@ -1800,21 +2271,33 @@ class GPXTrack:
 
         return UphillDownhill(uphill, downhill)
 
-    def get_location_at(self, time: mod_datetime.datetime) -> List[GPXTrackPoint]:
+    def get_location_at(self, time: mod_datetime.datetime, interpolate: bool=False) -> List[GPXTrackPoint]:
         """
-        Gets approx. location at given time. Note that, at the moment this
-        method returns an instance of GPXTrackPoint in the future -- this may
-        be a mod_geo.Location instance with approximated latitude, longitude
-        and elevation!
+        Gets approx. location at given time (one location for every segment
+        containing the time). See GPXTrackSegment.get_location_at().
         """
         result = []
         for track_segment in self.segments:
-            location = track_segment.get_location_at(time)
+            location = track_segment.get_location_at(time, interpolate)
             if location:
                 result.append(location)
 
         return result
 
+    def get_locations_at(self, times: Iterable[mod_datetime.datetime], interpolate: bool=False) -> List[List[GPXTrackPoint]]:
+        """
+        Same as get_location_at() for many times at once, returns the list of
+        locations for every time. See GPXTrackSegment.get_locations_at().
+        """
+        times = list(times)
+        result: List[List[GPXTrackPoint]] = [[] for _ in times]
+        for track_segment in self.segments:
+            for locations, location in zip(result, track_segment.get_locations_at(times, interpolate)):
+                if location:
+                    locations.append(location)
+
+        return result
+
     def get_elevation_extremes(self) -> MinimumMaximum:
         """
         Calculate elevation extremes of track
@@ -1904,6 +2387,11 @@ class GPXTrack:
                    ,key=lambda x: x.location.distance_2d(location) if x is not None else mod_math.inf
                    ,default=None)
         
+    def invalidate_cache(self) -> None:
+        """ See GPXTrackSegment.invalidate_cache() """
+        for segment in self.segments or []:
+            segment.invalidate_cache()
+
     def clone(self) -> "GPXTrack":
         return mod_copy.deepcopy(self)
 
@@ -1978,13 +2466,15 @@ class GPX:
             mod_gpxfield.GPXExtensionsField('extensions', is_list=True),
     ]
 
+    gpx_lazy_field = 'tracks'
+
     __slots__ = ('version', 'creator', 'name', 'description', 'author_name',
                  'author_email', 'link', 'link_text', 'time', 'keywords',
                  'bounds', 'waypoints', 'routes', 'tracks', 'author_link',
                  'author_link_text', 'author_link_type', 'copyright_author',
                  'copyright_year', 'copyright_license', 'link_type',
                  'metadata_extensions', 'extensions', 'nsmap',
-                 'schema_locations')
+                 'schema_locations', '_cache', '_lazy')
 
     def __init__(self) -> None:
         self.version: Optional[str] = None
@@ -2012,6 +2502,15 @@ class GPX:
         self.tracks: List[GPXTrack] = []
         self.nsmap: Dict[str, str] = {}
         self.schema_locations: List[str] = []
+        self._cache = _Cache()
+        self._lazy: Any = None
+
+    def __getattr__(self, name: str) -> Any:
+        # Called only for unset attributes, i.e. the tracks of a lazily
+        # parsed GPX (see GPXParser):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return mod_gpxfield.decode_lazy_field(self, name)
 
     def simplify(self, max_distance: Optional[float]=None) -> None:
         """
@@ -2038,7 +2537,7 @@ class GPX:
         if max_points_no is not None and max_points_no < 2:
             raise ValueError("max_points_no must be greater than or equal to 2")
 
-        points_no = len(list(self.walk()))
+        points_no = self.get_track_points_no()
         if max_points_no is not None and points_no <= max_points_no:
             # No need to reduce points only if no min_distance is specified:
             if not min_distance:
@@ -2141,7 +2640,8 @@ class GPX:
 
     def get_bounds(self) -> Optional[GPXBounds]:
         """
-        Gets the latitude and longitude bounds of the GPX file.
+        Gets the latitude and longitude bounds of the GPX file (merged from
+        the cached bounds of the segments, see GPXTrackSegment.get_bounds()).
 
         Returns
         ----------
@@ -2244,6 +2744,15 @@ class GPX:
 
         return MovingData(moving_time, stopped_time, moving_distance, stopped_distance, max_speed)
 
+    def get_statistics(self, stopped_speed_threshold: Optional[float]=None, speed_extreemes_percentiles: float=IGNORE_TOP_SPEED_PERCENTILES,
+                       ignore_nonstandard_distances: bool=True) -> Statistics:
+        """
+        Computes all the statistics of the GPX tracks in a single pass through
+        the points. See GPXTrackSegment.get_statistics().
+        """
+        return merge_statistics([track.get_statistics(stopped_speed_threshold, speed_extreemes_percentiles, ignore_nonstandard_distances)
+                                 for track in self.tracks])
+
     def split(self, track_no: int, track_segment_no: int, track_point_no: int) -> None:
         """
         Splits one of the segments of a track in two parts. If one of the
@@ -2322,21 +2831,68 @@ class GPX:
         """
         for track_no, track in enumerate(self.tracks if self.tracks else [] ):
             for segment_no, segment in enumerate(track.segments if track.segments else []):
-                for point_no, point in enumerate(segment.points if segment.points else []):
-                    if only_points:
-                        yield point
-                    else:
-                        yield point, track_no, segment_no, point_no
+                points = segment.points if segment.points else []
+                if only_points:
+                    yield from points
+                else:
+                    yield from zip(points, mod_itertools.repeat(track_no), mod_itertools.repeat(segment_no), mod_itertools.count())
 
-    def get_track_points_no(self) -> int:
-        """ Number of track points, *without* route and waypoints """
-        result = 0
+    def get_flat_points(self) -> FlatPoints:
+        """
+        All the track points (in the walk() order) with the numbers of their
+        tracks, segments and points, in flat lists. Use it in loops over all
+        points, instead of walk().
 
-        for track in self.tracks:
-            for segment in track.segments:
-                result += len(segment.points)
+        The result is cached until segments or points are added or removed,
+        call invalidate_cache() after changing the points directly (see
+        GPXTrackSegment._get_cache()).
 
-        return result
+        Returns
+        ----------
+        flat_points : FlatPoints named tuple
+            points : tuple of GPXTrackPoint
+            track_nos, segment_nos, point_nos : tuple of int
+                Track, segment and point number of every point
+        """
+        return self._get_flat_points(self._get_segments_signature())
+
+    def _get_flat_points(self, signature: List[_Cache]) -> FlatPoints:
+        """ get_flat_points() with the signature already returned by _get_segments_signature() """
+        cached = self._cache.get('flat_points')
+        if cached is not None and self._is_same_signature(cached[0], signature):
+            return cached[1] # type: ignore
+
+        points: List[GPXTrackPoint] = []
+        track_nos: List[int] = []
+        segment_nos: List[int] = []
+        point_nos: List[int] = []
+        for track_no, track in enumerate(self.tracks or []):
+            for segment_no, segment in enumerate(track.segments or []):
+                segment_points = segment.points or []
+                points.extend(segment_points)
+                track_nos.extend(mod_itertools.repeat(track_no, len(segment_points)))
+                segment_nos.extend(mod_itertools.repeat(segment_no, len(segment_points)))
+                point_nos.extend(range(len(segment_points)))
+
+        flat_points = FlatPoints(tuple(points), tuple(track_nos), tuple(segment_nos), tuple(point_nos))
+        self._cache['flat_points'] = (signature, flat_points)
+        return flat_points
+
+    def _get_segments_signature(self) -> List[_Cache]:
+        """
+        The caches of all segments (see _is_same_signature()). A segment's
+        cache is replaced when its points are added, removed or invalidated
+        (see GPXTrackSegment._get_cache()).
+        """
+        return [segment._get_cache() for track in self.tracks or [] for segment in track.segments or []]
+
+    def _is_same_signature(self, signature_1: List[_Cache], signature_2: List[_Cache]) -> bool:
+        """ True if data cached with signature_1 is still valid """
+        return len(signature_1) == len(signature_2) and all(map(mod_operator.is_, signature_1, signature_2))
+
+    def get_track_points_no(self) -> int:
+        """ Number of track points, *without* route and waypoints """
+        return self.get_points_no()
 
     def get_duration(self) -> Optional[float]:
         """
@@ -2387,21 +2943,32 @@ class GPX:
 
         return UphillDownhill(uphill, downhill)
 
-    def get_location_at(self, time: mod_datetime.datetime) -> List[mod_geo.Location]:
+    def get_location_at(self, time: mod_datetime.datetime, interpolate: bool=False) -> List[mod_geo.Location]:
         """
-        Gets approx. location at given time. Note that, at the moment this
-        method returns an instance of GPXTrackPoint in the future -- this may
-        be a mod_geo.Location instance with approximated latitude, longitude
-        and elevation!
+        Gets approx. location at given time (one location for every segment
+        containing the time). See GPXTrackSegment.get_location_at().
         """
         result: List[mod_geo.Location] = []
         for track in self.tracks:
-            locations = track.get_location_at(time)
+            locations = track.get_location_at(time, interpolate)
             for location in locations:
                 result.append(location)
 
         return result
 
+    def get_locations_at(self, times: Iterable[mod_datetime.datetime], interpolate: bool=False) -> List[List[mod_geo.Location]]:
+        """
+        Same as get_location_at() for many times at once, returns the list of
+        locations for every time. See GPXTrackSegment.get_locations_at().
+        """
+        times = list(times)
+        result: List[List[mod_geo.Location]] = [[] for _ in times]
+        for track in self.tracks:
+            for locations, track_locations in zip(result, track.get_locations_at(times, interpolate)):
+                locations.extend(track_locations)
+
+        return result
+
     def get_elevation_extremes(self) -> MinimumMaximum:
         """
         Calculate elevation extremes of GPX file
@@ -2436,28 +3003,50 @@ class GPX:
         Returns a list of tuples containing the actual point, its distance from the start,
         track_no, segment_no, and segment_point_no
         """
-        distance_from_start = 0
-        previous_point = None
-
-        # (point, distance_from_start) pairs:
-        points = []
-
-        for track_no, track in enumerate(self.tracks):
-            for segment_no, segment in enumerate(track.segments):
-                for point_no, point in enumerate(segment.points):
-                    if previous_point and point_no > 0:
-                        if distance_2d:
-                            distance = point.distance_2d(previous_point)
-                        else:
-                            distance = point.distance_3d(previous_point)
-
-                        distance_from_start += distance
-
-                    points.append(PointData(point, distance_from_start, track_no, segment_no, point_no))
-
-                    previous_point = point
-
-        return points
+        # The segment caches are checked only once:
+        signature = self._get_segments_signature()
+        segments = [segment for track in self.tracks or [] for segment in track.segments or []]
+
+        # Distances from the previous points (0 for the first points of the segments):
+        distances: List[float] = []
+        for segment, cache in zip(segments, signature):
+            if segment.points:
+                steps = segment._get_steps(cache)
+                distances.append(0)
+                distances.extend(steps.distances_2d if distance_2d else steps.distances_3d)
+
+        flat_points = self._get_flat_points(signature)
+        return list(map(PointData, flat_points.points, mod_itertools.accumulate(distances),
+                        flat_points.track_nos, flat_points.segment_nos, flat_points.point_nos))
+
+    def _get_spatial_index(self) -> Tuple[mod_geo.SpatialIndex, List[NearestLocationData], float]:
+        """
+        Returns the (lazily built) spatial index of all track points, the
+        NearestLocationData of every indexed point and the 3D length (as
+        computed in get_points_data()).
+
+        The index is rebuilt when segments or points are added or removed,
+        or after invalidate_cache() (see GPXTrackSegment._get_cache()).
+        """
+        signature = self._get_segments_signature()
+        cached = self._cache.get('spatial_index')
+        if cached is not None:
+            cached_signature, index, data, length = cached
+            if self._is_same_signature(cached_signature, signature):
+                return index, data, length
+
+        flat_points = self._get_flat_points(signature)
+        data = list(map(NearestLocationData, flat_points.points, flat_points.track_nos, flat_points.segment_nos, flat_points.point_nos))
+        length = 0.
+        segments = [segment for track in self.tracks or [] for segment in track.segments or []]
+        for segment, cache in zip(segments, signature):
+            if segment.points:
+                for distance in segment._get_steps(cache).distances_3d:
+                    length += distance
+
+        index = mod_geo.SpatialIndex([location_data.location for location_data in data])
+        self._cache['spatial_index'] = (signature, index, data, length)
+        return index, data, length
 
     def get_nearest_locations(self, location: mod_geo.Location, threshold_distance: float=0.01) -> List[NearestLocationData]:
         """
@@ -2474,51 +3063,49 @@ class GPX:
 
         result: List[NearestLocationData] = []
 
-        points = self.get_points_data()
+        index, data, length = self._get_spatial_index()
 
-        if not points:
+        if not data:
             return result
 
-        distance: Optional[float] = points[- 1][1]
-
-        threshold = (distance or 0.0) * threshold_distance
-
-        min_distance_candidate = None
-        distance_from_start_candidate = None
-        track_no_candidate: Optional[int] = None
-        segment_no_candidate: Optional[int] = None
-        point_no_candidate: Optional[int] = None
-
-        for point, distance_from_start, track_no, segment_no, point_no in points:
-            distance = location.distance_3d(point)
-            if (distance or 0.0) < threshold:
-                if min_distance_candidate is None or distance < min_distance_candidate:
-                    min_distance_candidate = distance
-                    distance_from_start_candidate = distance_from_start
-                    track_no_candidate = track_no
-                    segment_no_candidate = segment_no
-                    point_no_candidate = point_no
-            else:
-                if distance_from_start_candidate is not None and point and track_no_candidate is not None and segment_no_candidate is not None and point_no_candidate is not None:
-                    result.append(NearestLocationData(point, track_no_candidate, segment_no_candidate, point_no_candidate))
-                min_distance_candidate = None
-                distance_from_start_candidate = None
-                track_no_candidate = None
-                segment_no_candidate = None
-                point_no_candidate = None
+        threshold = length * threshold_distance
 
-        if distance_from_start_candidate is not None and point and track_no_candidate is not None and segment_no_candidate is not None and point_no_candidate is not None:
-            result.append(NearestLocationData(point, track_no_candidate, segment_no_candidate, point_no_candidate))
+        # Every run of consecutive points nearer than threshold gives one
+        # result: the nearest point's indexes with the first point after the
+        # run (or the last point)
+        candidate: Optional[Tuple[int, float]] = None
+        previous_no: Optional[int] = None
+        for point_no, distance in index.within(location, threshold, lambda point, location: location.distance_3d(point)):
+            if candidate is not None and previous_no is not None and point_no != previous_no + 1:
+                result.append(data[candidate[0]]._replace(location=data[previous_no + 1].location))
+                candidate = None
+            if candidate is None or distance < candidate[1]:
+                candidate = (point_no, distance)
+            previous_no = point_no
 
-        return result
+        if candidate is not None and previous_no is not None:
+            result.append(data[candidate[0]]._replace(location=data[min(previous_no + 1, len(data) - 1)].location))
 
+        return result
 
     def get_nearest_location(self, location: mod_geo.Location) -> Optional[NearestLocationData]:
         """ Returns (location, track_no, track_segment_no, track_point_no) for the
         nearest location on map """
-        return min((NearestLocationData(pt, tr, seg, pt_no) for (pt,tr, seg, pt_no) in self.walk()) # type:ignore
-                   ,key=lambda x: x.location.distance_2d(location) if x is not None else mod_math.inf
-                   ,default=None)
+        index, data, _ = self._get_spatial_index()
+        location_no = index.nearest(location, lambda point, location: point.distance_2d(location))
+        return None if location_no is None else data[location_no]
+
+    def get_nearest_location_batch(self, locations: Iterable[mod_geo.Location]) -> List[Optional[NearestLocationData]]:
+        """
+        Same as get_nearest_location() for many locations, the spatial index
+        is built (or validated) only once.
+        """
+        index, data, _ = self._get_spatial_index()
+        result: List[Optional[NearestLocationData]] = []
+        for location in locations:
+            location_no = index.nearest(location, lambda point, location: point.distance_2d(location))
+            result.append(None if location_no is None else data[location_no])
+        return result
 
     def add_elevation(self, delta: float) -> None:
         """
@@ -2653,6 +3240,8 @@ class GPX:
                 point.time = start_time + i * time_delta
             i += 1
 
+        self.invalidate_cache()
+
     def move(self, location_delta: mod_geo.LocationDelta) -> None:
         """
         Moves each point in the gpx file (routes, waypoints, tracks).
@@ -2671,9 +3260,10 @@ class GPX:
         for track in self.tracks:
             track.move(location_delta)
 
-    def to_xml(self, version: Optional[str]=None, prettyprint: bool=True) -> str:
+    def _prepare_to_xml(self, version: Optional[str]) -> str:
         """
-        FIXME: Note, this method will change self.version
+        Sets the version, creator, namespaces and schema locations needed to
+        serialize the GPX, returns the version.
         """
         if not version:
             if self.version:
@@ -2700,6 +3290,14 @@ class GPX:
                 f'http://www.topografix.com/GPX/{version_path}/gpx.xsd',
             ]
 
+        return version
+
+    def to_xml(self, version: Optional[str]=None, prettyprint: bool=True) -> str:
+        """
+        FIXME: Note, this method will change self.version
+        """
+        version = self._prepare_to_xml(version)
+
         content = mod_gpxfield.gpx_fields_to_xml(
             self, 'gpx', version,
             custom_attributes={
@@ -2711,6 +3309,66 @@ class GPX:
 
         return f'<?xml version="1.0" encoding="UTF-8"?>\n{content.strip()}'
 
+    def to_xml_iter(self, version: Optional[str]=None, prettyprint: bool=True) -> Iterator[str]:
+        """
+        Yields the XML in chunks, joined they are the same as to_xml().
+        Points are serialized while iterating, so the whole document is never
+        in memory.
+
+        Note, like to_xml(), this will change self.version (when the
+        iteration starts).
+
+        Parameters
+        ----------
+        version: str
+            GPX version ('1.0' or '1.1'), default is self.version or '1.1'
+        prettyprint: bool
+            Indent the XML
+        """
+        version = self._prepare_to_xml(version)
+
+        chunks = mod_gpxfield.gpx_fields_to_xml_iter(
+            self, 'gpx', version,
+            custom_attributes={
+                'xsi:schemaLocation': ' '.join(self.schema_locations)
+            },
+            nsmap=self.nsmap,
+            prettyprint=prettyprint
+        )
+
+        # The content starts with a newline (stripped in to_xml()):
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n{next(chunks).lstrip()}'
+        yield from chunks
+
+    def to_binary(self) -> bytes:
+        """
+        Compact binary representation of the GPX, which can be loaded (much
+        faster than parsing the XML) with gpxpy.load_binary(). Track point
+        coordinates, elevations and times are stored in columns, everything
+        else as XML (see the gpxpy.binary module).
+        """
+        from . import binary as mod_binary
+
+        return mod_binary.to_binary(self)
+
+    def write(self, fileobj: Any, version: Optional[str]=None, prettyprint: bool=True) -> None:
+        """
+        Writes the XML (same as to_xml()) into fileobj chunk by chunk.
+
+        Parameters
+        ----------
+        fileobj:
+            Text file object, or binary file object (for example a gzip file
+            or socket.makefile('wb')) in which case UTF-8 is written
+        version: str
+            GPX version ('1.0' or '1.1'), default is self.version or '1.1'
+        prettyprint: bool
+            Indent the XML
+        """
+        binary = mod_utils.is_binary_file(fileobj)
+        for chunk in self.to_xml_iter(version, prettyprint):
+            fileobj.write(chunk.encode('utf-8') if binary else chunk)
+
     def has_times(self) -> bool:
         """ See GPXTrackSegment.has_times() """
         if not self.tracks:
@@ -2741,6 +3399,12 @@ class GPX:
                 parts.append(f'{attribute}={value!r}')
         return f'GPX({", ".join(parts)})'
 
+    def invalidate_cache(self) -> None:
+        """ See GPXTrackSegment.invalidate_cache() """
+        self._cache = _Cache()
+        for track in self.tracks or []:
+            track.invalidate_cache()
+
     def clone(self) -> "GPX":
         return mod_copy.deepcopy(self)
 
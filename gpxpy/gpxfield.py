@@ -16,6 +16,8 @@ import inspect as mod_inspect
 import datetime as mod_datetime
 import re as mod_re
 import copy as mod_copy
+import keyword as mod_keyword
+import xml.sax.saxutils as mod_saxutils
 
 from . import utils as mod_utils
 
@@ -77,28 +79,94 @@ class SimpleTZ(mod_datetime.tzinfo):
         return self.offset == other.offset # type: ignore
 
 
+# SimpleTZ instances are immutable, so they are shared between all the parsed
+# times with the same timezone string:
+_TIMEZONES: Dict[str, SimpleTZ] = {}
+
+
+def _get_timezone(string: str) -> SimpleTZ:
+    result = _TIMEZONES.get(string)
+    if result is None:
+        result = SimpleTZ(string)
+        if len(_TIMEZONES) < 1000:
+            _TIMEZONES[string] = result
+    return result
+
+
+def _parse_time(string: str) -> Optional[mod_datetime.datetime]:
+    """ Returns None if string is not a valid timestamp """
+    m = RE_TIMESTAMP.match(string)
+    if not m:
+        return None
+    year, month, day, hour, minute, second, fraction, timezone = m.groups()
+    microsecond = int((fraction[1:7] + '00000')[:6]) if fraction else 0
+    if timezone:
+        return mod_datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                                     microsecond, _get_timezone(timezone))
+    return mod_datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second), microsecond)
+
+
 def parse_time(string: str) -> Optional[mod_datetime.datetime]:
-    from . import gpx as mod_gpx
     if not string:
         return None
-    m = RE_TIMESTAMP.match(string)
-    if m:
-        dt = [int(m.group(i)) for i in range(1, 7)]
-        if m.group(7):
-            f = m.group(7)[1:7]
-            dt.append(int(f + "0" * (6 - len(f))))
-        else:
-            dt.append(0)
-        if m.group(8):
-            dt.append(SimpleTZ(m.group(8))) # type: ignore
-        return mod_datetime.datetime(*dt) # type: ignore
-    raise mod_gpx.GPXException(f'Invalid time: {string}')
+    result = _parse_time(string)
+    if result is None:
+        from . import gpx as mod_gpx
+        raise mod_gpx.GPXException(f'Invalid time: {string}')
+    return result
+
+
+def parse_times(strings: Iterable[Optional[str]]) -> List[Optional[mod_datetime.datetime]]:
+    """
+    Parses many timestamps at once. Like TimeConverter.from_string(), None
+    is returned for empty and invalid timestamps.
+    """
+    result: List[Optional[mod_datetime.datetime]] = []
+    append = result.append
+    for string in strings:
+        try:
+            append(_parse_time(string) if string else None)
+        except Exception:
+            append(None)
+    return result
 
 
 def format_time(time: mod_datetime.datetime) -> str:
     return time.isoformat().replace('+00:00', 'Z')
 
 
+EPOCH = mod_datetime.datetime(1970, 1, 1)
+EPOCH_UTC = mod_datetime.datetime(1970, 1, 1, tzinfo=mod_datetime.timezone.utc)
+
+# Epoch in the timezone of every UTC offset (minutes), adding a timedelta to
+# it gives the time in that timezone:
+_OFFSET_EPOCHS: Dict[int, mod_datetime.datetime] = {}
+
+
+def time_to_microseconds(time: mod_datetime.datetime) -> int:
+    """ Microseconds since epoch, times without timezone are treated as UTC. """
+    delta = time - (EPOCH if time.tzinfo is None else EPOCH_UTC)
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def microseconds_to_time(microseconds: int, utc_offset: Optional[int]=None) -> mod_datetime.datetime:
+    """
+    Inverse of time_to_microseconds(). If utc_offset (minutes) is None the
+    result has no timezone, otherwise the timezone is a SimpleTZ.
+    """
+    if utc_offset is None:
+        return EPOCH + mod_datetime.timedelta(microseconds=int(microseconds))
+    utc_offset = int(utc_offset)
+    epoch = _OFFSET_EPOCHS.get(utc_offset)
+    if epoch is None:
+        timezone = SimpleTZ()
+        timezone.offset = utc_offset
+        epoch = EPOCH_UTC.astimezone(timezone)
+        if len(_OFFSET_EPOCHS) < 1000:
+            _OFFSET_EPOCHS[utc_offset] = epoch
+    return epoch + mod_datetime.timedelta(microseconds=int(microseconds))
+
+
 
 # ----------------------------------------------------------------------------------------------------
 # Type converters used to convert from/to the string in the XML:
@@ -120,7 +188,7 @@ class IntConverter:
 class TimeConverter:
     def from_string(self, string: str) -> Optional[mod_datetime.datetime]:
         try:
-            return parse_time(string)
+            return _parse_time(string) if string else None
         except:
             return None
 
@@ -187,6 +255,10 @@ class GPXField(AbstractGPXField):
                 result = __node.text
             else:
                 result = None
+        return self.from_string(result)
+
+    def from_string(self, result: Optional[str]) -> Any:
+        """ Converts the attribute value or tag text (None if missing) """
         if result is None:
             if self.mandatory:
                 from . import gpx as mod_gpx
@@ -231,18 +303,18 @@ class GPXComplexField(AbstractGPXField):
         self.empty_body = empty_body
 
     def from_xml(self, node: Any, version: str) -> Any:
+        decoder = get_fields_decoder(self.classs, version)
         if self.is_list:
             result = []
             for child in node:
                 if child.tag == self.tag:
-                    result.append(gpx_fields_from_xml(self.classs, child,
-                                                      version))
+                    result.append(decoder.decode(child, version))
             return result
         else:
             field_node = node.find(self.tag)
             if field_node is None:
                 return None
-            return gpx_fields_from_xml(self.classs, field_node, version)
+            return decoder.decode(field_node, version)
 
     def to_xml(self, value: Any, version: str, nsmap: Dict[str, str]={}, prettyprint: bool=True, indent: str='') -> str:
         if not prettyprint:
@@ -485,6 +557,53 @@ def _check_dependents(gpx_object: Any, fieldname: str) -> Tuple[str, str]:
 
 def gpx_fields_to_xml(instance: Any, tag: str, version: str, custom_attributes: Dict[str, str]={},
                       nsmap: Dict[str, str]={}, prettyprint: bool=True, indent: str='', empty_body: bool=False) -> str:
+    """
+    Serializes the fields of instance with the compiled FieldsEncoder for
+    its class and version.
+    """
+    encoder = get_fields_encoder(instance.__class__, version)
+    return encoder.encode(instance, tag, version, custom_attributes, nsmap, prettyprint, indent, empty_body)
+
+
+def gpx_fields_to_xml_iter(instance: Any, tag: str, version: str, custom_attributes: Dict[str, str]={},
+                           nsmap: Dict[str, str]={}, prettyprint: bool=True, indent: str='', empty_body: bool=False) -> Iterator[str]:
+    """
+    Same as gpx_fields_to_xml(), but yields the XML in chunks (lists of
+    objects are serialized while iterating).
+    """
+    encoder = get_fields_encoder(instance.__class__, version)
+    return encoder.encode_iter(instance, tag, version, custom_attributes, nsmap, prettyprint, indent, empty_body)
+
+
+# Maximum number of list items (for example track points) serialized into one chunk:
+_ITER_CHUNK_SIZE = 1000
+
+
+def _xml_open_tag(tag: str, custom_attributes: Dict[str, str], nsmap: Dict[str, str], indent: str) -> str:
+    body = [f'\n{indent}<{tag}']
+    if tag == 'gpx':  # write nsmap in root node
+        body.append(f' xmlns="{nsmap["defaultns"]}"')
+        namespaces = set(nsmap.keys())
+        namespaces.remove('defaultns')
+        for prefix in sorted(namespaces):
+            body.append(f' xmlns:{prefix}="{nsmap[prefix]}"')
+    if custom_attributes:
+        # Make sure to_xml() always return attributes in the same order:
+        for key in sorted(custom_attributes.keys()):
+            body.append(f' {key}="{mod_utils.make_str(custom_attributes[key])}"')
+    return ''.join(body)
+
+
+def _interpret_fields_to_xml_iter(*args: Any) -> Iterator[str]:
+    yield _interpret_fields_to_xml(*args)
+
+
+def _interpret_fields_to_xml(instance: Any, tag: str, version: str, custom_attributes: Dict[str, str]={},
+                             nsmap: Dict[str, str]={}, prettyprint: bool=True, indent: str='', empty_body: bool=False) -> str:
+    """
+    Serializes the fields of instance by interpreting its fields list, used
+    for fields lists which can't be compiled into a FieldsEncoder.
+    """
     if not prettyprint:
         indent = ''
     fields = instance.gpx_10_fields
@@ -494,17 +613,7 @@ def gpx_fields_to_xml(instance: Any, tag: str, version: str, custom_attributes:
     tag_open = bool(tag)
     body = []
     if tag:
-        body.append(f'\n{indent}<{tag}')
-        if tag == 'gpx':  # write nsmap in root node
-            body.append(f' xmlns="{nsmap["defaultns"]}"')
-            namespaces = set(nsmap.keys())
-            namespaces.remove('defaultns')
-            for prefix in sorted(namespaces):
-                body.append(f' xmlns:{prefix}="{nsmap[prefix]}"')
-        if custom_attributes:
-            # Make sure to_xml() always return attributes in the same order:
-            for key in sorted(custom_attributes.keys()):
-                body.append(f' {key}="{mod_utils.make_str(custom_attributes[key])}"')
+        body.append(_xml_open_tag(tag, custom_attributes, nsmap, indent))
     suppressuntil = ''
     for gpx_field in fields:
         # strings indicate non-data container tags with subelements
@@ -556,11 +665,19 @@ def gpx_fields_to_xml(instance: Any, tag: str, version: str, custom_attributes:
     return ''.join(body)
 
 
-def gpx_fields_from_xml(class_or_instance: Any, node: str, version: str) -> Any:
+def gpx_fields_from_xml(class_or_instance: Any, node: str, version: str, lazy: bool=False) -> Any:
+    """
+    Reads the fields of class_or_instance from the XML node. Classes are
+    decoded with their compiled FieldsDecoder, existing instances by
+    interpreting the fields list.
+
+    With lazy the field named in the class' gpx_lazy_field (tracks, segments
+    or points) is decoded on first access, see set_lazy_field().
+    """
     if mod_inspect.isclass(class_or_instance):
-        result = class_or_instance()
-    else:
-        result = class_or_instance
+        return get_fields_decoder(class_or_instance, version, lazy).decode(node, version)
+
+    result = class_or_instance
 
     fields = result.gpx_10_fields
     if version == '1.1':
@@ -579,6 +696,8 @@ def gpx_fields_from_xml(class_or_instance: Any, node: str, version: str) -> Any:
                     node_path.append(None)
                 else:
                     node_path.append(cast(str, current_node).find(gpx_field))
+        elif lazy and gpx_field.name == getattr(result, 'gpx_lazy_field', None) and current_node is not None:
+            set_lazy_field(result, gpx_field, [child for child in current_node if child.tag == gpx_field.tag], version)
         else:
             if current_node is not None:
                 value = gpx_field.from_xml(current_node, version)
@@ -589,6 +708,414 @@ def gpx_fields_from_xml(class_or_instance: Any, node: str, version: str) -> Any:
 
     return result
 
+
+def set_lazy_field(instance: Any, field: "GPXComplexField", elements: List[Any], version: str) -> None:
+    """
+    Leaves the list field of instance unset, and stores its elements for
+    decode_lazy_field(). The elements (and the XML tree) are kept in memory
+    until the field is decoded.
+    """
+    delattr(instance, field.name)
+    instance._lazy = (field, elements, version)
+
+
+def make_lazy_instance(classs: Any, load: Callable[[], Any], version: str) -> Any:
+    """
+    Instance of classs with all the fields unset, decoded by
+    decode_lazy_field() from the element returned by load().
+    """
+    instance = classs.__new__(classs)
+    instance._lazy = (None, load, version)
+    return instance
+
+
+def decode_lazy_field(instance: Any, name: str) -> Any:
+    """
+    Decodes the field left unset by set_lazy_field() or all the fields of
+    an instance from make_lazy_instance() (the classes call it from
+    __getattr__(), i.e. on the first access to a field).
+    """
+    lazy = getattr(instance, '_lazy', None)
+    if lazy is None or (lazy[0] is not None and lazy[0].name != name):
+        raise AttributeError(f'{instance.__class__.__name__!r} object has no attribute {name!r}')
+    field, elements, version = lazy
+    if field is None:
+        decoded = get_fields_decoder(instance.__class__, version, True).decode(elements(), version)
+        for slot in instance.__slots__:
+            try:
+                # Without triggering the decoding of lazy fields of decoded:
+                setattr(instance, slot, object.__getattribute__(decoded, slot))
+            except AttributeError:
+                pass
+        return getattr(instance, name)
+    decoder = get_fields_decoder(field.classs, version, True)
+    value = [decoder.decode(element, version) for element in elements]
+    setattr(instance, name, value)
+    instance._lazy = None
+    return value
+
+
+class FieldsDecoder:
+    """
+    Decoder for one class and GPX version, compiled from the class' fields
+    list into the source of a specialised decode() function. Gives the same
+    results (and errors) as interpreting the fields list (see
+    gpx_fields_from_xml()), but the children of every element are read in
+    a single pass and then looked up by tag, instead of calling find() for
+    every field.
+
+    With lazy the class' gpx_lazy_field is left for decode_lazy_field() and
+    the children are decoded with lazy decoders too.
+    """
+
+    def __init__(self, classs: Any, version: str, lazy: bool=False) -> None:
+        self.classs = classs
+        fields = classs.gpx_11_fields if version == '1.1' else classs.gpx_10_fields
+
+        defaults = classs()
+
+        # Objects used in the generated code:
+        self.namespace: Dict[str, Any] = {'classs': classs, 'get_fields_decoder': get_fields_decoder, 'set_lazy_field': set_lazy_field}
+
+        list_tags: List[str] = []
+        for field in fields:
+            if type(field) is GPXComplexField and field.is_list and field.tag not in list_tags:
+                list_tags.append(field.tag)
+
+        code = ['def decode(node, version):',
+                '    result = classs()',
+                '    children_0 = {}']
+        for list_no, tag in enumerate(list_tags):
+            code.append(f'    list_{list_no} = []')
+        code += ['    for child in node:',
+                 '        tag = child.tag',
+                 '        if tag not in children_0:',
+                 '            children_0[tag] = child']
+        for list_no, tag in enumerate(list_tags):
+            code += [f'        {"if" if list_no == 0 else "elif"} tag == {tag!r}:',
+                     f'            list_{list_no}.append(child)']
+
+        # Number of the current container (0 is the element itself):
+        containers_stack = [0]
+        containers_no = 0
+        for field_no, field in enumerate(fields):
+            container_no = containers_stack[-1]
+            if isinstance(field, str):
+                tag = field.partition(':')[0]
+                if tag.startswith('/'):
+                    containers_stack.pop()
+                    continue
+                containers_no += 1
+                code += [f'    container_{containers_no} = None',
+                         f'    children_{containers_no} = None',
+                         f'    if children_{container_no} is not None:',
+                         f'        container_{containers_no} = children_{container_no}.get({tag!r})',
+                         f'        if container_{containers_no} is not None:',
+                         f'            children_{containers_no} = {{}}',
+                         f'            for child in container_{containers_no}:',
+                         f'                children_{containers_no}.setdefault(child.tag, child)']
+                containers_stack.append(containers_no)
+                continue
+
+            self.namespace[f'field_{field_no}'] = field
+            assign = f'result.{field.name} = '
+            default_is_none = getattr(defaults, field.name) is None
+
+            if type(field) is GPXField and field.attribute:
+                if container_no:
+                    # Attributes of missing containers are read from the element:
+                    code.append(f'    text = (node if container_{container_no} is None else container_{container_no}).get({field.attribute!r})')
+                else:
+                    code.append(f'    text = node.get({field.attribute!r})')
+                self._add_from_string(code, '    ', field_no, field, assign, default_is_none)
+                continue
+
+            indent = '    '
+            if container_no:
+                code.append(f'    if container_{container_no} is not None:')
+                indent = '        '
+
+            if type(field) is GPXField and not field.mandatory and default_is_none:
+                code += [f'{indent}child = children_{container_no}.get({field.tag!r})',
+                         f'{indent}if child is not None:',
+                         f'{indent}    text = child.text']
+                self._add_from_string(code, indent + '    ', field_no, field, assign, default_is_none)
+            elif type(field) is GPXField:
+                code += [f'{indent}child = children_{container_no}.get({field.tag!r})',
+                         f'{indent}text = None if child is None else child.text']
+                self._add_from_string(code, indent, field_no, field, assign, default_is_none)
+            elif type(field) is GPXComplexField and field.is_list and not container_no and lazy and field.name == getattr(classs, 'gpx_lazy_field', None):
+                code.append(f'{indent}set_lazy_field(result, field_{field_no}, list_{list_tags.index(field.tag)}, version)')
+            elif type(field) is GPXComplexField and field.is_list and not container_no:
+                code += [f'{indent}decoder = get_fields_decoder(field_{field_no}.classs, version, {lazy})',
+                         f'{indent}{assign}[decoder.decode(child, version) for child in list_{list_tags.index(field.tag)}]']
+            elif type(field) is GPXComplexField and not field.is_list:
+                code += [f'{indent}child = children_{container_no}.get({field.tag!r})',
+                         f'{indent}if child is not None:',
+                         f'{indent}    {assign}get_fields_decoder(field_{field_no}.classs, version, {lazy}).decode(child, version)']
+                if not default_is_none:
+                    code += [f'{indent}else:',
+                             f'{indent}    {assign}None']
+            else:
+                code.append(f'{indent}{assign}field_{field_no}.from_xml({"container_" + str(container_no) if container_no else "node"}, version)')
+
+        code.append('    return result')
+
+        self.source = '\n'.join(code)
+        exec(compile(self.source, f'<{classs.__name__} decoder>', 'exec'), self.namespace)
+        self.decode: Callable[[Any, str], Any] = self.namespace['decode']
+
+    def _add_from_string(self, code: List[str], indent: str, field_no: int, field: "GPXField", assign: str, default_is_none: bool) -> None:
+        if field.mandatory:
+            code.append(f'{indent}{assign}field_{field_no}.from_string(text)')
+            return
+        code.append(f'{indent}if text is not None:')
+        if field.possible:
+            code.append(f'{indent}    {assign}field_{field_no}.from_string(text)')
+        elif field.type_converter:
+            self.namespace[f'from_string_{field_no}'] = field.type_converter.from_string
+            # On errors from_string() raises the GPXException:
+            code += [f'{indent}    try:',
+                     f'{indent}        {assign}from_string_{field_no}(text)',
+                     f'{indent}    except Exception:',
+                     f'{indent}        {assign}field_{field_no}.from_string(text)']
+        else:
+            code.append(f'{indent}    {assign}text')
+        if not default_is_none:
+            code += [f'{indent}else:',
+                     f'{indent}    {assign}None']
+
+
+_FIELDS_DECODERS: Dict[Tuple[Any, bool, bool], FieldsDecoder] = {}
+
+
+def get_fields_decoder(classs: Any, version: str, lazy: bool=False) -> FieldsDecoder:
+    """ Returns the (compiled once) FieldsDecoder for the class, version and lazy """
+    key = (classs, version == '1.1', lazy)
+    decoder = _FIELDS_DECODERS.get(key)
+    if decoder is None:
+        decoder = _FIELDS_DECODERS[key] = FieldsDecoder(classs, version, lazy)
+    return decoder
+
+
+class FieldsEncoder:
+    """
+    Encoder for one class and GPX version, compiled from the class' fields
+    list into the source of a specialised encode() function. Gives exactly
+    the same XML as interpreting the fields list, but containers are
+    checked with nested ifs and simple fields are written without calling
+    GPXField.to_xml(). The encode_iter() generator yields the same XML in
+    chunks.
+
+    Fields lists with containers which are not properly nested are
+    interpreted (see _interpret_fields_to_xml()).
+    """
+
+    def __init__(self, classs: Any, version: str) -> None:
+        self.classs = classs
+        fields = classs.gpx_11_fields if version == '1.1' else classs.gpx_10_fields
+
+        # Objects used in the generated code:
+        self.namespace: Dict[str, Any] = {'get_fields_encoder': get_fields_encoder,
+                                          'open_tag': _xml_open_tag,
+                                          'make_str': mod_utils.make_str,
+                                          'escape': mod_saxutils.escape}
+
+        # Encoders of classes with lists of objects stream them in encode_iter():
+        self.streams = False
+        self.encode: Callable[..., str] = _interpret_fields_to_xml
+        self.encode_iter: Callable[..., Iterator[str]] = _interpret_fields_to_xml_iter
+        self.source = ''
+        if not self._is_nested(fields):
+            return
+
+        self.streams = any(type(field) is GPXComplexField and field.is_list for field in fields)
+        self.source = self._generate(fields, 'encode', streaming=False)
+        exec(compile(self.source, f'<{classs.__name__} encoder>', 'exec'), self.namespace)
+        self.encode = self.namespace['encode']
+        self.iter_source = self._generate(fields, 'encode_iter', streaming=True)
+        exec(compile(self.iter_source, f'<{classs.__name__} iter encoder>', 'exec'), self.namespace)
+        self.encode_iter = self.namespace['encode_iter']
+
+    def _generate(self, fields: List[Any], function: str, streaming: bool) -> str:
+        """
+        Source of the encode() function, or (if streaming) of the encode_iter()
+        generator which yields the same XML in chunks.
+        """
+        code = [f'def {function}(instance, tag, version, custom_attributes, nsmap, prettyprint, indent, empty_body):',
+                '    if not prettyprint:',
+                "        indent = ''",
+                '    tag_open = bool(tag)',
+                '    body = []',
+                '    append = body.append',
+                '    if tag:',
+                "        if custom_attributes or tag == 'gpx':",
+                '            append(open_tag(tag, custom_attributes, nsmap, indent))',
+                '        else:',
+                "            append(f'\\n{indent}<{tag}')",
+                "    inner = indent + '  ' if prettyprint else ''"]
+
+        indent = '    '
+        for field_no, field in enumerate(fields):
+            if isinstance(field, str):
+                if field.startswith('/'):
+                    code += [f'{indent}if tag_open:',
+                             f"{indent}    append('>')",
+                             f'{indent}    tag_open = False',
+                             f"{indent}append(f'\\n{{indent}}<{field}>')",
+                             f'{indent}if prettyprint and len(indent) > 1:',
+                             f'{indent}    indent = indent[:-2]',
+                             f"{indent}inner = indent + '  ' if prettyprint else ''"]
+                    indent = indent[:-4]
+                    continue
+                tag, *dependents = field.split(':')
+                # Containers without data are suppressed:
+                if dependents:
+                    code.append(f'{indent}if {" or ".join(self._get(dependent.lstrip("@")) for dependent in dependents)}:')
+                else:
+                    code.append(f'{indent}if True:')
+                indent += '    '
+                code += [f'{indent}if tag_open:',
+                         f"{indent}    append('>')",
+                         f'{indent}if prettyprint:',
+                         f"{indent}    indent += '  '",
+                         f"{indent}append(f'\\n{{indent}}<{tag}')",
+                         f'{indent}tag_open = True',
+                         f"{indent}inner = indent + '  ' if prettyprint else ''"]
+                continue
+
+            self.namespace[f'field_{field_no}'] = field
+            code.append(f'{indent}value = {self._get(field.name)}')
+            if type(field) is GPXField and field.attribute:
+                code += [f'{indent}if value is None:',
+                         f"{indent}    append(' ')",
+                         f'{indent}else:']
+                self._add_make_str(code, indent + '    ')
+                code.append(f"{indent}    append(f' {field.attribute}=\"{{text}}\"')")
+                continue
+            if field.attribute:
+                code.append(f"{indent}append(' ' + field_{field_no}.to_xml(value, version, nsmap, prettyprint=prettyprint, indent=indent + '  '))")
+                continue
+
+            code += [f'{indent}if value is not None:',
+                     f'{indent}    if tag_open:',
+                     f"{indent}        append('>')",
+                     f'{indent}        tag_open = False']
+            if type(field) is GPXField and field.tag:
+                self._add_tag(code, indent + '    ', field_no, field)
+            elif type(field) is GPXComplexField and field.is_list and streaming:
+                code += [f'{indent}    if body:',
+                         f"{indent}        yield ''.join(body)",
+                         f'{indent}        body.clear()',
+                         f'{indent}    classs = None',
+                         f'{indent}    for obj in value:',
+                         f'{indent}        if obj.__class__ is not classs:',
+                         f'{indent}            classs = obj.__class__',
+                         f'{indent}            encoder = get_fields_encoder(classs, version)',
+                         f'{indent}        if encoder.streams:',
+                         f'{indent}            yield from encoder.encode_iter(obj, {field.tag!r}, version, {{}}, nsmap, prettyprint, inner, False)',
+                         f'{indent}        else:',
+                         f'{indent}            append(encoder.encode(obj, {field.tag!r}, version, {{}}, nsmap, prettyprint, inner, False))',
+                         f'{indent}            if len(body) >= {_ITER_CHUNK_SIZE}:',
+                         f"{indent}                yield ''.join(body)",
+                         f'{indent}                body.clear()']
+            elif type(field) is GPXComplexField and field.is_list:
+                code += [f'{indent}    classs = None',
+                         f'{indent}    for obj in value:',
+                         f'{indent}        if obj.__class__ is not classs:',
+                         f'{indent}            classs = obj.__class__',
+                         f'{indent}            encode = get_fields_encoder(classs, version).encode',
+                         f'{indent}        append(encode(obj, {field.tag!r}, version, {{}}, nsmap, prettyprint, inner, False))']
+            elif type(field) is GPXComplexField:
+                code += [f'{indent}    encoder = get_fields_encoder(value.__class__, version)',
+                         f'{indent}    append(encoder.encode(value, {field.tag!r}, version, {{}}, {{}}, prettyprint, inner, {field.empty_body!r}))']
+            else:
+                code += [f"{indent}    xml_value = field_{field_no}.to_xml(value, version, nsmap, prettyprint=prettyprint, indent=indent + '  ')",
+                         f'{indent}    if xml_value:',
+                         f'{indent}        append(xml_value)']
+
+        code += ['    if tag:',
+                 '        if empty_body:',
+                 "            append(' />')",
+                 '        else:',
+                 '            if tag_open:',
+                 "                append('>')",
+                 "            append('\\n' + indent + '</' + tag + '>')"]
+        if streaming:
+            code += ['    if body:',
+                     "        yield ''.join(body)"]
+        else:
+            code.append("    return ''.join(body)")
+        return '\n'.join(code)
+
+    def _add_make_str(self, code: List[str], indent: str) -> None:
+        """ text = mod_utils.make_str(value), without the call for most values """
+        code += [f'{indent}text = str(value)',
+                 f"{indent}if 'e' in text and isinstance(value, float):",
+                 f'{indent}    text = make_str(value)']
+
+    def _add_tag(self, code: List[str], indent: str, field_no: int, field: "GPXField") -> None:
+        """ Same as appending field.to_xml() for a non None value """
+        converter = field.type_converter
+        if converter is FLOAT_TYPE or converter is INT_TYPE or converter is TIME_TYPE:
+            if converter is FLOAT_TYPE:
+                self._add_make_str(code, indent)
+            elif converter is INT_TYPE:
+                code.append(f'{indent}text = str(value)')
+            else:
+                # See TimeConverter.to_string() and format_time():
+                code.append(f"{indent}text = value.isoformat().replace('+00:00', 'Z') if value else None")
+            # The converted values are strings, escape only if needed:
+            code += [f"{indent}if text is not None and ('&' in text or '<' in text or '>' in text):",
+                     f'{indent}    text = escape(text)']
+        elif converter:
+            self.namespace[f'to_string_{field_no}'] = converter.to_string
+            code += [f'{indent}text = to_string_{field_no}(value)',
+                     f'{indent}if text is not None:',
+                     f'{indent}    text = escape(text)']
+        else:
+            code.append(f'{indent}text = escape(value)')
+        code += [f'{indent}if text is None:',
+                 f"{indent}    append(f'\\n{{inner}}<{field.tag}/>')",
+                 f'{indent}else:',
+                 f"{indent}    append(f'\\n{{inner}}<{field.tag}>{{text}}</{field.tag}>')"]
+
+    def _get(self, name: str) -> str:
+        if name.isidentifier() and not mod_keyword.iskeyword(name):
+            return f'instance.{name}'
+        return f'getattr(instance, {name!r})'
+
+    def _is_nested(self, fields: List[Any]) -> bool:
+        """
+        True if every container is closed (in the right order) and doesn't
+        contain a container with the same tag.
+        """
+        containers: List[str] = []
+        for field in fields:
+            if isinstance(field, str):
+                if field.startswith('/'):
+                    if not containers or containers.pop() != field[1:]:
+                        return False
+                else:
+                    tag = field.partition(':')[0]
+                    if tag in containers or not tag.isidentifier():
+                        return False
+                    containers.append(tag)
+        return not containers
+
+
+_FIELDS_ENCODERS: Dict[Tuple[Any, bool], FieldsEncoder] = {}
+
+
+def get_fields_encoder(classs: Any, version: str) -> FieldsEncoder:
+    """ Returns the (compiled once) FieldsEncoder for the class and version """
+    key = (classs, version == '1.1')
+    encoder = _FIELDS_ENCODERS.get(key)
+    if encoder is None:
+        encoder = _FIELDS_ENCODERS[key] = FieldsEncoder(classs, version)
+    return encoder
+
+
 def gpx_check_slots_and_default_values(classs: Callable[[], Any]) -> None:
     """
     Will fill the default values for this class. Instances will inherit those
@@ -606,7 +1133,8 @@ def gpx_check_slots_and_default_values(classs: Callable[[], Any]) -> None:
         raise Exception(f'Error reading attributes for {classs.__name__}: {e}')
 
     attributes.sort()
-    slots = list(classs.__slots__)
+    # Private slots (caches) are not GPX attributes:
+    slots = [x for x in classs.__slots__ if not x.startswith('_')]
     slots.sort()
 
     if attributes != slots:
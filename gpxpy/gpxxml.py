@@ -1,66 +1,287 @@
-import xml.dom.minidom as mod_minidom
+import codecs as mod_codecs
+import contextlib as mod_contextlib
+import io as mod_io
+import mmap as mod_mmap
+import os as mod_os
+import re as mod_re
 
-from typing import Any, AnyStr, Iterable
+from . import parser as mod_parser
+from . import utils as mod_utils
 
-def split_gpxs(xml: AnyStr) -> Iterable[str]:
+from typing import Any, AnyStr, Dict, Iterable, Iterator, List, Optional, Pattern, Tuple, Union, IO
+
+RE_XML_MARKUP_BYTES = mod_re.compile(mod_parser.RE_XML_MARKUP.pattern.encode(), mod_re.DOTALL)
+RE_ENCODING = mod_re.compile(rb"""<\?xml[^>]*\sencoding=["']([A-Za-z0-9._-]+)["']""")
+RE_ATTRIBUTE = mod_re.compile(r"""([^\s=]+)\s*=\s*("[^"]*"|'[^']*')""")
+
+# Elements are copied in chunks of this size (bytes or characters):
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# (tag, start, end) of an element:
+Element = Tuple[str, int, int]
+
+def split_gpxs(xml_or_file: Union[AnyStr, IO[Any]]) -> Iterator[str]:
     """
-    Split tracks in multiple xml files, without gpxpy. Each one with ont <trk>.
+    Split tracks in multiple xml files, without gpxpy. Each one with one <trk>.
+
+    The XML is scanned once (without building a DOM) and every result is
+    the XML before the first track, the track and the XML after the last
+    track, copied verbatim. xml_or_file may be the XML or a file object,
+    files are memory mapped, so that big files are never read in memory.
     """
-    dom = mod_minidom.parseString(xml)
-    gpx_node: Any = _find_gpx_node(dom)
-    gpx_track_nodes = []
-    if gpx_node:
-        for child_node in gpx_node.childNodes:
-            if child_node.nodeName == 'trk':
-                gpx_track_nodes.append(child_node)
-                gpx_node.removeChild(child_node)
-
-    for gpx_track_node in gpx_track_nodes:
-        gpx_node.appendChild(gpx_track_node)
-        yield dom.toxml()
-        gpx_node.removeChild(gpx_track_node)
+    with _mapped(xml_or_file) as data:
+        root, elements, _ = scan_children(data)
+        tracks = [(start, end) for tag, start, end in elements if tag == 'trk']
+        if root is None or not tracks:
+            return
+        header = data[:tracks[0][0]]
+        # Whitespace between the tracks is dropped, anything else is kept:
+        between = [data[end:start] for (_, end), (start, _) in zip(tracks, tracks[1:])]
+        footer = data[:0].join(part for part in between if part.strip()) + data[tracks[-1][1]:]
+        for start, end in tracks:
+            yield _decode(data, header + data[start:end] + footer)
 
 def join_gpxs(xmls: Iterable[AnyStr]) -> str:
     """
     Join GPX files without parsing them with gpxpy.
     """
-    result = None
-
-    wpt_elements = []
-    rte_elements = []
-    trk_elements = []
-
-    for xml in xmls:
-        dom = mod_minidom.parseString(xml)
-        if not result:
-            result = dom
-
-        gpx_node = _find_gpx_node(dom)
-        if gpx_node:
-            for child_node in gpx_node.childNodes:
-                if child_node.nodeName == 'wpt':
-                    wpt_elements.append(child_node)
-                    gpx_node.removeChild(child_node)
-                elif child_node.nodeName == 'rte':
-                    rte_elements.append(child_node)
-                    gpx_node.removeChild(child_node)
-                elif child_node.nodeName == 'trk':
-                    trk_elements.append(child_node)
-                    gpx_node.removeChild(child_node)
-
-    gpx_node = _find_gpx_node(result)
-    if gpx_node:
-        for wpt_element in wpt_elements:
-            gpx_node.appendChild(wpt_element)
-        for rte_element in rte_elements:
-            gpx_node.appendChild(rte_element)
-        for trk_element in trk_elements:
-            gpx_node.appendChild(trk_element)
-
-    return result.toxml() # type: ignore
-
-def _find_gpx_node(dom: Any) -> Any:
-    for gpx_candidate_node in dom.childNodes:
-        if gpx_candidate_node.nodeName == 'gpx':
-            return gpx_candidate_node
-    return None
+    output = mod_io.StringIO()
+    write_joined_gpxs(xmls, output)
+    return output.getvalue()
+
+class _Source:
+    """ Input of write_joined_gpxs() and the positions of its elements """
+
+    def __init__(self, xml_or_file: Any, data: Any, root: Any, elements: List[Element], end: int) -> None:
+        # The data is kept only if it can't be read (mapped) again:
+        self.xml_or_file = xml_or_file
+        self.data = None if isinstance(data, mod_mmap.mmap) else data
+        self.root_start = root.start()
+        self.root_end = root.end()
+        self.root_tag = _decode(data, root.group(0))
+        self.elements = elements
+        self.end = end
+        self.encoding = _encoding(data)
+        # Namespace declarations (conflicting with the result gpx node)
+        # added to every copied element:
+        self.declarations = ''
+
+    @mod_contextlib.contextmanager
+    def open(self) -> Iterator[Any]:
+        if self.data is not None:
+            yield self.data
+        else:
+            with _mapped(self.xml_or_file) as data:
+                yield data
+
+def write_joined_gpxs(xmls_or_files: Iterable[Any], output: IO[Any]) -> None:
+    """
+    Join GPX files without parsing them with gpxpy, the result is written
+    into output (text file object, or binary file object in which case the
+    encoding of the first file is used).
+
+    The result is the first file with the waypoints, routes and tracks of
+    all the files (in that order), copied verbatim. The namespaces declared
+    in all gpx nodes are declared in the result.
+
+    xmls_or_files may be XMLs (str or bytes), file objects or paths
+    (os.PathLike, for example pathlib.Path). Every file is scanned once
+    (without building a DOM), then the elements are copied from the memory
+    mapped file in chunks, so the memory used doesn't depend on the size
+    or the number of the files.
+    """
+    sources: List[_Source] = []
+    for xml_or_file in xmls_or_files:
+        with _mapped(xml_or_file) as data:
+            root, elements, end = scan_children(data)
+            if root is not None:
+                sources.append(_Source(xml_or_file, data, root, elements, end))
+    if not sources:
+        return
+
+    first = sources[0]
+    encoding = first.encoding
+    binary = mod_utils.is_binary_file(output)
+
+    def write(text: str) -> None:
+        output.write(text.encode(encoding, 'xmlcharrefreplace') if binary else text)
+
+    def copy(source: _Source, data: Any, start: int, end: int) -> None:
+        if isinstance(data, str) or not binary or mod_codecs.lookup(source.encoding).name != mod_codecs.lookup(encoding).name:
+            decoder = mod_codecs.getincrementaldecoder(source.encoding)() if not isinstance(data, str) else None
+            for position in range(start, end, COPY_CHUNK_SIZE):
+                chunk = data[position:min(position + COPY_CHUNK_SIZE, end)]
+                write(decoder.decode(chunk, position + COPY_CHUNK_SIZE >= end) if decoder else chunk)
+        else:
+            for position in range(start, end, COPY_CHUNK_SIZE):
+                output.write(data[position:min(position + COPY_CHUNK_SIZE, end)])
+
+    def copy_element(source: _Source, data: Any, start: int, end: int) -> None:
+        if source.declarations:
+            tag_end = start + len(RE_XML_MARKUP_BYTES.match(data, start).group(2) if not isinstance(data, str) else
+                                  mod_parser.RE_XML_MARKUP.match(data, start).group(2)) + 1
+            copy(source, data, start, tag_end)
+            write(source.declarations)
+            start = tag_end
+        copy(source, data, start, end)
+        write('\n')
+
+    with first.open() as data:
+        children = [element for element in first.elements if element[0] in ('wpt', 'rte', 'trk')]
+        body_start = children[0][1] if children else first.end
+        copy(first, data, 0, first.root_start)
+        write(_merge_root_tags(sources))
+        copy(first, data, first.root_end, body_start)
+
+    for tag in ['wpt', 'rte', 'trk']:
+        for source in sources:
+            if any(element[0] == tag for element in source.elements):
+                with source.open() as data:
+                    for element_tag, start, end in source.elements:
+                        if element_tag == tag:
+                            copy_element(source, data, start, end)
+
+    with first.open() as data:
+        for element_tag, start, end in first.elements:
+            if element_tag not in ('wpt', 'rte', 'trk') and start >= body_start:
+                copy_element(first, data, start, end)
+        copy(first, data, first.end, len(data))
+
+def _merge_root_tags(sources: List[_Source]) -> str:
+    """
+    The gpx start tag of the first source, with the namespace declarations
+    and schema locations of all sources. Declarations of prefixes already
+    declared (for another namespace) are kept in source.declarations.
+    """
+    root_tag = sources[0].root_tag
+    namespaces: Dict[str, str] = {}
+    schema_locations: Dict[str, str] = {}
+    schema_location_attribute = None
+    added: List[str] = []
+    for source_no, source in enumerate(sources):
+        for name, value in RE_ATTRIBUTE.findall(source.root_tag):
+            value = value[1:-1]
+            if name.endswith(':schemaLocation'):
+                locations = value.split()
+                for namespace, location in zip(locations[::2], locations[1::2]):
+                    schema_locations.setdefault(namespace, location)
+                schema_location_attribute = schema_location_attribute or name
+            elif name.startswith('xmlns:') or (name == 'xmlns' and not source_no):
+                if name not in namespaces:
+                    namespaces[name] = value
+                    if source_no:
+                        added.append(f' {name}="{value}"')
+                elif namespaces[name] != value:
+                    source.declarations += f' {name}="{value}"'
+
+    if schema_location_attribute:
+        attribute = f'{schema_location_attribute}="{" ".join(" ".join(item) for item in schema_locations.items())}"'
+        if f' {schema_location_attribute}=' in root_tag:
+            root_tag = RE_ATTRIBUTE.sub(lambda match: attribute if match.group(1) == schema_location_attribute else match.group(0), root_tag)
+        else:
+            added.append(f' {attribute}')
+    return root_tag[:-1] + ''.join(added) + root_tag[-1]
+
+@mod_contextlib.contextmanager
+def _mapped(xml_or_file: Any) -> Iterator[Any]:
+    """ The XML (str or bytes), or the file memory mapped if possible """
+    if isinstance(xml_or_file, mod_os.PathLike):
+        with open(xml_or_file, 'rb') as f:
+            with _mapped(f) as data:
+                yield data
+        return
+    if not hasattr(xml_or_file, 'read'):
+        yield xml_or_file
+        return
+    try:
+        data = mod_mmap.mmap(xml_or_file.fileno(), 0, access=mod_mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        # Not a (non empty) file on disk:
+        yield xml_or_file.read()
+        return
+    try:
+        yield data
+    finally:
+        data.close()
+
+def _encoding(data: Any) -> str:
+    """ The encoding declared in data """
+    if isinstance(data, str):
+        return 'utf-8'
+    encoding = RE_ENCODING.match(data, 3 if data[:3] == b'\xef\xbb\xbf' else 0)
+    return encoding.group(1).decode() if encoding else 'utf-8'
+
+def _decode(data: Any, part: AnyStr) -> str:
+    """ part (of data) as str, decoded with the encoding declared in data """
+    if isinstance(part, str):
+        return part
+    return part.decode(_encoding(data))
+
+def scan_children(data: Any) -> Tuple[Optional[Any], List[Element], int]:
+    """
+    The gpx start tag (match, None if the root isn't gpx), the children
+    elements of the gpx node (tag without namespace prefix, start, end) and
+    the position of the gpx end tag.
+
+    After a child start tag its end tag is searched for directly (without
+    going through the markup inside) when that is unambiguous.
+    """
+    binary = not isinstance(data, str)
+    markup = RE_XML_MARKUP_BYTES if binary else mod_parser.RE_XML_MARKUP
+
+    root = None
+    elements: List[Element] = []
+    root_end = len(data)
+    # End tag and (nested) start tag patterns for every child tag:
+    patterns: Dict[AnyStr, Tuple[Pattern, Pattern]] = {}
+    position = 0
+    while True:
+        match = markup.search(data, position)
+        if match is None:
+            break
+        position = match.end()
+        is_end_tag, tag, is_empty = match.groups()
+        if not tag:
+            continue
+        if is_end_tag:
+            root_end = match.start()
+            break
+        name = (tag.decode() if binary else tag).rpartition(':')[2]
+        if root is None:
+            if name != 'gpx' or is_empty:
+                break
+            root = match
+            continue
+
+        start = match.start()
+        if not is_empty:
+            if tag not in patterns:
+                patterns[tag] = (mod_re.compile(mod_re.escape(_literal('</', binary) + tag) + _literal(r'\s*>', binary)),
+                                 mod_re.compile(mod_re.escape(_literal('<', binary) + tag) + _literal(r'[\s/>]', binary)))
+            end_tag, nested_tag = patterns[tag]
+            end = end_tag.search(data, position)
+            if end and not nested_tag.search(data, position, end.start()) and not _has_other_markup(data, position, end.start(), binary):
+                position = end.end()
+            else:
+                # Nested elements with the same tag, comments, CDATA...:
+                depth = 1
+                while depth:
+                    match = markup.search(data, position)
+                    if match is None:
+                        return root, elements, root_end
+                    position = match.end()
+                    if match.group(2) and not match.group(3):
+                        depth += -1 if match.group(1) else 1
+        elements.append((name, start, position))
+
+    return root, elements, root_end
+
+def _literal(text: str, binary: bool) -> Any:
+    return text.encode() if binary else text
+
+def _has_other_markup(data: Any, start: int, end: int, binary: bool) -> bool:
+    """ True if there are comments, CDATA or processing instructions between start and end """
+    for text in ['<!--', '<![CDATA[', '<?']:
+        if data.find(_literal(text, binary), start, end) >= 0:
+            return True
+    return False
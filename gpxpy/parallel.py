@@ -0,0 +1,67 @@
+# Copyright 2011 Tomo Krajina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Parsing of many GPX files in parallel, see gpxpy.parse_many().
+"""
+
+import concurrent.futures as mod_futures
+import os as mod_os
+
+from . import gpx as mod_gpx
+
+from typing import *
+
+
+def parse_file(path: Any, version: Optional[str]=None, statistics: bool=False) -> mod_gpx.ParseResult:
+    """
+    Parses the file (and computes the statistics), any exception is returned
+    in the result (instead of raised), so that one bad file doesn't stop the
+    others.
+    """
+    from . import parser as mod_parser
+
+    try:
+        with open(path, 'rb') as f:
+            gpx = mod_parser.GPXParser(f).parse(version)
+        if statistics:
+            return mod_gpx.ParseResult(path, None, gpx.get_statistics(), None)
+    except Exception as e:
+        return mod_gpx.ParseResult(path, None, None, e)
+    return mod_gpx.ParseResult(path, gpx, None, None)
+
+
+def parse_many(paths: Iterable[Any], workers: Optional[int]=None, version: Optional[str]=None,
+               ordered: bool=True, statistics: bool=False) -> Iterator[mod_gpx.ParseResult]:
+    """ See gpxpy.parse_many() """
+    paths = list(paths)
+    if workers is None:
+        workers = mod_os.cpu_count() or 1
+    workers = min(workers, len(paths))
+
+    if workers <= 1:
+        for path in paths:
+            yield parse_file(path, version, statistics)
+        return
+
+    with mod_futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(parse_file, path, version, statistics) for path in paths]
+        try:
+            for future in (futures if ordered else mod_futures.as_completed(futures)):
+                yield future.result()
+        finally:
+            # When the iteration is stopped early, the files which are not
+            # parsed yet are skipped:
+            for future in futures:
+                future.cancel()
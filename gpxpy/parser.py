@@ -14,8 +14,10 @@
 
 import logging as mod_logging
 import re as mod_re
+import io as mod_io
+import functools as mod_functools
 
-from typing import cast, Union, AnyStr, IO, Optional
+from typing import cast, Any, Callable, Union, AnyStr, IO, Iterator, List, Optional, Tuple
 
 try:
     # Load LXML or fallback to cET or ET
@@ -32,6 +34,76 @@ from . import gpxfield as mod_gpxfield
 
 log = mod_logging.getLogger(__name__)
 
+XSI_NAMESPACE = 'http://www.w3.org/2001/XMLSchema-instance'
+
+# Track point fields decoded by GPXParser.iter_points():
+POINT_RECORD_FIELDS = [field for field in mod_gpx.GPX_10_POINT_FIELDS
+                       if field.name in ('latitude', 'longitude', 'elevation', 'time')]
+
+# Tags (and everything else which isn't text) in XML, group 1 is "/" for end
+# tags, group 2 the tag name and group 3 "/" for empty element tags:
+RE_XML_MARKUP = mod_re.compile(r"""<!--.*?-->|<!\[CDATA\[.*?\]\]>|<[?!][^>]*>|<(/?)([^\s/>!?]+)(?:[^>"']|"[^"]*"|'[^']*')*?(/?)>""",
+                               mod_re.DOTALL)
+
+# Points which are dropped if unterminated (they may be incomplete):
+POINT_TAGS = ('trkpt', 'rtept', 'wpt')
+
+def close_unterminated_xml(xml: str) -> str:
+    """
+    Ends an unterminated XML document, for example a file written with
+    GPXWriter which was never closed. A truncated tag at the end is
+    removed, unterminated points (which may be incomplete) are dropped and
+    all the other elements left open are closed.
+
+    Documents without unterminated elements are returned unchanged.
+    """
+    open_elements: List[Tuple[str, int]] = []
+    end = 0
+    for match in RE_XML_MARKUP.finditer(xml):
+        end = match.end()
+        is_end_tag, tag, is_empty = match.groups()
+        if not tag or is_empty:
+            continue
+        if is_end_tag:
+            if open_elements and open_elements[-1][0] == tag:
+                open_elements.pop()
+        else:
+            open_elements.append((tag, match.start()))
+
+    # Anything after the last complete markup is text, or a truncated tag:
+    truncated = xml.find('<', end)
+    if truncated >= 0:
+        xml = xml[:truncated]
+    # ...and the text may end with a truncated entity:
+    entity = xml.rfind('&', end)
+    if entity >= 0 and ';' not in xml[entity:]:
+        xml = xml[:entity]
+    if not open_elements:
+        return xml
+
+    for element_no, (tag, start) in enumerate(open_elements):
+        if tag.rpartition(':')[2] in POINT_TAGS:
+            xml = xml[:start]
+            del open_elements[element_no:]
+            break
+
+    return xml + ''.join(f'</{tag}>' for tag, _ in reversed(open_elements))
+
+def _parse_child(xml: str, root_tag: str, root_name: str, start: int, end: int) -> Any:
+    """
+    Element of the child xml[start:end] of the gpx node, parsed inside the
+    gpx start tag root_tag (with its namespace declarations).
+    """
+    text = f'{root_tag}{xml[start:end]}</{root_name}>'
+    try:
+        if library() == "LXML":
+            root = mod_etree.XML(text.encode('utf-8'), mod_etree.XMLParser(remove_comments=True))
+        else:
+            root = mod_etree.XML(text)
+    except Exception as e:
+        raise mod_gpx.GPXXMLSyntaxException(f'Error parsing XML: {e}', e)
+    return root[0]
+
 def library() -> str:
     """
     Return the underlying ETree.
@@ -53,21 +125,45 @@ class GPXParser:
 
     Attributes:
         gpx: GPX instance of the most recently parsed XML
-        xml: string containing the XML text
+        xml: string containing the XML text (empty in streaming mode)
+        streaming: if True the XML is parsed incrementally with iterparse
+            and consumed elements are discarded as soon as they are
+            converted, so the whole document is never held in memory
+        lazy: if True the tracks, segments and points are decoded from the
+            XML tree only when they are first accessed
 
     """
 
-    def __init__(self, xml_or_file: Union[AnyStr, IO[str]]) -> None:
+    def __init__(self, xml_or_file: Union[AnyStr, IO[str]], streaming: bool=False, recover: bool=False, lazy: bool=False) -> None:
         """
         Initialize new GPXParser instance.
 
         Arguments:
             xml_or_file: string or file object containing the gpx
                 formatted xml
+            streaming: parse incrementally, without reading the whole
+                file in memory first
+            recover: if the XML is invalid, retry with the unterminated
+                elements closed (see close_unterminated_xml()), not
+                supported in streaming mode
+            lazy: decode GPX.tracks, GPXTrack.segments and
+                GPXTrackSegment.points on first access (the XML tree is
+                kept in memory until then), not supported in streaming mode
 
         """
+        if streaming and recover:
+            raise mod_gpx.GPXException('recover is not supported in streaming mode')
+        if streaming and lazy:
+            raise mod_gpx.GPXException('lazy is not supported in streaming mode')
         self.xml = ""
-        self.init(xml_or_file)
+        self.source: Any = None
+        self.streaming = streaming
+        self.recover = recover
+        self.lazy = lazy
+        if streaming:
+            self.source = xml_or_file
+        else:
+            self.init(xml_or_file)
         self.gpx = mod_gpx.GPX()
 
     def init(self, xml_or_file: Union[AnyStr, IO[str]]) -> None:
@@ -101,18 +197,17 @@ class GPXParser:
             GPXException: XML is valid but GPX data contains errors
 
         """
-        # Build prefix map for reserialization and extension handlings
-        for namespace in mod_re.findall(r'\sxmlns:?[^=]*="[^"]+"', self.xml):
-            prefix, _, URI = namespace[6:].partition('=')
-            prefix = prefix.lstrip(':')
-            if prefix == '':
-                prefix = 'defaultns'  # alias default for easier handling
-            else:
-                if prefix.startswith("ns"):
-                    mod_etree.register_namespace("noglobal_" + prefix, URI.strip('"'))
-                else:
-                    mod_etree.register_namespace(prefix, URI.strip('"'))
-            self.gpx.nsmap[prefix] = URI.strip('"')
+        if self.streaming:
+            return self._parse_streaming(version)
+
+        # Build prefix map for reserialization and extension handlings (the
+        # whitespace before xmlns is checked separately, a pattern starting
+        # with it is much slower to search for):
+        for match in mod_re.finditer(r'xmlns:?[^=]*="[^"]+"', self.xml):
+            if not match.start() or not self.xml[match.start() - 1].isspace():
+                continue
+            prefix, _, URI = match.group(0)[5:].partition('=')
+            self._add_namespace(prefix.lstrip(':'), URI.strip('"'))
 
         schema_loc = mod_re.search(r'\sxsi:schemaLocation="[^"]+"', self.xml)
         if schema_loc:
@@ -122,16 +217,20 @@ class GPXParser:
         # Remove default namespace to simplify processing later
         self.xml = mod_re.sub(r"""\sxmlns=(['"])[^'"]+\1""", '', self.xml, count=1)
 
+        # In lazy mode the tracks are cut out of the XML and parsed only when
+        # they are accessed:
+        track_loaders = self._cut_tracks() if self.lazy else None
+
         # Build tree
         try:
-            if library() == "LXML":
-                # lxml does not like unicode strings when it's expecting
-                # UTF-8. Also, XML comments result in a callable .tag().
-                # Strip them out to avoid handling them later.
-                self.xml = cast(str, self.xml.encode('utf-8'))
-                root = mod_etree.XML(self.xml, mod_etree.XMLParser(remove_comments=True))
-            else:
-                root = mod_etree.XML(self.xml)
+            try:
+                root = self._parse_xml()
+            except Exception:
+                if not self.recover:
+                    raise
+                xml = self.xml.decode('utf-8') if isinstance(self.xml, bytes) else self.xml
+                self.xml = close_unterminated_xml(xml)
+                root = self._parse_xml()
         except Exception as e:
             # The exception here can be a lxml or ElementTree exception.
             log.debug('Error in:\n%s\n-----------\n', self.xml, exc_info=True)
@@ -151,5 +250,206 @@ class GPXParser:
         if version is None:
             version = root.get('version')
 
-        mod_gpxfield.gpx_fields_from_xml(self.gpx, root, version)
-        return self.gpx
\ No newline at end of file
+        mod_gpxfield.gpx_fields_from_xml(self.gpx, root, version, self.lazy and track_loaders is None)
+        if track_loaders is not None:
+            self.gpx.tracks = [mod_gpxfield.make_lazy_instance(mod_gpx.GPXTrack, load, version) for load in track_loaders]
+        return self.gpx
+
+    def _cut_tracks(self) -> Optional[List[Callable[[], Any]]]:
+        """
+        Removes the tracks from self.xml and returns the functions parsing
+        their elements. Returns None (and leaves self.xml unchanged) if the
+        document isn't a complete gpx document without a DTD, those are
+        parsed as a whole.
+        """
+        from . import gpxxml as mod_gpxxml
+
+        xml = self.xml
+        if '<!DOCTYPE' in xml:
+            return None
+        root, elements, end = mod_gpxxml.scan_children(xml)
+        if root is None or end == len(xml):
+            return None
+
+        parts = []
+        loaders = []
+        position = 0
+        for tag, start, end in elements:
+            if tag == 'trk':
+                parts.append(xml[position:start])
+                loaders.append(mod_functools.partial(_parse_child, xml, root.group(0), root.group(2), start, end))
+                position = end
+        parts.append(xml[position:])
+        self.xml = ''.join(parts)
+        return loaders
+
+    def _parse_xml(self) -> Any:
+        """ Root node of the ETree built from self.xml """
+        if library() == "LXML":
+            # lxml does not like unicode strings when it's expecting
+            # UTF-8. Also, XML comments result in a callable .tag().
+            # Strip them out to avoid handling them later.
+            self.xml = cast(str, self.xml.encode('utf-8'))
+            return mod_etree.XML(self.xml, mod_etree.XMLParser(remove_comments=True))
+        return mod_etree.XML(self.xml)
+
+    def _add_namespace(self, prefix: str, uri: str) -> None:
+        """ Register the namespace and store it in the nsmap of the GPX. """
+        if prefix == '':
+            prefix = 'defaultns'  # alias default for easier handling
+        else:
+            if prefix.startswith("ns"):
+                mod_etree.register_namespace("noglobal_" + prefix, uri)
+            else:
+                mod_etree.register_namespace(prefix, uri)
+        self.gpx.nsmap[prefix] = uri
+
+    def _open_source(self) -> Any:
+        """ File object to be used by iterparse(). """
+        if hasattr(self.source, 'read'):
+            return self.source
+        if isinstance(self.source, bytes):
+            return mod_io.BytesIO(self.source)
+        return mod_io.StringIO(self.source)
+
+    def _iterparse(self) -> Iterator[Tuple[str, Any, List[Any]]]:
+        """
+        Incrementally parse the source and yield (event, element, path)
+        for every 'start' and 'end' event. Path is the list of currently
+        open elements (the last one being the element itself on 'start'
+        and its parent on 'end').
+
+        The default namespace is removed from the element tags (the same
+        way it is removed from the XML text in the non-streaming mode), and
+        namespace declarations and schema locations are stored in the GPX
+        object as they are found.
+
+        Raises:
+            GPXXMLSyntaxException: XML file is invalid
+            GPXException: The root node is not `gpx`
+        """
+        if library() == "LXML":
+            context = mod_etree.iterparse(self._open_source(), events=('start', 'end', 'start-ns'), remove_comments=True)
+        else:
+            context = mod_etree.iterparse(self._open_source(), events=('start', 'end', 'start-ns'))
+
+        path: List[Any] = []
+        default_ns_prefix: Optional[str] = None
+        iterator = iter(context)
+        while True:
+            try:
+                event, item = next(iterator)
+            except StopIteration:
+                break
+            except Exception as e:
+                # See parse() for why the ETree exception is wrapped:
+                log.debug('Error parsing XML', exc_info=True)
+                raise mod_gpx.GPXXMLSyntaxException(f'Error parsing XML: {e}', e)
+
+            if event == 'start-ns':
+                prefix, uri = item
+                if not path and prefix == '' and default_ns_prefix is None:
+                    default_ns_prefix = f'{{{uri}}}'
+                self._add_namespace(prefix, uri)
+            elif event == 'start':
+                if default_ns_prefix and item.tag.startswith(default_ns_prefix):
+                    item.tag = item.tag[len(default_ns_prefix):]
+                if not path:
+                    if item.tag.lower() != 'gpx':
+                        raise mod_gpx.GPXException('Document must have a `gpx` root node.')
+                    schema_loc = item.get(f'{{{XSI_NAMESPACE}}}schemaLocation')
+                    if schema_loc:
+                        self.gpx.schema_locations = schema_loc.split()
+                path.append(item)
+                yield event, item, path
+            else:
+                path.pop()
+                yield event, item, path
+
+    def _parse_streaming(self, version: Optional[str]=None) -> mod_gpx.GPX:
+        """
+        Parse the XML with iterparse(). Track points, segments, tracks,
+        waypoints and routes are converted as soon as their elements are
+        closed, and then removed from the tree.
+        """
+        waypoints: List[mod_gpx.GPXWaypoint] = []
+        routes: List[mod_gpx.GPXRoute] = []
+        tracks: List[mod_gpx.GPXTrack] = []
+        segments: List[mod_gpx.GPXTrackSegment] = []
+        points: List[mod_gpx.GPXTrackPoint] = []
+
+        root = None
+        for event, node, path in self._iterparse():
+            depth = len(path)
+            if event == 'start':
+                if depth == 1:
+                    root = node
+                    if version is None:
+                        version = root.get('version')
+                continue
+
+            if depth == 3 and node.tag == 'trkpt' and path[-1].tag == 'trkseg' and path[-2].tag == 'trk':
+                points.append(mod_gpxfield.gpx_fields_from_xml(mod_gpx.GPXTrackPoint, node, cast(str, version)))
+            elif depth == 2 and node.tag == 'trkseg' and path[-1].tag == 'trk':
+                segment = mod_gpxfield.gpx_fields_from_xml(mod_gpx.GPXTrackSegment, node, cast(str, version))
+                segment.points, points = points, []
+                segments.append(segment)
+            elif depth == 1 and node.tag == 'trk':
+                track = mod_gpxfield.gpx_fields_from_xml(mod_gpx.GPXTrack, node, cast(str, version))
+                track.segments, segments = segments, []
+                tracks.append(track)
+            elif depth == 1 and node.tag == 'wpt':
+                waypoints.append(mod_gpxfield.gpx_fields_from_xml(mod_gpx.GPXWaypoint, node, cast(str, version)))
+            elif depth == 1 and node.tag == 'rte':
+                routes.append(mod_gpxfield.gpx_fields_from_xml(mod_gpx.GPXRoute, node, cast(str, version)))
+            else:
+                continue
+
+            # Converted, free the memory:
+            node.clear()
+            path[-1].remove(node)
+
+        if root is None:
+            raise mod_gpx.GPXException('Document must have a `gpx` root node.')
+
+        mod_gpxfield.gpx_fields_from_xml(self.gpx, root, cast(str, version))
+        self.gpx.waypoints = waypoints
+        self.gpx.routes = routes
+        self.gpx.tracks = tracks
+        return self.gpx
+
+    def iter_points(self) -> Iterator[mod_gpx.TrackPointRecord]:
+        """
+        Incrementally parse the XML and yield a TrackPointRecord (latitude,
+        longitude, elevation, time, track_no, segment_no and point_no) for
+        every track point. No GPX object is built and every element is
+        discarded as soon as it is closed, so the memory used is constant.
+
+        Raises:
+            GPXXMLSyntaxException: XML file is invalid
+            GPXException: XML is valid but GPX data contains errors
+        """
+        if not self.source:
+            self.source = self.xml
+
+        track_no, segment_no, point_no = -1, -1, -1
+        for event, node, path in self._iterparse():
+            depth = len(path)
+            if event == 'start':
+                if depth == 2 and node.tag == 'trk':
+                    track_no += 1
+                    segment_no = -1
+                elif depth == 3 and node.tag == 'trkseg' and path[-2].tag == 'trk':
+                    segment_no += 1
+                    point_no = -1
+                continue
+
+            if depth == 3 and node.tag == 'trkpt' and path[-1].tag == 'trkseg' and path[-2].tag == 'trk':
+                point_no += 1
+                latitude, longitude, elevation, time = [field.from_xml(node, '1.0') for field in POINT_RECORD_FIELDS]
+                yield mod_gpx.TrackPointRecord(latitude, longitude, elevation, time, track_no, segment_no, point_no)
+            elif not (depth == 1 or (depth == 2 and node.tag == 'trkseg')):
+                continue
+
+            node.clear()
+            path[-1].remove(node)
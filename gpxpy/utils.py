@@ -16,6 +16,7 @@ import sys as mod_sys
 import math as mod_math
 import xml.sax.saxutils as mod_saxutils
 import datetime as mod_datetime
+import io as mod_io
 
 from typing import Any, AnyStr, List, Optional, cast
 
@@ -82,3 +83,17 @@ def make_str(s: AnyStr) -> str:
         # scientific notation is illegal in GPX 1/1
         return format(s, '.10f').rstrip('0').rstrip('.')
     return str(s)
+
+
+def is_binary_file(fileobj: Any) -> bool:
+    """
+    True if bytes must be written into fileobj: binary io objects and
+    wrappers of binary files (like tempfile.NamedTemporaryFile()) with a
+    binary mode.
+    """
+    if isinstance(fileobj, mod_io.TextIOBase):
+        return False
+    if isinstance(fileobj, (mod_io.RawIOBase, mod_io.BufferedIOBase)):
+        return True
+    mode = getattr(fileobj, 'mode', '')
+    return isinstance(mode, str) and 'b' in mode
@@ -0,0 +1,196 @@
+# Copyright 2011 Tomo Krajina
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Append-only GPX writer, for recording tracks while they are recorded.
+
+Every point is serialized and written once, the points are not kept in
+memory. After close() the file is the same as GPX.to_xml() of a GPX with
+all the written tracks, segments and points.
+
+If the writer never gets to close() (for example the logger crashed), the
+unterminated file can be read with gpxpy.parse(file, recover=True).
+"""
+
+from . import gpx as mod_gpx
+from . import gpxfield as mod_gpxfield
+from . import utils as mod_utils
+
+from typing import *
+
+# Name of the placeholder objects used to find where the tracks, segments
+# and points are in the XML of their parent:
+_PLACEHOLDER = '\x00gpxpy placeholder\x00'
+
+
+class GPXWriter:
+    """
+    Writes a GPX document incrementally:
+
+        with open('track.gpx', 'w') as f:
+            with GPXWriter(f) as writer:
+                writer.start_track(GPXTrack(name='Morning ride'))
+                for point in logger:
+                    writer.append_point(point)
+                    writer.flush()
+
+    The gpx argument is the template for everything except the new tracks
+    (metadata, waypoints, routes, extensions). Its tracks (if any) are
+    written before the tracks started with start_track().
+    """
+
+    def __init__(self, fileobj: Any, gpx: Optional[mod_gpx.GPX]=None, version: Optional[str]=None, prettyprint: bool=True) -> None:
+        """
+        Writes the document preamble.
+
+        Parameters
+        ----------
+        fileobj:
+            Text or binary (then UTF-8 is written) file object
+        gpx: GPX
+            Template for the document, default is an empty GPX
+        version: str
+            GPX version ('1.0' or '1.1'), default is gpx.version or '1.1'
+        prettyprint: bool
+            Indent the XML
+        """
+        self.fileobj = fileobj
+        self.binary = mod_utils.is_binary_file(fileobj)
+        self.gpx = gpx or mod_gpx.GPX()
+        self.prettyprint = prettyprint
+        self.version = self.gpx._prepare_to_xml(version)
+        self.closed = False
+
+        self._track_suffix: Optional[str] = None
+        self._segment_suffix: Optional[str] = None
+
+        placeholder = mod_gpx.GPXTrack(name=_PLACEHOLDER)
+        tracks = self.gpx.tracks
+        self.gpx.tracks = tracks + [placeholder]
+        try:
+            xml = self.gpx.to_xml(self.version, prettyprint=prettyprint)
+        finally:
+            self.gpx.tracks = tracks
+        prefix, self._gpx_suffix = self._split(xml, placeholder, 'trk', 1)
+        self._write(prefix)
+
+    def _indent(self, depth: int) -> str:
+        return '  ' * depth if self.prettyprint else ''
+
+    def _to_xml(self, instance: Any, tag: str, depth: int) -> str:
+        return mod_gpxfield.gpx_fields_to_xml(instance, tag, self.version, nsmap=self.gpx.nsmap,
+                                              prettyprint=self.prettyprint, indent=self._indent(depth))
+
+    def _split(self, xml: str, placeholder: Any, tag: str, depth: int) -> Tuple[str, str]:
+        """ Parts of xml before and after the XML of placeholder """
+        placeholder_xml = self._to_xml(placeholder, tag, depth)
+        position = xml.index(placeholder_xml)
+        return xml[:position], xml[position + len(placeholder_xml):]
+
+    def _write(self, xml: str) -> None:
+        self.fileobj.write(xml.encode('utf-8') if self.binary else xml)
+
+    def _check_open(self) -> None:
+        if self.closed:
+            raise mod_gpx.GPXException('GPXWriter is closed')
+
+    def start_track(self, track: Optional[mod_gpx.GPXTrack]=None) -> None:
+        """
+        Closes the current track (if any) and starts a new one. The fields
+        (name, description, ...) and segments of track are written
+        immediately, points are then added with append_point().
+        """
+        self._check_open()
+        self._end_track()
+
+        track = track or mod_gpx.GPXTrack()
+        placeholder = mod_gpx.GPXTrackSegment([mod_gpx.GPXTrackPoint(name=_PLACEHOLDER)])
+        segments = track.segments
+        track.segments = segments + [placeholder]
+        try:
+            xml = self._to_xml(track, 'trk', 1)
+        finally:
+            track.segments = segments
+        prefix, self._track_suffix = self._split(xml, placeholder, 'trkseg', 2)
+        self._write(prefix)
+
+    def start_segment(self, segment: Optional[mod_gpx.GPXTrackSegment]=None) -> None:
+        """
+        Closes the current segment (if any) and starts a new one in the
+        current track (a new track is started if needed). The points of
+        segment (if any) are written immediately.
+        """
+        self._check_open()
+        self._end_segment()
+        if self._track_suffix is None:
+            self.start_track()
+
+        segment = segment or mod_gpx.GPXTrackSegment()
+        placeholder = mod_gpx.GPXTrackPoint(name=_PLACEHOLDER)
+        points = segment.points
+        segment.points = points + [placeholder]
+        try:
+            xml = self._to_xml(segment, 'trkseg', 2)
+        finally:
+            segment.points = points
+        prefix, self._segment_suffix = self._split(xml, placeholder, 'trkpt', 3)
+        self._write(prefix)
+
+    def append_point(self, point: mod_gpx.GPXTrackPoint) -> None:
+        """
+        Writes the point into the current segment (a new segment is started
+        if needed).
+        """
+        self._check_open()
+        if self._segment_suffix is None:
+            self.start_segment()
+        self._write(self._to_xml(point, 'trkpt', 3))
+
+    def append_points(self, points: Iterable[mod_gpx.GPXTrackPoint]) -> None:
+        """ See append_point() """
+        for point in points:
+            self.append_point(point)
+
+    def _end_segment(self) -> None:
+        if self._segment_suffix is not None:
+            self._write(self._segment_suffix)
+            self._segment_suffix = None
+
+    def _end_track(self) -> None:
+        self._end_segment()
+        if self._track_suffix is not None:
+            self._write(self._track_suffix)
+            self._track_suffix = None
+
+    def flush(self) -> None:
+        """ Flushes the file object (the document stays open) """
+        self.fileobj.flush()
+
+    def close(self) -> None:
+        """
+        Closes the current segment and track and ends the document. The
+        file object is flushed, but not closed.
+        """
+        if self.closed:
+            return
+        self._end_track()
+        self._write(self._gpx_suffix)
+        self.closed = True
+        self.flush()
+
+    def __enter__(self) -> "GPXWriter":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
@@ -34,7 +34,12 @@ import random as mod_random
 import math as mod_math
 import sys as mod_sys
 import unittest as mod_unittest
+import unittest.mock as mod_mock
 import xml.dom.minidom as mod_minidom
+import io as mod_io
+import gzip as mod_gzip
+import tempfile as mod_tempfile
+import pathlib as mod_pathlib
 
 try:
     # Load LXML or fallback to cET or ET 
@@ -51,6 +56,9 @@ import gpxpy.gpxxml as mod_gpxxml
 import gpxpy.gpxfield as mod_gpxfield
 import gpxpy.parser as mod_parser
 import gpxpy.geo as mod_geo
+import gpxpy.columnar as mod_columnar
+import gpxpy.writer as mod_writer
+import gpxpy.cache as mod_cache
 
 from gpxpy.utils import make_str
 from gpxpy.utils import total_seconds
@@ -1691,6 +1699,20 @@ class GPXTests(mod_unittest.TestCase):
 
         gpx.simplify()
 
+    def test_simplify_long_polyline(self) -> None:
+        # Zig-zag with ~55m amplitude:
+        points = [mod_geo.Location(45 + (i % 2) * 0.0005, 13 + i * 0.00001) for i in range(20000)]
+
+        simplified = mod_geo.simplify_polyline(points, 100)
+        self.assertEqual([points[0], points[-1]], simplified)
+
+        simplified = mod_geo.simplify_polyline(points, 10)
+        self.assertTrue(len(simplified) > 19900)
+        self.assertIs(points[0], simplified[0])
+        self.assertIs(points[-1], simplified[-1])
+
+        self.assertEqual(points[:2], mod_geo.simplify_polyline(points[:2], 10))
+
     def test_nan_elevation(self) -> None:
         xml = '<?xml version="1.0" encoding="UTF-8"?><gpx> <wpt lat="12" lon="13"> <ele>nan</ele></wpt> <rte> <rtept lat="12" lon="13"> <ele>nan</ele></rtept></rte> <trk> <name/> <desc/> <trkseg> <trkpt lat="12" lon="13"> <ele>nan</ele></trkpt></trkseg></trk></gpx>'
         gpx = mod_gpxpy.parse(xml)
@@ -1741,6 +1763,18 @@ class GPXTests(mod_unittest.TestCase):
             print(f'Parsing: {timestamp}')
             self.assertTrue(mod_gpxfield.parse_time(timestamp) is not None)
 
+    def test_parse_times(self) -> None:
+        timestamps = ['2001-10-26T19:32:52Z', '2001-10-26T21:32:52.12679+02:00', '2001-10-26 21:32:52',
+                      '2001-10-26T21:32:52−0130', '', None, 'invalid', '2001-13-26T21:32:52Z']
+        times = mod_gpxfield.parse_times(timestamps)
+        self.assertEqual([mod_gpxfield.TIME_TYPE.from_string(timestamp) for timestamp in timestamps], times) # type: ignore
+        self.assertEqual(mod_datetime.datetime(2001, 10, 26, 21, 32, 52, 126790, mod_gpxfield.SimpleTZ('+02:00')), times[1])
+        self.assertEqual(-90, times[3].tzinfo.offset) # type: ignore
+        self.assertEqual([None] * 4, times[4:])
+
+        # Timezones are shared:
+        self.assertIs(times[0].tzinfo, mod_gpxfield.parse_time('2011-10-26T19:32:52Z').tzinfo) # type: ignore
+
     def test_dst_in_SimpleTZ(self) -> None:
         # No DST in UTC times.
         timestamps = ['2001-10-26T19:32:52Z',
@@ -1785,6 +1819,42 @@ class GPXTests(mod_unittest.TestCase):
         self.assertEqual(gpx.tracks[0].get_location_at(mod_datetime.datetime(2013, 1, 2, 12, 31, 0))[0], p1)
         self.assertEqual(gpx.tracks[0].get_location_at(mod_datetime.datetime(2013, 1, 2, 12, 31, 30)), [])
 
+    def test_get_locations_at(self) -> None:
+        segment = mod_gpx.GPXTrackSegment()
+        p0 = mod_gpx.GPXTrackPoint(latitude=13.0, longitude=13.0, elevation=100, time=mod_datetime.datetime(2013, 1, 2, 12, 30, 0))
+        p1 = mod_gpx.GPXTrackPoint(latitude=13.1, longitude=13.2, elevation=200, time=mod_datetime.datetime(2013, 1, 2, 12, 31, 0))
+        p2 = mod_gpx.GPXTrackPoint(latitude=13.2, longitude=13.4, time=mod_datetime.datetime(2013, 1, 2, 12, 32, 0))
+        segment.points.extend([p0, p1, p2])
+
+        times = [mod_datetime.datetime(2013, 1, 2, 12, 31, 30), mod_datetime.datetime(2013, 1, 2, 12, 29, 0),
+                 mod_datetime.datetime(2013, 1, 2, 12, 30, 0), mod_datetime.datetime(2013, 1, 2, 12, 30, 15)]
+        self.assertEqual([p2, None, p0, p1], segment.get_locations_at(times))
+        self.assertEqual([segment.get_location_at(time) for time in times], segment.get_locations_at(times))
+
+        location = segment.get_location_at(times[3], interpolate=True)
+        self.assertAlmostEqual(13.025, location.latitude) # type: ignore
+        self.assertAlmostEqual(13.05, location.longitude) # type: ignore
+        self.assertAlmostEqual(125, location.elevation) # type: ignore
+        self.assertEqual(times[3], location.time) # type: ignore
+        location = segment.get_locations_at(times, interpolate=True)[0]
+        self.assertAlmostEqual(13.15, location.latitude) # type: ignore
+        self.assertAlmostEqual(13.3, location.longitude) # type: ignore
+        self.assertIsNone(location.elevation) # type: ignore
+        self.assertIs(p0, segment.get_location_at(times[2], interpolate=True))
+
+        # The time index must be rebuilt after changes:
+        segment.adjust_time(mod_datetime.timedelta(minutes=1))
+        self.assertEqual(p0, segment.get_location_at(mod_datetime.datetime(2013, 1, 2, 12, 31, 0)))
+        # Points changed directly need invalidate_cache():
+        p1.time = mod_datetime.datetime(2013, 1, 2, 12, 31, 30)
+        segment.invalidate_cache()
+        self.assertEqual(p2, segment.get_location_at(mod_datetime.datetime(2013, 1, 2, 12, 32, 0)))
+
+        gpx = mod_gpx.GPX()
+        gpx.tracks.append(mod_gpx.GPXTrack())
+        gpx.tracks[0].segments.append(segment)
+        self.assertEqual([[p1], []], gpx.get_locations_at([mod_datetime.datetime(2013, 1, 2, 12, 31, 30), times[1]]))
+
     def test_adjust_time_tracks_only(self) -> None:
         gpx = mod_gpx.GPX()
 
@@ -3566,6 +3636,617 @@ class GPXTests(mod_unittest.TestCase):
         self.assertAlmostEqual(waypoint_orig.longitude, waypoint.longitude)
         self.assertAlmostEqual(waypoint_orig.elevation, waypoint.elevation) # type: ignore
 
+    def test_streaming_parse(self) -> None:
+        for file_name in ('korita-zbevnica.gpx', 'gpx1.0_with_all_fields.gpx', 'gpx1.1_with_all_fields.gpx',
+                          'gpx1.1_with_extensions.gpx', 'route.gpx', 'unicode_with_bom.gpx'):
+            with open(f'test_files/{file_name}', encoding='utf-8') as f:
+                gpx = mod_gpxpy.parse(f)
+            with open(f'test_files/{file_name}', 'rb') as f:
+                streamed_gpx = mod_gpxpy.parse(f, streaming=True)
+            self.assertEqual(gpx.nsmap, streamed_gpx.nsmap)
+            self.assertEqual(gpx.schema_locations, streamed_gpx.schema_locations)
+            self.assertEqual(gpx.to_xml(), streamed_gpx.to_xml())
+
+    def test_streaming_parse_string_and_errors(self) -> None:
+        gpx = mod_gpxpy.parse('<gpx version="1.0"><trk><trkseg><trkpt lat="1" lon="2"/></trkseg></trk></gpx>', streaming=True)
+        self.assertEqual('1.0', gpx.version)
+        self.assertEqual(1, gpx.get_track_points_no())
+
+        with self.assertRaises(mod_gpx.GPXXMLSyntaxException):
+            mod_gpxpy.parse('<gpx></gpx', streaming=True)
+        with self.assertRaises(mod_gpx.GPXException):
+            mod_gpxpy.parse('<kml></kml>', streaming=True)
+
+    def test_iter_points(self) -> None:
+        gpx = self.parse('track-with-empty-segment.gpx')
+        with open('test_files/track-with-empty-segment.gpx', 'rb') as f:
+            records = list(mod_gpxpy.iter_points(f))
+        self.assertEqual(gpx.get_track_points_no(), len(records))
+        for record, (point, track_no, segment_no, point_no) in zip(records, gpx.walk()):
+            self.assertEqual((point.latitude, point.longitude, point.elevation, point.time, track_no, segment_no, point_no),
+                             tuple(record))
+        self.assertTrue(isinstance(records[0], mod_gpx.TrackPointRecord))
+
+    @mod_unittest.skipIf(mod_columnar.mod_numpy is None, "numpy not installed")
+    def test_columnar_track_segment(self) -> None:
+        gpx = self.parse('cerknicko-without-times.gpx')
+        gpx.tracks[1].segments[0].points[1].elevation = None
+        gpx.tracks[1].segments[0].points[2].time = mod_datetime.datetime(2013, 1, 2, 12, 30, 1, 123456)
+        gpx.tracks[1].segments[0].points[3].time = mod_gpxfield.parse_time('2013-01-02T14:30:02.5+02:00')
+
+        for segment in gpx.tracks[1].segments + gpx.tracks[0].segments:
+            columns = mod_columnar.ColumnarTrackSegment.from_segment(segment)
+            self.assertEqual(segment.get_points_no(), len(columns))
+            self.assertEqual(list(segment.get_bounds() or []), list(columns.get_bounds() or []))
+            self.assertEqual(segment.get_time_bounds(), columns.get_time_bounds())
+            self.assertEqual(segment.get_elevation_extremes(), columns.get_elevation_extremes())
+
+            converted = columns.to_segment()
+            self.assertEqual([(p.latitude, p.longitude, p.elevation, p.time) for p in segment.points],
+                             [(p.latitude, p.longitude, p.elevation, p.time) for p in converted.points])
+            self.assertEqual([p.time.tzname() if p.time else None for p in segment.points],
+                             [p.time.tzname() if p.time else None for p in converted.points])
+
+    def test_distances(self) -> None:
+        latitudes = [45.0, 45.001, 45.002, 45.5, 45.5001, 45.5002]
+        longitudes = [13.0, 13.001, 13.0005, 13.2, 13.2, 13.2001]
+        elevations = [100.0, None, 120.0, 130.0, 130.0, 125.5]
+        locations = [mod_geo.Location(*location) for location in zip(latitudes, longitudes, elevations)]
+
+        distances_2d = mod_geo.distances(latitudes, longitudes)
+        distances_3d = mod_geo.distances(latitudes, longitudes, elevations)
+        haversine_distances = mod_geo.haversine_distances(latitudes, longitudes)
+        self.assertEqual(len(locations) - 1, len(distances_2d))
+        self.assertEqual(len(locations) - 1, len(distances_3d))
+        self.assertEqual(len(locations) - 1, len(haversine_distances))
+        for i in range(1, len(locations)):
+            location, previous = locations[i], locations[i - 1]
+            self.assertAlmostEqual(location.distance_2d(previous), distances_2d[i - 1], places=8) # type: ignore
+            self.assertAlmostEqual(location.distance_3d(previous), distances_3d[i - 1], places=8) # type: ignore
+            self.assertAlmostEqual(mod_geo.haversine_distance(location.latitude, location.longitude, previous.latitude, previous.longitude),
+                                   haversine_distances[i - 1], places=8)
+
+        self.assertEqual(0, len(mod_geo.distances([1.0], [2.0])))
+
+    @mod_unittest.skipIf(mod_columnar.mod_numpy is None, "numpy not installed")
+    def test_columnar_track_segment_length(self) -> None:
+        gpx = self.parse('korita-zbevnica.gpx')
+        for segment in gpx.tracks[1].segments:
+            columns = mod_columnar.ColumnarTrackSegment.from_segment(segment)
+            self.assertAlmostEqual(segment.length_2d(), columns.length_2d(), places=6) # type: ignore
+            self.assertAlmostEqual(segment.length_3d(), columns.length_3d(), places=6)
+
+    @mod_unittest.skipIf(mod_geo.mod_numpy is None, "numpy not installed")
+    def test_moving_data_arrays(self) -> None:
+        segments = [segment for file_name in ['cerknicko-jezero.gpx', 'Mojstrovka.gpx', 'around-visnjan-with-car.gpx']
+                    for track in self.parse(file_name).tracks for segment in track.segments]
+        arguments = [(threshold, False, percentiles, ignore_nonstandard_distances)
+                     for threshold in [None, 0.5, 5] for percentiles in [0, 0.05, 0.5] for ignore_nonstandard_distances in [True, False]]
+
+        results = [segment.get_moving_data(*argument) for segment in segments for argument in arguments] # type: ignore
+        numpy = mod_geo.mod_numpy
+        try:
+            mod_geo.mod_numpy = None
+            self.assertEqual([segment.get_moving_data(*argument) for segment in segments for argument in arguments], results) # type: ignore
+        finally:
+            mod_geo.mod_numpy = numpy
+        self.assertTrue(any(result.max_speed for result in results))
+
+    def test_calculate_max_speeds(self) -> None:
+        random = mod_random.Random(1)
+        parts = [[(random.random() * 10, random.choice([random.uniform(1, 20), 5.0])) for _ in range(size)]
+                 for size in [0, 1, 2, 3, 10, 100, 1000]]
+        parts.append([(1.0, 5.0)] * 7)
+        for percentiles in [0, 0.05, 0.5, 1]:
+            for ignore_nonstandard_distances in [True, False]:
+                expected = [mod_geo.calculate_max_speed(part, percentiles, ignore_nonstandard_distances) if part else None for part in parts]
+                self.assertEqual(expected, mod_geo.calculate_max_speeds(parts, percentiles, ignore_nonstandard_distances))
+
+        speeds = [float(speed) for speed in range(100)]
+        random.shuffle(speeds)
+        self.assertEqual(95., mod_geo.calculate_max_speed([(speed, 1.) for speed in speeds], 0.05, True))
+        self.assertEqual(99., mod_geo.calculate_max_speed([(speed, 1.) for speed in speeds], 0, True))
+        self.assertEqual(2., mod_geo.calculate_max_speed([(speed, 1.) for speed in speeds], 0.98, True))
+
+    def test_statistics(self) -> None:
+        gpx = self.parse('korita-zbevnica.gpx')
+        for part in [gpx, gpx.tracks[1], gpx.tracks[1].segments[0], gpx.tracks[0].segments[0]]:
+            statistics = part.get_statistics() # type: ignore
+            self.assertEqual(part.length_2d(), statistics.length_2d) # type: ignore
+            self.assertEqual(part.length_3d(), statistics.length_3d) # type: ignore
+            self.assertEqual(part.get_moving_data(), statistics.moving_data) # type: ignore
+            self.assertEqual(part.get_moving_data(raw=True), statistics.raw_moving_data) # type: ignore
+            self.assertEqual(part.get_uphill_downhill(), statistics.uphill_downhill) # type: ignore
+            self.assertEqual(part.get_elevation_extremes(), statistics.elevation_extremes) # type: ignore
+            self.assertEqual(part.get_time_bounds(), statistics.time_bounds) # type: ignore
+            self.assertEqual(list(part.get_bounds() or []), list(statistics.bounds or [])) # type: ignore
+            self.assertEqual(part.get_points_no(), statistics.points_no) # type: ignore
+            if statistics.points_no:
+                self.assertAlmostEqual(statistics.length_2d / statistics.points_no, statistics.average_point_distance)
+
+        statistics = mod_gpx.GPX().get_statistics()
+        self.assertEqual(0, statistics.points_no)
+        self.assertEqual(mod_gpx.MinimumMaximum(None, None), statistics.elevation_extremes)
+        self.assertIsNone(statistics.bounds)
+
+    def test_nearest_location_spatial_index(self) -> None:
+        gpx = self.parse('korita-zbevnica.gpx')
+        locations = [mod_geo.Location(point.latitude + 0.0005, point.longitude - 0.0003)
+                     for point in list(gpx.walk(only_points=True))[::25]]
+        locations += [mod_geo.Location(1, 1), mod_geo.Location(45.45, 179.9)]
+
+        def linear_nearest(location: mod_geo.Location) -> mod_gpx.NearestLocationData:
+            return min((mod_gpx.NearestLocationData(*data) for data in gpx.walk()),
+                       key=lambda data: data.location.distance_2d(location)) # type: ignore
+
+        batch = gpx.get_nearest_location_batch(locations)
+        self.assertEqual(len(locations), len(batch))
+        for location, nearest in zip(locations, batch):
+            self.assertEqual(linear_nearest(location), nearest)
+            self.assertEqual(nearest, gpx.get_nearest_location(location))
+
+        # The index must be rebuilt after changes:
+        location = mod_geo.Location(45.5, 14.1)
+        gpx.tracks[1].segments[0].points.append(mod_gpx.GPXTrackPoint(45.5, 14.1))
+        self.assertEqual((1, 0, 358), gpx.get_nearest_location(location)[1:]) # type: ignore
+        gpx.tracks[1].segments[0].move(mod_geo.LocationDelta(latitude_diff=1, longitude_diff=0))
+        self.assertEqual(linear_nearest(location), gpx.get_nearest_location(location))
+
+    def test_spatial_index_far_location(self) -> None:
+        # The center of a circular track is far from every point, most of the cells around it are empty:
+        locations = [mod_geo.Location(45 + 0.5 * mod_math.sin(2 * mod_math.pi * i / 5000), 14 + 0.5 * mod_math.cos(2 * mod_math.pi * i / 5000))
+                     for i in range(5000)]
+        index = mod_geo.SpatialIndex(locations)
+        center = mod_geo.Location(45, 14)
+
+        def distance(indexed_location: mod_geo.Location, location: mod_geo.Location) -> Optional[float]:
+            return indexed_location.distance_2d(location)
+
+        linear = min(range(len(locations)), key=lambda location_no: locations[location_no].distance_2d(center)) # type: ignore
+        with mod_mock.patch.object(index, '_nearest_linear', wraps=index._nearest_linear) as nearest_linear:
+            self.assertEqual(linear, index.nearest(center, distance))
+        nearest_linear.assert_called_once()
+        self.assertEqual(0, index.nearest(mod_geo.Location(45, 14.5), distance))
+
+    def test_fields_decoder(self) -> None:
+        xml = '<wpt lat="1.5" lon="2"><ele>3</ele><time>2001-10-26T19:32:52Z</time><name>n</name><url>u</url>' \
+              '<link href="h"><text>t</text></link><type>x</type><fix>3d</fix><sat>4</sat><ele>5</ele>' \
+              '<extensions><a>b</a></extensions></wpt>'
+        for version in ['1.0', '1.1']:
+            decoded = mod_gpxfield.gpx_fields_from_xml(mod_gpx.GPXWaypoint, mod_etree.fromstring(xml), version)
+            interpreted = mod_gpxfield.gpx_fields_from_xml(mod_gpx.GPXWaypoint(), mod_etree.fromstring(xml), version)
+            for attribute in mod_gpx.GPXWaypoint.__slots__:
+                if attribute != 'extensions':
+                    self.assertEqual(getattr(interpreted, attribute), getattr(decoded, attribute))
+            self.assertEqual(len(interpreted.extensions), len(decoded.extensions))
+            self.assertEqual(3, decoded.elevation)
+
+        for xml in ['<wpt lat="x" lon="2"/>', '<wpt lon="2"/>', '<wpt lat="1" lon="2"><ele>x</ele><fix>x</fix></wpt>']:
+            errors = []
+            for class_or_instance in [mod_gpx.GPXWaypoint, mod_gpx.GPXWaypoint()]:
+                try:
+                    mod_gpxfield.gpx_fields_from_xml(class_or_instance, mod_etree.fromstring(xml), '1.1')
+                except mod_gpx.GPXException as e:
+                    errors.append(str(e))
+            self.assertEqual(2, len(errors))
+            self.assertEqual(errors[0], errors[1])
+
+    def test_fields_encoder(self) -> None:
+        gpx = self.parse('gpx1.1_with_all_fields.gpx')
+        point = gpx.tracks[0].segments[0].points[0]
+        point.latitude = 1e-7
+        point.name = 'a<b & c>'
+        point.elevation = None
+        gpx.bounds = mod_gpx.GPXBounds(1, None, 3, 4)
+        gpx.author_email = None
+        for version in ['1.0', '1.1']:
+            for prettyprint in [True, False]:
+                for instance, tag in [(gpx, 'gpx'), (point, 'trkpt'), (gpx.bounds, 'bounds')]:
+                    encoded = mod_gpxfield.gpx_fields_to_xml(instance, tag, version, nsmap=gpx.nsmap, prettyprint=prettyprint)
+                    interpreted = mod_gpxfield._interpret_fields_to_xml(instance, tag, version, nsmap=gpx.nsmap, prettyprint=prettyprint)
+                    self.assertEqual(interpreted, encoded)
+                    self.assertTrue(encoded)
+
+        xml = mod_gpxfield.gpx_fields_to_xml(point, 'trkpt', '1.1', prettyprint=False)
+        self.assertTrue(xml.startswith('\n<trkpt lat="0.0000001" lon='))
+        self.assertTrue('<name>a&lt;b &amp; c&gt;</name>' in xml)
+        self.assertFalse('<ele>' in xml)
+
+    def test_write(self) -> None:
+        gpx = self.parse('gpx1.1_with_all_fields.gpx')
+        segment = gpx.tracks[0].segments[0]
+        for i in range(2500):
+            segment.points.append(mod_gpx.GPXTrackPoint(45 + i / 1000, 13, elevation=i))
+        for version in ['1.0', '1.1']:
+            for prettyprint in [True, False]:
+                xml = gpx.to_xml(version, prettyprint=prettyprint)
+                chunks = list(gpx.to_xml_iter(version, prettyprint=prettyprint))
+                self.assertTrue(len(chunks) > 3)
+                self.assertEqual(xml, ''.join(chunks))
+
+                text = mod_io.StringIO()
+                gpx.write(text, version, prettyprint=prettyprint)
+                self.assertEqual(xml, text.getvalue())
+
+                binary = mod_io.BytesIO()
+                with mod_gzip.GzipFile(fileobj=binary, mode='wb') as f:
+                    gpx.write(f, version, prettyprint=prettyprint)
+                self.assertEqual(xml, mod_gzip.decompress(binary.getvalue()).decode('utf-8'))
+
+                # Wrapper of a binary file (not an io.BufferedIOBase):
+                with mod_tempfile.NamedTemporaryFile() as f:
+                    gpx.write(f, version, prettyprint=prettyprint)
+                    f.seek(0)
+                    self.assertEqual(xml, f.read().decode('utf-8'))
+
+        with mod_tempfile.NamedTemporaryFile() as f:
+            writer = mod_writer.GPXWriter(f, mod_gpx.GPX())
+            writer.start_track(mod_gpx.GPXTrack())
+            writer.append_point(mod_gpx.GPXTrackPoint(1, 2))
+            writer.close()
+            f.seek(0)
+            self.assertEqual(1, mod_gpxpy.parse(f.read().decode('utf-8')).get_track_points_no())
+
+    def test_gpx_writer(self) -> None:
+        for version in ['1.0', '1.1']:
+            for prettyprint in [True, False]:
+                gpx = self.parse('gpx1.1_with_all_fields.gpx')
+                expected = self.parse('gpx1.1_with_all_fields.gpx')
+
+                f = mod_io.StringIO()
+                writer = mod_writer.GPXWriter(f, gpx, version, prettyprint=prettyprint)
+                for track_no in range(2):
+                    writer.start_track(mod_gpx.GPXTrack(name=f'Track {track_no} <&>'))
+                    expected.tracks.append(mod_gpx.GPXTrack(name=f'Track {track_no} <&>'))
+                    for segment_no in range(2):
+                        writer.start_segment()
+                        expected.tracks[-1].segments.append(mod_gpx.GPXTrackSegment())
+                        for point_no in range(3):
+                            point = mod_gpx.GPXTrackPoint(45 + point_no, 13, elevation=segment_no,
+                                                          time=mod_datetime.datetime(2020, 1, 1, 10, point_no))
+                            writer.append_point(point)
+                            expected.tracks[-1].segments[-1].points.append(point)
+                writer.close()
+
+                self.assertEqual(expected.to_xml(version, prettyprint=prettyprint), f.getvalue())
+                self.assertTrue(writer.closed)
+                with self.assertRaises(mod_gpx.GPXException):
+                    writer.append_point(mod_gpx.GPXTrackPoint(1, 2))
+
+    def test_parse_recover(self) -> None:
+        f = mod_io.StringIO()
+        writer = mod_writer.GPXWriter(f)
+        writer.append_points([mod_gpx.GPXTrackPoint(45, 13, elevation=i) for i in range(3)])
+        writer.start_segment()
+        writer.append_point(mod_gpx.GPXTrackPoint(46, 14, time=mod_datetime.datetime(2020, 1, 1)))
+        xml = f.getvalue()
+
+        with self.assertRaises(mod_gpx.GPXXMLSyntaxException):
+            mod_gpxpy.parse(xml)
+
+        gpx = mod_gpxpy.parse(xml, recover=True)
+        self.assertEqual([3, 1], [len(segment.points) for segment in gpx.tracks[0].segments])
+        self.assertEqual(mod_datetime.datetime(2020, 1, 1), gpx.tracks[0].segments[1].points[0].time.replace(tzinfo=None))
+
+        # The last point is incomplete:
+        gpx = mod_gpxpy.parse(xml[:-20], recover=True)
+        self.assertEqual([3, 0], [len(segment.points) for segment in gpx.tracks[0].segments])
+
+        self.assertEqual(xml + '</trkseg></trk></gpx>', mod_parser.close_unterminated_xml(xml))
+        complete = gpx.to_xml()
+        self.assertEqual(complete, mod_parser.close_unterminated_xml(complete))
+
+    def test_binary(self) -> None:
+        for file_name in ['gpx1.1_with_all_fields.gpx', 'gpx1.0_with_all_fields.gpx', 'korita-zbevnica.gpx']:
+            gpx = self.parse(file_name)
+            segment = mod_gpx.GPXTrackSegment()
+            for i, timezone in enumerate([None, 'Z', '+01:30', '-05:00']):
+                time = mod_datetime.datetime(2020, 1, 1, 10, i, 0, 123456, tzinfo=timezone and mod_gpxfield.SimpleTZ(timezone))
+                segment.points.append(mod_gpx.GPXTrackPoint(1.23456789012345e-7, -179.5, elevation=i * 1.5 or None, time=time))
+            gpx.tracks.append(mod_gpx.GPXTrack())
+            gpx.tracks[-1].segments.append(segment)
+
+            loaded = mod_gpxpy.load_binary(gpx.to_binary())
+            points = [(point.latitude, point.longitude, point.elevation, point.time, point.time and point.time.utcoffset())
+                      for point, _, _, _ in gpx.walk()]
+            loaded_points = [(point.latitude, point.longitude, point.elevation, point.time, point.time and point.time.utcoffset())
+                             for point, _, _, _ in loaded.walk()]
+            self.assertEqual(points, loaded_points)
+            self.assertEqual(gpx.version, loaded.version)
+            self.assertEqual(gpx.to_xml(), loaded.to_xml())
+
+        with mod_tempfile.TemporaryDirectory() as directory:
+            file_name = mod_os.path.join(directory, 'track.bin')
+            with open(file_name, 'wb') as f:
+                f.write(gpx.to_binary())
+            self.assertEqual(gpx.to_xml(), mod_gpxpy.load_binary(file_name).to_xml())
+
+        with self.assertRaises(mod_gpx.GPXException):
+            mod_gpxpy.load_binary(b'GPXPYBIX' + gpx.to_binary()[8:])
+        with self.assertRaises(mod_gpx.GPXException):
+            mod_gpxpy.load_binary(gpx.to_binary()[:-10])
+        # Truncated in the XML, in the middle of a multibyte character:
+        gpx.name = 'Čćž' * 100
+        data = gpx.to_binary()
+        size = data.index('Čćž'.encode('utf-8')) + 1
+        with self.assertRaisesRegex(mod_gpx.GPXException, 'truncated'):
+            mod_gpxpy.load_binary(data[:size])
+
+    def test_parse_cache(self) -> None:
+        with open('test_files/korita-zbevnica.gpx') as f:
+            xml = f.read()
+        with open('test_files/gpx1.1_with_all_fields.gpx') as f:
+            other_xml = f.read()
+
+        cache = mod_cache.ParseCache()
+        gpx = mod_gpxpy.parse(xml, cache=cache)
+        gpx.tracks[1].segments[0].points[0].latitude = 1
+        cached = mod_gpxpy.parse(mod_io.StringIO(xml), cache=cache)
+        self.assertFalse(cached is gpx)
+        self.assertEqual(mod_gpxpy.parse(xml).to_xml(), cached.to_xml())
+        self.assertEqual((1, 1, 1), cache.cache_info()[:3])
+
+        mod_gpxpy.parse(xml, version='1.0', cache=cache)
+        self.assertEqual((1, 2, 2), cache.cache_info()[:3])
+
+        # Only the last entry fits:
+        cache = mod_cache.ParseCache(max_size=len(mod_gpxpy.parse(xml).to_binary()) + 10)
+        mod_gpxpy.parse(other_xml, cache=cache)
+        mod_gpxpy.parse(xml, cache=cache)
+        mod_gpxpy.parse(other_xml, cache=cache)
+        self.assertEqual((0, 3, 1), cache.cache_info()[:3])
+
+        with mod_tempfile.TemporaryDirectory() as directory:
+            mod_gpxpy.parse(xml, cache=mod_cache.ParseCache(directory=directory))
+            cache = mod_cache.ParseCache(directory=directory)
+            self.assertEqual(mod_gpxpy.parse(xml).to_xml(), mod_gpxpy.parse(xml, cache=cache).to_xml())
+            self.assertEqual((1, 0, 1), cache.cache_info()[:3])
+
+    def test_parse_many(self) -> None:
+        with mod_tempfile.TemporaryDirectory() as directory:
+            invalid = mod_os.path.join(directory, 'invalid.gpx')
+            with open(invalid, 'w') as f:
+                f.write('<gpx><trk><trkseg><trkpt lat="1" lon="2"></trkseg></gpx>')
+            paths = ['test_files/korita-zbevnica.gpx', invalid, mod_os.path.join(directory, 'missing.gpx'), 'test_files/cerknicko-jezero.gpx']
+
+            for workers in [1, 2]:
+                results = list(mod_gpxpy.parse_many(paths, workers=workers))
+                self.assertEqual(paths, [result.path for result in results])
+                with open(paths[0]) as f:
+                    self.assertEqual(mod_gpxpy.parse(f).to_xml(), results[0].gpx.to_xml())
+                self.assertTrue(isinstance(results[1].exception, mod_gpx.GPXXMLSyntaxException))
+                self.assertTrue(isinstance(results[2].exception, FileNotFoundError))
+                self.assertEqual([True, False, False, True], [result.gpx is not None for result in results])
+
+            results = list(mod_gpxpy.parse_many(paths, workers=2, ordered=False, statistics=True))
+            self.assertEqual(sorted(paths), sorted(result.path for result in results))
+            for result in results:
+                if result.exception is None:
+                    self.assertIsNone(result.gpx)
+                    with open(result.path) as f:
+                        expected = mod_gpxpy.parse(f).get_statistics()
+                    self.assertEqual(expected.length_3d, result.statistics.length_3d)
+                    self.assertEqual(expected.moving_data, result.statistics.moving_data)
+
+            # Timezone naive and aware times, the statistics can't be computed:
+            mixed_times = mod_os.path.join(directory, 'mixed_times.gpx')
+            with open(mixed_times, 'w') as f:
+                f.write('<gpx><trk><trkseg><trkpt lat="1" lon="2"><time>2020-01-01T10:00:00</time></trkpt>'
+                        '<trkpt lat="1.001" lon="2"><time>2020-01-01T10:01:00Z</time></trkpt></trkseg></trk></gpx>')
+            for workers in [1, 2]:
+                results = list(mod_gpxpy.parse_many([mixed_times, paths[0]], workers=workers, statistics=True))
+                self.assertTrue(isinstance(results[0].exception, TypeError))
+                self.assertIsNone(results[0].statistics)
+                self.assertIsNone(results[1].exception)
+                self.assertIsNotNone(results[1].statistics)
+
+    def test_split_gpxs_verbatim(self) -> None:
+        header = '<?xml version="1.0" encoding="UTF-8"?>\n'
+        header += '<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1">\n'
+        header += '<wpt lat="1" lon="2"><name>š</name></wpt>\n'
+        track_1 = '<trk><name><![CDATA[</trk>]]></name><!-- </trk> --><trkseg><trkpt lat="1" lon="2"/></trkseg></trk>'
+        track_2 = '<trk ><name>b</name><extensions><trk><trk/></trk></extensions></trk >'
+        footer = '\n<extensions><x/></extensions>\n</gpx>\n'
+        xml = header + track_1 + '\n' + track_2 + footer
+
+        expected = [header + track_1 + footer, header + track_2 + footer]
+        self.assertEqual(expected, list(mod_gpxxml.split_gpxs(xml)))
+        self.assertEqual(expected, list(mod_gpxxml.split_gpxs(xml.encode('utf-8'))))
+        with mod_tempfile.TemporaryDirectory() as directory:
+            file_name = mod_os.path.join(directory, 'tracks.gpx')
+            with open(file_name, 'wb') as f:
+                f.write(xml.encode('utf-8'))
+            with open(file_name, 'rb') as f:
+                self.assertEqual(expected, list(mod_gpxxml.split_gpxs(f)))
+
+        gpx = mod_gpxpy.parse(expected[1])
+        self.assertEqual(['b'], [track.name for track in gpx.tracks])
+        self.assertEqual(['š'], [waypoint.name for waypoint in gpx.waypoints])
+        self.assertEqual([], list(mod_gpxxml.split_gpxs('<gpx><wpt lat="1" lon="2"/></gpx>')))
+
+    def test_write_joined_gpxs(self) -> None:
+        xml_1 = '<?xml version="1.0" encoding="UTF-8"?>\n'
+        xml_1 += '<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        xml_1 += 'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd">\n'
+        xml_1 += '<metadata><name>first</name></metadata>\n'
+        xml_1 += '<trk><name>a</name></trk>\n'
+        xml_1 += '<extensions><x/></extensions>\n'
+        xml_1 += '</gpx>\n'
+        xml_2 = '<gpx version="1.1" xmlns:a="urn:a" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="urn:a http://a.xsd">'
+        xml_2 += '<wpt lat="1" lon="2"><extensions><a:x>š</a:x></extensions></wpt><trk><name>b</name></trk></gpx>'
+        xml_3 = '<gpx xmlns:a="urn:other"><rte><name>c</name></rte><trk><a:x/></trk></gpx>'
+
+        expected = '<?xml version="1.0" encoding="UTF-8"?>\n'
+        expected += '<gpx version="1.1" xmlns="http://www.topografix.com/GPX/1/1" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        expected += 'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd urn:a http://a.xsd" xmlns:a="urn:a">\n'
+        expected += '<metadata><name>first</name></metadata>\n'
+        expected += '<wpt lat="1" lon="2"><extensions><a:x>š</a:x></extensions></wpt>\n'
+        expected += '<rte xmlns:a="urn:other"><name>c</name></rte>\n'
+        expected += '<trk><name>a</name></trk>\n'
+        expected += '<trk><name>b</name></trk>\n'
+        expected += '<trk xmlns:a="urn:other"><a:x/></trk>\n'
+        expected += '<extensions><x/></extensions>\n'
+        expected += '</gpx>\n'
+        self.assertEqual(expected, mod_gpxxml.join_gpxs([xml_1, xml_2, xml_3]))
+
+        with mod_tempfile.TemporaryDirectory() as directory:
+            paths = []
+            for xml_no, xml in enumerate([xml_1, xml_2, xml_3]):
+                paths.append(mod_pathlib.Path(directory) / f'{xml_no}.gpx')
+                paths[-1].write_bytes(xml.encode('utf-8'))
+            output = mod_io.BytesIO()
+            mod_gpxxml.write_joined_gpxs(paths, output)
+            self.assertEqual(expected, output.getvalue().decode('utf-8'))
+
+        gpx = mod_gpxpy.parse(expected)
+        self.assertEqual(['a', 'b', None], [track.name for track in gpx.tracks])
+        self.assertEqual('first', gpx.name)
+
+    def test_parse_lazy(self) -> None:
+        for file_name in ['korita-zbevnica.gpx', 'gpx_with_garmin_extension.gpx', 'gpx1.1_with_all_fields.gpx', 'gpx1.0_with_all_fields.gpx']:
+            with open(f'test_files/{file_name}') as f:
+                xml = f.read()
+            gpx = mod_gpxpy.parse(xml, lazy=True)
+            for track in gpx.tracks:
+                # Not parsed yet:
+                self.assertRaises(AttributeError, object.__getattribute__, track, 'segments')
+            self.assertEqual(mod_gpxpy.parse(xml).to_xml(), gpx.to_xml())
+            self.assertEqual(mod_gpxpy.parse(xml).to_xml(), mod_copy.deepcopy(mod_gpxpy.parse(xml, lazy=True)).to_xml())
+
+        with open('test_files/korita-zbevnica.gpx') as f:
+            gpx = mod_gpxpy.parse(f, lazy=True)
+        segment = gpx.tracks[1].segments[0]
+        self.assertRaises(AttributeError, object.__getattribute__, segment, 'points')
+        self.assertRaises(AttributeError, object.__getattribute__, gpx.tracks[2], 'name')
+        self.assertEqual(358, len(segment.points))
+        self.assertRaises(AttributeError, getattr, segment, 'not_a_field')
+
+        # Errors in the tracks are raised when they are parsed:
+        gpx = mod_gpxpy.parse('<gpx><name>n</name><trk><name>a</name></trk><trk><trkseg><trkpt lat="1" lon="x"/></trkseg></trk></gpx>', lazy=True)
+        self.assertEqual(('n', 2), (gpx.name, len(gpx.tracks)))
+        self.assertEqual('a', gpx.tracks[0].name)
+        self.assertRaises(mod_gpx.GPXException, lambda: gpx.tracks[1].segments[0].points)
+
+    def test_segment_steps(self) -> None:
+        gpx = self.parse('cerknicko-jezero.gpx')
+        segment = gpx.tracks[1].segments[0]
+        points = segment.points
+
+        steps = segment.get_steps()
+        self.assertIs(steps, segment.get_steps())
+        self.assertEqual(len(points) - 1, len(steps.distances_3d))
+        self.assertEqual(len(points), len(steps.cumulative_3d))
+        self.assertEqual(mod_geo.length_2d(points), segment.length_2d())
+        self.assertEqual(mod_geo.length_3d(points), segment.length_3d())
+        self.assertEqual(points[5].distance_3d(points[4]), steps.distances_3d[4])
+        self.assertEqual(total_seconds(points[5].time - points[4].time), steps.seconds[4]) # type: ignore
+        self.assertEqual(points[5].speed_between(points[4]), steps.distances_3d[4] / steps.seconds[4]) # type: ignore
+
+        # The steps are computed again after changes:
+        length = segment.length_3d()
+        segment.add_elevation(100)
+        self.assertIsNot(steps, segment.get_steps())
+        segment.move(mod_geo.LocationDelta(distance=10, angle=45))
+        segment.points.append(mod_gpx.GPXTrackPoint(points[-1].latitude + 0.001, points[-1].longitude, points[-1].elevation))
+        self.assertEqual(mod_geo.length_3d(segment.points), segment.length_3d())
+        self.assertNotEqual(length, segment.length_3d())
+        self.assertIsNone(segment.get_steps().seconds[-1])
+
+        # Points changed directly are detected only after invalidate_cache():
+        segment = gpx.tracks[1].segments[0]
+        points = segment.points
+        length = segment.length_2d()
+        moving_data = segment.get_moving_data()
+        points[5].latitude += 0.1
+        self.assertEqual(length, segment.length_2d())
+        segment.invalidate_cache()
+        self.assertEqual(mod_geo.length_2d(points), segment.length_2d())
+        self.assertNotEqual(length, segment.length_2d())
+        points[10] = mod_gpx.GPXTrackPoint(points[10].latitude + 0.01, points[10].longitude, points[10].elevation, points[10].time)
+        points[20].time += mod_datetime.timedelta(seconds=30) # type: ignore
+        segment.invalidate_cache()
+        self.assertEqual(mod_geo.length_3d(points), segment.length_3d())
+        self.assertNotEqual(moving_data, segment.get_moving_data())
+        self.assertEqual(mod_copy.deepcopy(segment).get_moving_data(), segment.get_moving_data())
+        self.assertEqual(mod_copy.deepcopy(segment).get_statistics()._replace(bounds=None), segment.get_statistics()._replace(bounds=None))
+        # Removed points are detected:
+        del points[30]
+        self.assertEqual(mod_geo.length_3d(points), segment.length_3d())
+
+        self.assertEqual((points[5].speed_between(points[4]) + points[5].speed_between(points[6])) / 2, segment.get_speed(5)) # type: ignore
+        self.assertRaises(IndexError, segment.get_speed, len(points))
+
+    def test_cached_bounds(self) -> None:
+        gpx = self.parse('korita-zbevnica.gpx')
+        segment = gpx.tracks[1].segments[0]
+
+        def bounds(gpx: mod_gpx.GPX) -> List[Any]:
+            points = list(gpx.walk(only_points=True))
+            return [min(point.latitude for point in points), max(point.latitude for point in points),
+                    min(point.longitude for point in points), max(point.longitude for point in points)]
+
+        self.assertEqual(bounds(gpx), list(gpx.get_bounds())) # type: ignore
+        segment.points.append(mod_gpx.GPXTrackPoint(46.5, 13.5))
+        self.assertEqual(bounds(gpx), list(gpx.get_bounds())) # type: ignore
+        segment.points.insert(0, mod_gpx.GPXTrackPoint(44.5, 15.5))
+        self.assertEqual(bounds(gpx), list(gpx.get_bounds())) # type: ignore
+        segment.move(mod_geo.LocationDelta(latitude_diff=2, longitude_diff=0))
+        self.assertEqual(bounds(gpx), list(gpx.get_bounds())) # type: ignore
+        gpx.tracks[1].segments.append(mod_gpx.GPXTrackSegment([mod_gpx.GPXTrackPoint(40, 10)]))
+        gpx.refresh_bounds()
+        self.assertEqual(bounds(gpx), list(gpx.bounds)) # type: ignore
+
+        # The bounds are cached, points changed directly need invalidate_cache():
+        cached_bounds = list(gpx.get_bounds()) # type: ignore
+        latitude = segment.points[0].latitude
+        segment.points[0].latitude = 10
+        self.assertEqual(cached_bounds, list(gpx.get_bounds())) # type: ignore
+        segment.invalidate_cache()
+        self.assertEqual(bounds(gpx), list(gpx.get_bounds())) # type: ignore
+        # When points are appended only the new points are checked (the
+        # change of the first point isn't seen without invalidate_cache()):
+        segment.points[0].latitude = latitude
+        segment.points.append(mod_gpx.GPXTrackPoint(45, 20))
+        self.assertEqual([10, cached_bounds[1], cached_bounds[2], 20], list(gpx.get_bounds())) # type: ignore
+        segment.invalidate_cache()
+        self.assertEqual(bounds(gpx), list(gpx.get_bounds())) # type: ignore
+        # Points inserted before the last point:
+        segment.points.insert(5, mod_gpx.GPXTrackPoint(44, 5))
+        self.assertEqual(bounds(gpx), list(gpx.get_bounds())) # type: ignore
+        segment.points.insert(5, mod_gpx.GPXTrackPoint(50, 6))
+        segment.points.pop(0)
+        segment.invalidate_cache()
+        self.assertEqual(bounds(gpx), list(gpx.get_bounds())) # type: ignore
+        self.assertEqual(bounds(gpx), list(gpx.get_statistics().bounds)) # type: ignore
+
+    def test_flat_points(self) -> None:
+        gpx = self.parse('korita-zbevnica.gpx')
+        flat_points = gpx.get_flat_points()
+        self.assertIs(flat_points, gpx.get_flat_points())
+        self.assertEqual(list(gpx.walk()), list(zip(*flat_points)))
+        self.assertEqual(list(gpx.tracks[1].walk()), [(point, segment_no, point_no) for point, track_no, segment_no, point_no in gpx.walk() if track_no == 1])
+        self.assertEqual(len(list(gpx.walk())), gpx.get_track_points_no())
+
+        gpx.tracks[1].segments[0].points.append(mod_gpx.GPXTrackPoint(45.5, 14.1))
+        flat_points = gpx.get_flat_points()
+        self.assertEqual(list(gpx.walk()), list(zip(*flat_points)))
+        self.assertEqual(len(flat_points.points), gpx.get_track_points_no())
+        self.assertAlmostEqual(gpx.length_3d(), gpx.get_points_data()[-1].distance_from_start)
+
+        # Points changed directly need invalidate_cache():
+        points = gpx.tracks[1].segments[0].points
+        points[10] = mod_gpx.GPXTrackPoint(45.6, 14.2)
+        gpx.tracks[1].segments[0].invalidate_cache()
+        flat_points = gpx.get_flat_points()
+        self.assertEqual(list(gpx.walk()), list(zip(*flat_points)))
+        self.assertTrue(isinstance(flat_points.points, tuple))
+        location = mod_geo.Location(45.7, 14.3)
+        self.assertIs(points[10], gpx.get_nearest_location(location).location) # type: ignore
+        points[10].latitude = 40
+        gpx.invalidate_cache()
+        self.assertIsNot(points[10], gpx.get_nearest_location(location).location) # type: ignore
+        self.assertIs(points[10], gpx.get_nearest_location(mod_geo.Location(40, 14.2)).location) # type: ignore
+
 class LxmlTest(mod_unittest.TestCase):
     @mod_unittest.skipIf(mod_os.environ.get('XMLPARSER')!="LXML", "LXML not installed")
     def test_checklxml(self) -> None: